@@ -1,4 +1,5 @@
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
 from app.config import get_settings
 
@@ -20,6 +21,33 @@ else:
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+
+def _async_database_url(url: str) -> str:
+    """Map a sync database URL onto its async driver (asyncpg / aiosqlite)."""
+    if url.startswith("sqlite://"):
+        return "sqlite+aiosqlite://" + url[len("sqlite://"):]
+    for prefix in ("postgresql+psycopg2://", "postgresql://", "postgres://"):
+        if url.startswith(prefix):
+            return "postgresql+asyncpg://" + url[len(prefix):]
+    return url
+
+
+# Async engine for async def handlers, so queries never block the event loop
+async_database_url = settings.async_database_url or _async_database_url(settings.database_url)
+if async_database_url.startswith("sqlite"):
+    async_engine = create_async_engine(async_database_url)
+else:
+    async_engine = create_async_engine(
+        async_database_url,
+        pool_pre_ping=True,
+        pool_size=10,
+        max_overflow=20
+    )
+
+# expire_on_commit=False: attributes stay readable after commit without a
+# lazy load, which async sessions cannot do implicitly
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
 Base = declarative_base()
 
 
@@ -32,10 +60,19 @@ def get_db():
         db.close()
 
 
+async def get_async_db():
+    """Dependency for getting async database sessions (use from async def handlers)."""
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
 def init_db():
     """Initialize database tables and seed default data."""
     Base.metadata.create_all(bind=engine)
 
+    from app.services.search_index import ensure_search_index
+    ensure_search_index(engine)
+
     # Seed default stores if none exist
     from app.models import Store, Category
     db = SessionLocal()
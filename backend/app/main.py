@@ -3,8 +3,9 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from contextlib import asynccontextmanager
 from pathlib import Path
+from anyio import to_thread
 from app.config import get_settings
-from app.database import init_db
+from app.database import async_engine, init_db
 from app.routers.specials import router as specials_router
 from app.routers.specials_v2 import router as specials_v2_router
 from app.routers.compare import router as compare_router
@@ -12,6 +13,13 @@ from app.routers.admin import router as admin_router
 from app.routers.staples import router as staples_router  # Staples price comparison
 from app.tasks.scheduler import start_scheduler, stop_scheduler
 from app.services.cache import cache
+from app.services.current_specials import rebuild_current_specials, refresh_current_specials
+from app.services.category_tree import category_tree
+from app.services.image_cache import image_cache
+from app.services.image_store import image_store
+from app.services.image_variants import VARIANTS_DIRNAME, VARIANTS_URL, VariantStaticFiles
+from app.services.price_rollups import backfill_price_rollups
+from app.services.store_registry import store_registry
 
 settings = get_settings()
 
@@ -26,14 +34,25 @@ async def lifespan(app: FastAPI):
     """Initialize database, cache, and scheduler on startup."""
     print("Starting up... Initializing database")
     init_db()
+    store_registry.load()
+    category_tree.load()
+    rebuild_current_specials()
+    backfill_price_rollups()
+    image_store.open()  # Rebuilds a missing image index here, not in a request
+    # Sync handlers and dependencies run in this pool, off the event loop
+    to_thread.current_default_thread_limiter().total_tokens = settings.threadpool_size
     print("Connecting to Redis cache...")
     await cache.connect()
+    await cache.start_invalidation_listener()
     print("Starting specials scraper scheduler...")
     start_scheduler()
     yield
     print("Shutting down...")
     stop_scheduler()
     await cache.disconnect()
+    await async_engine.dispose()
+    image_cache.shutdown()
+    image_store.close()
 
 
 app = FastAPI(
@@ -50,9 +69,17 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],  # Next-page cursor of header-paginated lists
 )
 
-# Mount static files for cached images
+# Mount static files for cached images; responsive variants first, with
+# Accept negotiation (AVIF/WebP) and immutable caching
+(STATIC_DIR / "images" / VARIANTS_DIRNAME).mkdir(exist_ok=True)
+app.mount(
+    VARIANTS_URL,
+    VariantStaticFiles(directory=str(STATIC_DIR / "images" / VARIANTS_DIRNAME)),
+    name="image_variants",
+)
 app.mount("/static", StaticFiles(directory=str(STATIC_DIR)), name="static")
 
 # Include routers
@@ -76,37 +103,28 @@ def root():
 @app.get("/api/stores")
 def list_stores():
     """List all supported stores."""
-    from app.database import SessionLocal
-    from app.models import Store
-
-    db = SessionLocal()
-    try:
-        stores = db.query(Store).all()
-        return [
-            {
-                "id": s.id,
-                "name": s.name,
-                "slug": s.slug,
-                "specials_day": s.specials_day
-            }
-            for s in stores
-        ]
-    finally:
-        db.close()
+    return [
+        {
+            "id": s.id,
+            "name": s.name,
+            "slug": s.slug,
+            "specials_day": s.specials_day
+        }
+        for s in store_registry.all()
+    ]
 
 
 @app.post("/api/import-specials")
 def import_specials_direct(specials: list[dict]):
     """Import specials directly into the database using raw SQL to ensure all columns are saved."""
     from app.database import SessionLocal
-    from app.models import Store
     from sqlalchemy import text
     from datetime import datetime, timedelta
 
     db = SessionLocal()
     try:
         # Get store mapping
-        stores = {s.slug: s.id for s in db.query(Store).all()}
+        stores = {s.slug: s.id for s in store_registry.all()}
 
         created = 0
         skipped = 0
@@ -144,6 +162,7 @@ def import_specials_direct(specials: list[dict]):
             })
             created += 1
 
+        refresh_current_specials(db)
         db.commit()
         return {"message": "Specials imported", "created": created, "skipped": skipped}
     finally:
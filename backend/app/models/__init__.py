@@ -2,11 +2,12 @@ from app.models.store import Store
 from app.models.category import Category
 from app.models.product import Product
 from app.models.store_product import StoreProduct
-from app.models.price import Price, PriceVerification
+from app.models.price import Price, PriceVerification, LatestPrice, PriceRollup
 from app.models.user import User
 from app.models.alert import Alert, AlertNotification, Notification
-from app.models.special import Special, ScrapeLog
+from app.models.special import Special, SpecialCount, CurrentSpecial, CurrentSpecialTypeWord, ProjectionGeneration, ScrapeLog
 from app.models.master_product import MasterProduct, ProductPrice
+from app.models.image import ImageMetadata
 
 __all__ = [
     "Store",
@@ -15,12 +16,23 @@ __all__ = [
     "StoreProduct",
     "Price",
     "PriceVerification",
+    "LatestPrice",
+    "PriceRollup",
     "User",
     "Alert",
     "AlertNotification",
     "Notification",
     "Special",
+    "SpecialCount",
+    "CurrentSpecial",
+    "CurrentSpecialTypeWord",
+    "ProjectionGeneration",
     "ScrapeLog",
     "MasterProduct",
     "ProductPrice",
+    "ImageMetadata",
 ]
+
+# Keeps latest_prices / price_rollups in step with every Price write; imported
+# here so any session that can write prices has the listener registered
+from app.services import price_rollups  # noqa: E402,F401
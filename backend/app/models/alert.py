@@ -1,7 +1,7 @@
 """
 Models for price alerts and notifications.
 """
-from sqlalchemy import Column, Integer, String, ForeignKey, Boolean, DateTime, Numeric, Text, JSON
+from sqlalchemy import Column, Integer, String, ForeignKey, Boolean, DateTime, Numeric, Text, JSON, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.database import Base
@@ -81,3 +81,8 @@ class Notification(Base):
 
     # Relationships
     user = relationship("User", back_populates="notifications")
+
+    # Keyset pagination of a user's feed (newest first)
+    __table_args__ = (
+        Index("ix_notifications_user_created", "user_id", "created_at", "id"),
+    )
@@ -0,0 +1,31 @@
+"""
+Image metadata model - what was last fetched from each product image URL.
+
+Lets image maintenance send conditional requests (ETag / Last-Modified) and
+spot placeholders by perceptual hash instead of re-downloading everything.
+"""
+from sqlalchemy import Column, Integer, BigInteger, String, DateTime, Boolean
+from app.database import Base
+
+
+class ImageMetadata(Base):
+    """Validators, hashes and placeholder flag for one image URL."""
+    __tablename__ = "image_metadata"
+
+    id = Column(Integer, primary_key=True, index=True)
+    url = Column(String(1000), nullable=False, unique=True)
+
+    # HTTP validators from the last 200 response
+    etag = Column(String(255))
+    last_modified = Column(String(64))  # Header value, sent back verbatim
+
+    # Content
+    content_hash = Column(String(64))  # sha256 of the downloaded bytes
+    phash = Column(BigInteger, index=True)  # 64-bit dHash, signed
+    is_placeholder = Column(Boolean, nullable=False, default=False, index=True)
+    variants_ready = Column(Boolean, nullable=False, default=False)  # Responsive variants exist for content_hash
+
+    # Revalidation bookkeeping
+    checked_at = Column(DateTime(timezone=True), index=True)  # Last request, changed or not
+    changed_at = Column(DateTime(timezone=True))  # Last time the content hash changed
+    failures = Column(Integer, nullable=False, default=0)  # Consecutive failed requests
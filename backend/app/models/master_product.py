@@ -33,7 +33,7 @@ class MasterProduct(Base):
 
     # URLs
     product_url = Column(Text)
-    original_image_url = Column(String(500))  # Original CDN URL
+    original_image_url = Column(String(500), index=True)  # Original CDN URL
 
     # Local image cache path (e.g., "/images/woolworths/123456.jpg")
     local_image_path = Column(String(255))
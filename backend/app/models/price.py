@@ -45,3 +45,50 @@ class PriceVerification(Base):
     # Relationships
     price = relationship("Price", back_populates="verifications")
     user = relationship("User", back_populates="verifications")
+
+
+class LatestPrice(Base):
+    """
+    Most recent price per product and store (one row per StoreProduct).
+
+    Maintained by services/price_rollups as prices are written.
+    """
+    __tablename__ = "latest_prices"
+
+    product_id = Column(Integer, ForeignKey("products.id"), primary_key=True)
+    store_id = Column(Integer, ForeignKey("stores.id"), primary_key=True)
+    store_product_id = Column(Integer, ForeignKey("store_products.id"), nullable=False)
+    price_id = Column(Integer, nullable=False)
+    price = Column(Numeric(10, 2), nullable=False)
+    unit_price = Column(Numeric(10, 4))
+    was_price = Column(Numeric(10, 2))
+    is_special = Column(Boolean, default=False)
+    recorded_at = Column(DateTime(timezone=True), nullable=False)
+
+
+class PriceRollup(Base):
+    """
+    Downsampled price history: one row per product, store and day / week /
+    month, with the closing (last recorded) price of the period.
+
+    Maintained by services/price_rollups as prices are written.
+    """
+    __tablename__ = "price_rollups"
+
+    product_id = Column(Integer, ForeignKey("products.id"), primary_key=True)
+    store_id = Column(Integer, ForeignKey("stores.id"), primary_key=True)
+    period = Column(String(10), primary_key=True)  # 'day', 'week' (from Monday) or 'month'
+    period_start = Column(Date, primary_key=True)
+    min_price = Column(Numeric(10, 2), nullable=False)
+    max_price = Column(Numeric(10, 2), nullable=False)
+    price_sum = Column(Numeric(14, 2), nullable=False)
+    price_count = Column(Integer, nullable=False)
+    special_count = Column(Integer, nullable=False, default=0)
+    close_price = Column(Numeric(10, 2), nullable=False)
+    close_special = Column(Boolean, default=False)
+    close_at = Column(DateTime(timezone=True), nullable=False)
+    close_price_id = Column(Integer, nullable=False)
+
+    __table_args__ = (
+        Index("ix_price_rollups_product_period", "product_id", "period", "period_start"),
+    )
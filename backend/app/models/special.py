@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Text, Numeric, Date, ForeignKey, UniqueConstraint
+from sqlalchemy import Column, Integer, BigInteger, String, DateTime, Text, Numeric, Date, ForeignKey, UniqueConstraint, Index, Boolean
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.database import Base
@@ -47,6 +47,124 @@ class Special(Base):
     )
 
 
+class SpecialCount(Base):
+    """
+    Materialized count of specials per filter combination.
+
+    One row per (store, category, category_id, discount_percent, valid_to),
+    so listing totals for any store/category/min-discount filter are a SUM
+    over a few rows. Maintained by services/special_counts.
+    """
+    __tablename__ = "special_counts"
+
+    id = Column(Integer, primary_key=True)
+    store_id = Column(Integer, ForeignKey("stores.id"), nullable=False, index=True)
+    category = Column(String(100))
+    category_id = Column(Integer, nullable=True)
+    discount_percent = Column(Integer, nullable=False, default=0)  # NULL discounts counted as 0
+    valid_to = Column(Date, index=True)
+    count = Column(Integer, nullable=False, default=0)
+
+
+class CurrentSpecial(Base):
+    """
+    Denormalized projection of the active specials, one row per Special.
+
+    Holds everything the read endpoints serve (store slug/name, resolved
+    category ids, cents and display prices, product key) so listings are
+    plain index range scans with no joins or per-row formatting. Rebuilt per
+    store by services/current_specials at the end of each scrape.
+    """
+    __tablename__ = "current_specials"
+
+    id = Column(Integer, primary_key=True)  # Same id as specials.id
+    store_id = Column(Integer, ForeignKey("stores.id"), nullable=False)
+    store_slug = Column(String(50), nullable=False)
+    store_name = Column(String(100), nullable=False)
+
+    # Product info
+    name = Column(String(255), nullable=False)
+    brand = Column(String(100))
+    size = Column(String(50))
+    category = Column(String(100), index=True)  # Original scraped category string
+    category_id = Column(Integer, index=True)  # Unified category as assigned
+    parent_category_id = Column(Integer, index=True)  # Top-level category (category_id itself if top-level)
+    product_key = Column(String(420), index=True)  # "brand|name|size", lowercased
+    fresh_produce = Column(Boolean, nullable=False, default=False)  # Name matches the fresh produce keywords
+    fresh_meat = Column(Boolean, nullable=False, default=False)  # Name matches the fresh meat/seafood keywords
+
+    # Pricing
+    price = Column(Numeric(10, 2), nullable=False)
+    was_price = Column(Numeric(10, 2))
+    price_cents = Column(Integer, nullable=False)
+    was_price_cents = Column(Integer)
+    price_display = Column(String(20), nullable=False)  # "$4.50"
+    was_price_display = Column(String(20))
+    discount_percent = Column(Integer, nullable=False, default=0)  # NULL discounts stored as 0, for sorting
+    discount_missing = Column(Boolean, nullable=False, default=False)  # The special's discount was NULL
+    unit_price = Column(String(50))
+
+    # Store reference
+    store_product_id = Column(String(100))
+    product_url = Column(Text)
+    image_url = Column(String(500))
+    image_hash = Column(String(64))  # Content hash of the cached image, when responsive variants exist
+
+    # Validity
+    valid_from = Column(Date)
+    valid_to = Column(Date, index=True)
+    valid_until = Column(DateTime)  # valid_to at midnight, as served by v2
+
+    # Metadata
+    scraped_at = Column(DateTime(timezone=True))
+    created_at = Column(DateTime(timezone=True))
+
+    @property
+    def reported_discount_percent(self):
+        """Discount as the special has it: None where it had none (not the sort value 0)."""
+        return None if self.discount_missing else self.discount_percent
+
+
+# Composite indexes matching the listing sort orders (id is the tiebreaker)
+Index("ix_current_specials_discount", CurrentSpecial.discount_percent.desc(), CurrentSpecial.id)
+Index("ix_current_specials_store_discount", CurrentSpecial.store_id, CurrentSpecial.discount_percent.desc(), CurrentSpecial.id)
+Index("ix_current_specials_price", CurrentSpecial.price_cents, CurrentSpecial.id)
+Index("ix_current_specials_name", CurrentSpecial.name, CurrentSpecial.id)
+
+
+class ProjectionGeneration(Base):
+    """
+    Change counter of the current_specials projection (a single row, id 1).
+
+    Incremented by every projection refresh, in the same transaction, so
+    listing cursors can tell whether the rows they page through changed.
+    """
+    __tablename__ = "projection_generation"
+
+    id = Column(Integer, primary_key=True)
+    generation = Column(BigInteger, nullable=False, default=0)
+
+
+class CurrentSpecialTypeWord(Base):
+    """
+    Posting of one word of a current special's brandless product type.
+
+    "Similar type" lookups probe the reference's words (within its category
+    and size) instead of comparing against every special in the category.
+    Written alongside current_specials by services/product_equivalence.
+    """
+    __tablename__ = "current_special_type_words"
+
+    word = Column(String(100), primary_key=True)
+    special_id = Column(Integer, primary_key=True)  # current_specials.id
+    store_id = Column(Integer, nullable=False, index=True)
+    category_id = Column(Integer)
+    size = Column(String(50))
+
+
+Index("ix_current_special_type_words_probe", CurrentSpecialTypeWord.word, CurrentSpecialTypeWord.category_id, CurrentSpecialTypeWord.size)
+
+
 class ScrapeLog(Base):
     """Log of scraping runs for monitoring."""
     __tablename__ = "scrape_logs"
@@ -170,11 +170,13 @@ class SpecialImport(BaseModel):
 def clear_specials():
     """Clear all specials from the database."""
     from app.models import Special
+    from app.services.current_specials import refresh_current_specials
 
     db = SessionLocal()
     try:
         count = db.query(Special).count()
         db.query(Special).delete()
+        refresh_current_specials(db)
         db.commit()
         return {"message": "Specials cleared", "deleted": count}
     finally:
@@ -297,6 +299,7 @@ def test_insert_url():
 def import_specials(specials: list[SpecialImport]):
     """Import specials directly into the database using raw SQL to ensure all columns are saved."""
     from app.models import Store
+    from app.services.current_specials import refresh_current_specials
     from sqlalchemy import text
     from datetime import datetime, timedelta
 
@@ -340,6 +343,7 @@ def import_specials(specials: list[SpecialImport]):
             })
             created += 1
 
+        refresh_current_specials(db)
         db.commit()
         return {"message": "Specials imported", "created": created, "skipped": skipped}
     finally:
@@ -718,7 +722,7 @@ def import_everyday_prices(prices: list[EverydayPriceImport]):
 @router.delete("/clear-everyday-prices")
 def clear_everyday_prices():
     """Clear all everyday prices (Product/StoreProduct/Price tables)."""
-    from app.models import Product, StoreProduct, Price
+    from app.models import Product, StoreProduct, Price, LatestPrice, PriceRollup
 
     db = SessionLocal()
     try:
@@ -726,6 +730,9 @@ def clear_everyday_prices():
         store_products_count = db.query(StoreProduct).count()
         products_count = db.query(Product).count()
 
+        # Bulk deletes skip the rollup listener; clear its tables too
+        db.query(LatestPrice).delete()
+        db.query(PriceRollup).delete()
         db.query(Price).delete()
         db.query(StoreProduct).delete()
         db.query(Product).delete()
@@ -1,17 +1,19 @@
 """
 Alerts router for managing price watch alerts and notifications.
 """
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import desc
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
+from sqlalchemy import desc, func, select, update
 from pydantic import BaseModel
 from typing import Optional
 from datetime import datetime, timezone
 from decimal import Decimal
 
-from ..database import get_db
+from ..database import get_async_db
 from .auth import get_current_user, require_premium
 from ..models import Alert, Notification, Product, User
+from ..services.cursors import InvalidCursor, decode_cursor, encode_cursor, filter_fingerprint, keyset_condition
 
 router = APIRouter(prefix="/alerts", tags=["alerts"])
 
@@ -67,15 +69,17 @@ class NotificationResponse(BaseModel):
 async def get_my_alerts(
     active_only: bool = Query(True, description="Only return active alerts"),
     current_user: User = Depends(require_premium),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get all alerts for the current user. Premium feature."""
-    query = db.query(Alert).filter(Alert.user_id == current_user.id)
+    query = select(Alert).filter(Alert.user_id == current_user.id)
 
     if active_only:
         query = query.filter(Alert.is_active == True)
 
-    alerts = query.options(joinedload(Alert.product)).order_by(desc(Alert.created_at)).all()
+    alerts = (await db.scalars(
+        query.options(joinedload(Alert.product)).order_by(desc(Alert.created_at))
+    )).all()
 
     return [
         AlertResponse(
@@ -99,20 +103,20 @@ async def get_my_alerts(
 async def create_alert(
     alert_data: AlertCreate,
     current_user: User = Depends(require_premium),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Create a new price alert for a product. Premium feature."""
     # Check if product exists
-    product = db.query(Product).filter(Product.id == alert_data.product_id).first()
+    product = await db.get(Product, alert_data.product_id)
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
 
     # Check if alert already exists for this product
-    existing = db.query(Alert).filter(
+    existing = (await db.scalars(select(Alert).filter(
         Alert.user_id == current_user.id,
         Alert.product_id == alert_data.product_id,
         Alert.is_active == True
-    ).first()
+    ))).first()
 
     if existing:
         raise HTTPException(status_code=400, detail="Alert already exists for this product")
@@ -128,8 +132,8 @@ async def create_alert(
     )
 
     db.add(alert)
-    db.commit()
-    db.refresh(alert)
+    await db.commit()
+    await db.refresh(alert)
 
     return AlertResponse(
         id=alert.id,
@@ -146,17 +150,17 @@ async def create_alert(
     )
 
 
-@router.get("/{alert_id}", response_model=AlertResponse)
+@router.get("/{alert_id:int}", response_model=AlertResponse)
 async def get_alert(
     alert_id: int,
     current_user: User = Depends(require_premium),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get a specific alert."""
-    alert = db.query(Alert).options(joinedload(Alert.product)).filter(
+    alert = (await db.scalars(select(Alert).options(joinedload(Alert.product)).filter(
         Alert.id == alert_id,
         Alert.user_id == current_user.id
-    ).first()
+    ))).first()
 
     if not alert:
         raise HTTPException(status_code=404, detail="Alert not found")
@@ -176,18 +180,18 @@ async def get_alert(
     )
 
 
-@router.patch("/{alert_id}", response_model=AlertResponse)
+@router.patch("/{alert_id:int}", response_model=AlertResponse)
 async def update_alert(
     alert_id: int,
     alert_data: AlertUpdate,
     current_user: User = Depends(require_premium),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Update an alert's settings."""
-    alert = db.query(Alert).options(joinedload(Alert.product)).filter(
+    alert = (await db.scalars(select(Alert).options(joinedload(Alert.product)).filter(
         Alert.id == alert_id,
         Alert.user_id == current_user.id
-    ).first()
+    ))).first()
 
     if not alert:
         raise HTTPException(status_code=404, detail="Alert not found")
@@ -202,8 +206,7 @@ async def update_alert(
     if alert_data.is_active is not None:
         alert.is_active = alert_data.is_active
 
-    db.commit()
-    db.refresh(alert)
+    await db.commit()
 
     return AlertResponse(
         id=alert.id,
@@ -220,23 +223,23 @@ async def update_alert(
     )
 
 
-@router.delete("/{alert_id}")
+@router.delete("/{alert_id:int}")
 async def delete_alert(
     alert_id: int,
     current_user: User = Depends(require_premium),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Delete an alert."""
-    alert = db.query(Alert).filter(
+    alert = (await db.scalars(select(Alert).filter(
         Alert.id == alert_id,
         Alert.user_id == current_user.id
-    ).first()
+    ))).first()
 
     if not alert:
         raise HTTPException(status_code=404, detail="Alert not found")
 
-    db.delete(alert)
-    db.commit()
+    await db.delete(alert)
+    await db.commit()
 
     return {"status": "deleted"}
 
@@ -246,25 +249,25 @@ async def delete_alert(
 async def quick_watch_product(
     product_id: int,
     current_user: User = Depends(require_premium),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Quick watch a product for any price drops. Premium feature."""
     # Check if product exists
-    product = db.query(Product).filter(Product.id == product_id).first()
+    product = await db.get(Product, product_id)
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
 
     # Check if already watching
-    existing = db.query(Alert).filter(
+    existing = (await db.scalars(select(Alert).filter(
         Alert.user_id == current_user.id,
         Alert.product_id == product_id,
         Alert.is_active == True
-    ).first()
+    ))).first()
 
     if existing:
         # Toggle off - deactivate
         existing.is_active = False
-        db.commit()
+        await db.commit()
         return {"watching": False, "product_id": product_id}
 
     # Create new watch
@@ -277,7 +280,7 @@ async def quick_watch_product(
     )
 
     db.add(alert)
-    db.commit()
+    await db.commit()
 
     return {"watching": True, "product_id": product_id, "alert_id": alert.id}
 
@@ -286,14 +289,14 @@ async def quick_watch_product(
 async def check_watch_status(
     product_id: int,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Check if a product is being watched."""
-    alert = db.query(Alert).filter(
+    alert = (await db.scalars(select(Alert).filter(
         Alert.user_id == current_user.id,
         Alert.product_id == product_id,
         Alert.is_active == True
-    ).first()
+    ))).first()
 
     return {"watching": alert is not None, "alert_id": alert.id if alert else None}
 
@@ -301,18 +304,38 @@ async def check_watch_status(
 # Notification Endpoints
 @router.get("/notifications", response_model=list[NotificationResponse])
 async def get_notifications(
+    response: Response,
     limit: int = Query(20, le=100),
     unread_only: bool = Query(False),
+    cursor: Optional[str] = Query(None, description="Keyset cursor from the X-Next-Cursor header"),
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Get notifications for the current user."""
-    query = db.query(Notification).filter(Notification.user_id == current_user.id)
+    """Get notifications for the current user (next page cursor in X-Next-Cursor)."""
+    query = select(Notification).filter(Notification.user_id == current_user.id)
 
     if unread_only:
         query = query.filter(Notification.read_at == None)
 
-    notifications = query.order_by(desc(Notification.created_at)).limit(limit).all()
+    order = [(Notification.created_at, True), (Notification.id, True)]
+    # The user id is part of the fingerprint, so cursors don't carry across accounts
+    fingerprint = filter_fingerprint(user_id=current_user.id, unread_only=unread_only)
+    if cursor:
+        try:
+            position = decode_cursor(cursor, "created", "desc", fingerprint, len(order))
+        except InvalidCursor as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        query = query.filter(keyset_condition(order, position.keys))
+
+    notifications = (await db.scalars(
+        query.order_by(desc(Notification.created_at), desc(Notification.id)).limit(limit + 1)
+    )).all()
+    if len(notifications) > limit:
+        notifications = notifications[:limit]
+        last = notifications[-1]
+        response.headers["X-Next-Cursor"] = encode_cursor(
+            "created", "desc", [last.created_at, last.id], fingerprint
+        )
 
     return [
         NotificationResponse(
@@ -331,13 +354,13 @@ async def get_notifications(
 @router.get("/notifications/count")
 async def get_unread_count(
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get count of unread notifications."""
-    count = db.query(Notification).filter(
+    count = await db.scalar(select(func.count(Notification.id)).filter(
         Notification.user_id == current_user.id,
         Notification.read_at == None
-    ).count()
+    ))
 
     return {"unread_count": count}
 
@@ -346,19 +369,19 @@ async def get_unread_count(
 async def mark_notification_read(
     notification_id: int,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Mark a notification as read."""
-    notification = db.query(Notification).filter(
+    notification = (await db.scalars(select(Notification).filter(
         Notification.id == notification_id,
         Notification.user_id == current_user.id
-    ).first()
+    ))).first()
 
     if not notification:
         raise HTTPException(status_code=404, detail="Notification not found")
 
     notification.read_at = datetime.now(timezone.utc)
-    db.commit()
+    await db.commit()
 
     return {"status": "read"}
 
@@ -366,14 +389,18 @@ async def mark_notification_read(
 @router.post("/notifications/read-all")
 async def mark_all_read(
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Mark all notifications as read."""
-    db.query(Notification).filter(
-        Notification.user_id == current_user.id,
-        Notification.read_at == None
-    ).update({"read_at": datetime.now(timezone.utc)})
+    await db.execute(
+        update(Notification)
+        .where(
+            Notification.user_id == current_user.id,
+            Notification.read_at == None
+        )
+        .values(read_at=datetime.now(timezone.utc))
+    )
 
-    db.commit()
+    await db.commit()
 
     return {"status": "all_read"}
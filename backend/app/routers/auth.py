@@ -56,8 +56,10 @@ class UserResponse(BaseModel):
 
 
 # ============== Dependencies ==============
+# Plain def so FastAPI runs the sync session lookups in its threadpool
+# rather than on the event loop of the async routers that depend on them.
 
-async def get_current_user(
+def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security),
     db: Session = Depends(get_db)
 ) -> Optional[User]:
@@ -69,7 +71,7 @@ async def get_current_user(
     return user
 
 
-async def require_auth(
+def require_auth(
     credentials: HTTPAuthorizationCredentials = Depends(security),
     db: Session = Depends(get_db)
 ) -> User:
@@ -98,7 +100,7 @@ async def require_auth(
     return user
 
 
-async def require_premium(
+def require_premium(
     user: User = Depends(require_auth)
 ) -> User:
     """Require premium subscription - raises 403 if not premium."""
@@ -1,12 +1,11 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
-from sqlalchemy import desc, func, or_
+from sqlalchemy import and_, desc, func, or_, select
 from decimal import Decimal
 from datetime import date
 from typing import Optional
-import re
 from app.database import get_db
-from app.models import Price, StoreProduct, Product, Store, Category, Special
+from app.models import Price, StoreProduct, Product, Category, Special, CurrentSpecial
 from app.schemas.price import (
     PriceComparison,
     StorePrice,
@@ -20,12 +19,22 @@ from app.schemas.price import (
     FreshFoodItem,
     FreshFoodStorePrice,
     FreshFoodsResponse,
+    BasketOptimizeLine,
+    BasketOptimizeRequest,
+    BasketOptimizeResponse,
 )
 from app.services.product_matching import (
     extract_product_type,
     find_similar_products,
     get_product_type_suggestions,
 )
+from app.services.basket_optimizer import optimize_basket
+from app.services.basket_pricing import BasketLine, load_product_prices, price_basket
+from app.services.category_tree import category_tree
+from app.services.current_specials import projection_search_condition
+from app.services.fresh_foods import MEAT_CATEGORY_SLUGS, PRODUCE_CATEGORY_SLUGS
+from app.services.product_equivalence import extract_special_type, is_similar_type, similar_type_candidates
+from app.services.store_registry import store_registry
 
 router = APIRouter(prefix="/compare", tags=["compare"])
 
@@ -33,54 +42,6 @@ router = APIRouter(prefix="/compare", tags=["compare"])
 # ============== Fresh Foods Comparison Endpoints ==============
 # NOTE: This route must be defined BEFORE /{product_id} to avoid routing conflicts
 
-# Keywords for fresh food filtering (used when category_id not set)
-PRODUCE_KEYWORDS = [
-    "apple", "banana", "orange", "mango", "grape", "strawberry", "blueberry",
-    "raspberry", "watermelon", "melon", "pear", "peach", "plum", "kiwi",
-    "avocado", "lemon", "lime", "mandarin", "pineapple", "cherry", "nectarine",
-    "potato", "onion", "carrot", "tomato", "lettuce", "broccoli", "capsicum",
-    "cucumber", "spinach", "mushroom", "zucchini", "corn", "bean", "pea",
-    "cauliflower", "celery", "garlic", "ginger", "chilli", "cabbage", "pumpkin",
-    "sweet potato", "salad", "herb", "vegetable", "fruit"
-]
-
-MEAT_KEYWORDS = [
-    "chicken", "beef", "lamb", "pork", "mince", "steak", "roast", "chop",
-    "sausage", "bacon", "thigh", "breast", "wing", "drumstick", "fillet",
-    "cutlet", "rump", "scotch", "salmon", "prawn", "fish", "barramundi",
-    "tuna", "snapper", "calamari", "seafood", "meat"
-]
-
-# Exclusion keywords for processed foods
-FRESH_EXCLUSIONS = [
-    "frozen", "oven bake", "microwave", "heat & eat", "ready to cook",
-    "schnitzel", "nugget", "crumbed", "battered", "coated", "breaded",
-    "sauce", "paste", "powder", "seasoning", "stock", "marinade",
-    "canned", "tinned", "preserved", "pickled", "jarred",
-    "juice", "cordial", "soft drink", "wine", "beer", "cider",
-    "yoghurt", "yogurt", "cheese", "milk", "cream", "butter", "ice cream",
-    "chip", "crisp", "biscuit", "chocolate", "candy", "confectionery"
-]
-
-
-def _is_fresh_produce(name: str) -> bool:
-    """Check if a product name matches fresh produce keywords."""
-    name_lower = name.lower()
-    # Check exclusions first
-    if any(excl in name_lower for excl in FRESH_EXCLUSIONS):
-        return False
-    return any(kw in name_lower for kw in PRODUCE_KEYWORDS)
-
-
-def _is_fresh_meat(name: str) -> bool:
-    """Check if a product name matches fresh meat/seafood keywords."""
-    name_lower = name.lower()
-    # Check exclusions first
-    if any(excl in name_lower for excl in FRESH_EXCLUSIONS):
-        return False
-    return any(kw in name_lower for kw in MEAT_KEYWORDS)
-
-
 @router.get("/fresh-foods", response_model=FreshFoodsResponse)
 def get_fresh_foods(
     limit: int = Query(50, le=100, description="Max items per category"),
@@ -90,94 +51,172 @@ def get_fresh_foods(
     Get fresh food prices (produce and meat) across all stores.
 
     Returns products grouped by category with prices from each store.
-    Pulls from both regular products AND specials tables.
+    Pulls from both regular products AND specials tables, in one query each:
+    category ids come from the cached category tree, latest prices from a
+    window function, and the fresh keyword classification of specials was
+    stored in the projection at ingestion.
     """
     today = date.today()
 
-    # Find produce categories
-    produce_cats = db.query(Category).filter(
-        Category.slug.in_(["fruit-veg", "fruit-vegetables", "fresh-fruit", "fresh-vegetables"])
+    produce_cat_ids = category_tree.ids_for_slugs(PRODUCE_CATEGORY_SLUGS)
+    meat_cat_ids = category_tree.ids_for_slugs(MEAT_CATEGORY_SLUGS)
+    sections = {"produce": produce_cat_ids, "meat": meat_cat_ids}
+
+    # ========== Products: latest price per store product, one query ==========
+    def section_products(category_ids: set[int]):
+        # Bounded by `limit`, so the cost doesn't grow with the products table
+        return select(Product.id).where(Product.category_id.in_(category_ids)).limit(limit * 2)
+
+    chosen = [section_products(ids) for ids in sections.values() if ids]
+    product_rows = []
+    if chosen:
+        chosen_filter = or_(*(Product.id.in_(ids) for ids in chosen))
+        latest = (
+            select(
+                Price.store_product_id,
+                Price.price,
+                Price.unit_price,
+                func.row_number().over(
+                    partition_by=Price.store_product_id,
+                    order_by=(desc(Price.recorded_at), desc(Price.id)),
+                ).label("position"),
+            )
+            .join(StoreProduct, StoreProduct.id == Price.store_product_id)
+            .join(Product, Product.id == StoreProduct.product_id)
+            .where(chosen_filter)
+            .subquery()
+        )
+        product_rows = db.execute(
+            select(
+                Product.id,
+                Product.name,
+                Product.brand,
+                Product.size,
+                Product.image_url,
+                Product.category_id,
+                StoreProduct.store_id,
+                StoreProduct.image_url.label("store_image_url"),
+                latest.c.price,
+                latest.c.unit_price,
+            )
+            .join(StoreProduct, StoreProduct.product_id == Product.id)
+            .join(latest, and_(latest.c.store_product_id == StoreProduct.id, latest.c.position == 1))
+            .where(chosen_filter)
+            .order_by(Product.id)
+        ).all()
+
+    # ========== Specials: pre-classified projection rows, one query ==========
+    def section_specials(flag, category_ids: set[int]):
+        # Include uncategorized specials; the stored keyword flag decides
+        in_category = or_(CurrentSpecial.category_id.in_(category_ids), CurrentSpecial.category_id.is_(None))
+        return and_(flag, in_category) if category_ids else flag
+
+    special_rows = db.execute(
+        select(
+            CurrentSpecial.id,
+            CurrentSpecial.name,
+            CurrentSpecial.brand,
+            CurrentSpecial.size,
+            CurrentSpecial.store_id,
+            CurrentSpecial.price,
+            CurrentSpecial.unit_price,
+            CurrentSpecial.image_url,
+            CurrentSpecial.product_url,
+            CurrentSpecial.fresh_produce,
+            CurrentSpecial.fresh_meat,
+            CurrentSpecial.category_id,
+        )
+        .where(
+            CurrentSpecial.valid_to >= today,
+            or_(
+                section_specials(CurrentSpecial.fresh_produce.is_(True), produce_cat_ids),
+                section_specials(CurrentSpecial.fresh_meat.is_(True), meat_cat_ids),
+            ),
+        )
+        .order_by(CurrentSpecial.id)
     ).all()
-    produce_cat_ids = [c.id for c in produce_cats]
 
-    # Also include parent category if we have subcategories
-    produce_parent = db.query(Category).filter(Category.slug == "fruit-veg").first()
-    if produce_parent:
-        produce_cat_ids.append(produce_parent.id)
-        # Add all subcategory IDs
-        subcats = db.query(Category).filter(Category.parent_id == produce_parent.id).all()
-        produce_cat_ids.extend([c.id for c in subcats])
+    def build_item(product_id, first, category_name: str, store_prices: list[FreshFoodStorePrice]) -> FreshFoodItem:
+        prices_numeric = [float(sp.price) for sp in store_prices]
+        min_price = min(prices_numeric)
+        max_price = max(prices_numeric)
+        cheapest = next((sp for sp in store_prices if float(sp.price) == min_price), None)
+        return FreshFoodItem(
+            product_id=product_id,
+            product_name=first.name,
+            brand=first.brand,
+            size=first.size,
+            category=category_name,
+            stores=sorted(store_prices, key=lambda x: float(x.price)),
+            cheapest_store=cheapest.store_name if cheapest else None,
+            cheapest_price=Decimal(str(min_price)),
+            price_range=f"${min_price:.2f} - ${max_price:.2f}" if min_price != max_price else None
+        )
 
-    produce_cat_ids = list(set(produce_cat_ids))  # Dedupe
+    def products_items(category_name: str) -> list[FreshFoodItem]:
+        category_ids = sections[category_name]
+        by_product: dict[int, list] = {}
+        for row in product_rows:
+            if row.category_id in category_ids:
+                by_product.setdefault(row.id, []).append(row)
 
-    # Find meat categories
-    meat_cats = db.query(Category).filter(
-        Category.slug.in_(["meat-seafood", "poultry-meat-seafood", "beef-veal", "chicken", "pork", "lamb", "seafood"])
-    ).all()
-    meat_cat_ids = [c.id for c in meat_cats]
-
-    # Also include parent category
-    meat_parent = db.query(Category).filter(Category.slug == "meat-seafood").first()
-    if meat_parent:
-        meat_cat_ids.append(meat_parent.id)
-        subcats = db.query(Category).filter(Category.parent_id == meat_parent.id).all()
-        meat_cat_ids.extend([c.id for c in subcats])
-
-    meat_cat_ids = list(set(meat_cat_ids))  # Dedupe
-
-    # Get stores
-    stores = {s.id: s for s in db.query(Store).all()}
-
-    # Helper to get fresh food items from specials
-    def get_specials_items(category_ids: list[int], category_name: str, keyword_filter) -> list[FreshFoodItem]:
-        """Get fresh food items from the specials table."""
-        # Query specials - include both categorized and uncategorized items
-        specials_query = db.query(Special).join(Store).filter(
-            Special.valid_to >= today
-        )
+        items = []
+        seen_names = set()
+        for product_id, rows in by_product.items():
+            # Skip duplicates (same name)
+            name_key = rows[0].name.lower().strip()
+            if name_key in seen_names:
+                continue
+            seen_names.add(name_key)
 
-        if category_ids:
-            specials_query = specials_query.filter(
-                or_(
-                    Special.category_id.in_(category_ids),
-                    Special.category_id.is_(None)  # Include uncategorized for keyword matching
-                )
-            )
+            store_prices = []
+            for row in rows:
+                store = store_registry.get(row.store_id)
+                if not store:
+                    continue
+                store_prices.append(FreshFoodStorePrice(
+                    store_id=store.id,
+                    store_name=store.name,
+                    store_slug=store.slug,
+                    price=row.price,
+                    unit_price=f"${row.unit_price}/unit" if row.unit_price else None,
+                    image_url=row.store_image_url or row.image_url,
+                    product_url=None
+                ))
+            if not store_prices:
+                continue
 
-        specials = specials_query.all()
+            items.append(build_item(product_id, rows[0], category_name, store_prices))
+            if len(items) >= limit:
+                break
+        return items
 
+    def specials_items(category_name: str, flag: str) -> list[FreshFoodItem]:
+        category_ids = sections[category_name]
         # Group specials by product name (to find same product across stores)
-        product_groups: dict[str, list[Special]] = {}
-
-        for special in specials:
-            # Apply keyword filter
-            if not keyword_filter(special.name):
+        product_groups: dict[str, list] = {}
+        for row in special_rows:
+            if not getattr(row, flag):
                 continue
-
-            name_key = special.name.lower().strip()
-            if name_key not in product_groups:
-                product_groups[name_key] = []
-            product_groups[name_key].append(special)
+            if category_ids and row.category_id is not None and row.category_id not in category_ids:
+                continue
+            product_groups.setdefault(row.name.lower().strip(), []).append(row)
 
         items = []
-        for name_key, group in product_groups.items():
-            # Get unique prices from different stores
-            store_prices = []
-            prices_numeric = []
-            seen_stores = set()
-
+        for group in product_groups.values():
             # Sort by price to get cheapest first per store
             group.sort(key=lambda s: float(s.price))
 
+            store_prices = []
+            seen_stores = set()
             for special in group:
                 if special.store_id in seen_stores:
                     continue
                 seen_stores.add(special.store_id)
 
-                store = stores.get(special.store_id)
+                store = store_registry.get(special.store_id)
                 if not store:
                     continue
-
                 store_prices.append(FreshFoodStorePrice(
                     store_id=store.id,
                     store_name=store.name,
@@ -187,116 +226,15 @@ def get_fresh_foods(
                     image_url=special.image_url,
                     product_url=special.product_url
                 ))
-                prices_numeric.append(float(special.price))
-
             if not store_prices:
                 continue
 
-            min_price = min(prices_numeric)
-            max_price = max(prices_numeric)
-            cheapest = next((sp for sp in store_prices if float(sp.price) == min_price), None)
-
             # Use first special for product info
-            first = group[0]
-            items.append(FreshFoodItem(
-                product_id=first.id,
-                product_name=first.name,
-                brand=first.brand,
-                size=first.size,
-                category=category_name,
-                stores=sorted(store_prices, key=lambda x: float(x.price)),
-                cheapest_store=cheapest.store_name if cheapest else None,
-                cheapest_price=Decimal(str(min_price)),
-                price_range=f"${min_price:.2f} - ${max_price:.2f}" if min_price != max_price else None
-            ))
-
-            if len(items) >= limit:
-                break
-
-        return items
-
-    # Helper to get fresh food items from products table
-    def get_products_items(category_ids: list[int], category_name: str) -> list[FreshFoodItem]:
-        if not category_ids:
-            return []
-
-        # Get products with their store products and latest prices
-        products = db.query(Product).filter(
-            Product.category_id.in_(category_ids)
-        ).limit(limit * 2).all()  # Get more to filter duplicates
-
-        items = []
-        seen_names = set()
-
-        for product in products:
-            # Skip duplicates (same name)
-            name_key = product.name.lower().strip()
-            if name_key in seen_names:
-                continue
-            seen_names.add(name_key)
-
-            # Get all store products for this product
-            store_products = db.query(StoreProduct).filter(
-                StoreProduct.product_id == product.id
-            ).all()
-
-            if not store_products:
-                continue
-
-            store_prices = []
-            prices_numeric = []
-
-            for sp in store_products:
-                # Get latest price
-                latest_price = db.query(Price).filter(
-                    Price.store_product_id == sp.id
-                ).order_by(desc(Price.recorded_at)).first()
-
-                if latest_price and sp.store_id in stores:
-                    store = stores[sp.store_id]
-                    store_prices.append(FreshFoodStorePrice(
-                        store_id=store.id,
-                        store_name=store.name,
-                        store_slug=store.slug,
-                        price=latest_price.price,
-                        unit_price=f"${latest_price.unit_price}/unit" if latest_price.unit_price else None,
-                        image_url=sp.image_url or product.image_url,
-                        product_url=None
-                    ))
-                    prices_numeric.append(float(latest_price.price))
-
-            if not store_prices:
-                continue
-
-            # Calculate cheapest and price range
-            min_price = min(prices_numeric)
-            max_price = max(prices_numeric)
-            cheapest = next((sp for sp in store_prices if float(sp.price) == min_price), None)
-
-            items.append(FreshFoodItem(
-                product_id=product.id,
-                product_name=product.name,
-                brand=product.brand,
-                size=product.size,
-                category=category_name,
-                stores=sorted(store_prices, key=lambda x: float(x.price)),
-                cheapest_store=cheapest.store_name if cheapest else None,
-                cheapest_price=Decimal(str(min_price)),
-                price_range=f"${min_price:.2f} - ${max_price:.2f}" if min_price != max_price else None
-            ))
-
+            items.append(build_item(group[0].id, group[0], category_name, store_prices))
             if len(items) >= limit:
                 break
-
         return items
 
-    # Get items from both products table AND specials table
-    produce_from_products = get_products_items(produce_cat_ids, "produce")
-    produce_from_specials = get_specials_items(produce_cat_ids, "produce", _is_fresh_produce)
-
-    meat_from_products = get_products_items(meat_cat_ids, "meat")
-    meat_from_specials = get_specials_items(meat_cat_ids, "meat", _is_fresh_meat)
-
     # Merge results (avoid duplicates by name)
     def merge_items(from_products: list[FreshFoodItem], from_specials: list[FreshFoodItem]) -> list[FreshFoodItem]:
         seen_names = {item.product_name.lower().strip() for item in from_products}
@@ -307,8 +245,8 @@ def get_fresh_foods(
                 seen_names.add(item.product_name.lower().strip())
         return merged[:limit]
 
-    produce_items = merge_items(produce_from_products, produce_from_specials)
-    meat_items = merge_items(meat_from_products, meat_from_specials)
+    produce_items = merge_items(products_items("produce"), specials_items("produce", "fresh_produce"))
+    meat_items = merge_items(products_items("meat"), specials_items("meat", "fresh_meat"))
 
     return FreshFoodsResponse(
         produce=produce_items,
@@ -343,7 +281,7 @@ def compare_product(product_id: int, db: Session = Depends(get_db)):
         ).order_by(desc(Price.recorded_at)).first()
 
         if latest_price:
-            store = db.query(Store).filter(Store.id == sp.store_id).first()
+            store = store_registry.get(sp.store_id)
 
             store_price = StorePrice(
                 store_id=store.id,
@@ -388,45 +326,118 @@ def compare_basket(
     product_ids: list[int],
     db: Session = Depends(get_db)
 ):
-    """Compare total basket price across stores."""
-    stores = db.query(Store).all()
-    store_totals = {store.slug: {"store_name": store.name, "total": Decimal(0), "items_found": 0, "items_missing": []} for store in stores}
-
-    for product_id in product_ids:
-        product = db.query(Product).filter(Product.id == product_id).first()
-        if not product:
-            continue
-
-        for store in stores:
-            sp = db.query(StoreProduct).filter(
-                StoreProduct.product_id == product_id,
-                StoreProduct.store_id == store.id
-            ).first()
-
-            if sp:
-                latest_price = db.query(Price).filter(
-                    Price.store_product_id == sp.id
-                ).order_by(desc(Price.recorded_at)).first()
-
-                if latest_price:
-                    store_totals[store.slug]["total"] += latest_price.price
-                    store_totals[store.slug]["items_found"] += 1
-                else:
-                    store_totals[store.slug]["items_missing"].append(product.name)
-            else:
-                store_totals[store.slug]["items_missing"].append(product.name)
+    """Compare total basket price across stores, plus the cheapest mixed-store split."""
+    matrix = load_product_prices(db, [BasketLine(item_id=product_id) for product_id in product_ids])
+    quote = price_basket(matrix, skip_unknown=True)
+
+    store_totals = {}
+    for total in quote.store_totals:
+        store = store_registry.get(total.store_id)
+        store_totals[store.slug] = {
+            "store_name": store.name,
+            "total": Decimal(total.total_cents) / 100,
+            "items_found": total.items_found,
+            "items_missing": total.items_missing,
+        }
 
     # Find cheapest
     cheapest = min(store_totals.items(), key=lambda x: x[1]["total"])
 
+    mixed_stores: dict[str, list[str]] = {}
+    for line in quote.split:
+        mixed_stores.setdefault(store_registry.get(line.store_id).slug, []).append(line.name)
+
     return {
         "basket_size": len(product_ids),
         "store_totals": store_totals,
         "cheapest_store": cheapest[0],
-        "cheapest_total": float(cheapest[1]["total"])
+        "cheapest_total": float(cheapest[1]["total"]),
+        "mixed_basket": {
+            "total": quote.split_total_cents / 100,
+            "stores": mixed_stores,
+            "items_missing": quote.split_missing,
+        },
     }
 
 
+def _display_cents(cents: int) -> str:
+    return f"${cents / 100:.2f}"
+
+
+@router.post("/basket/optimize", response_model=BasketOptimizeResponse)
+def optimize_basket_plan(
+    request: BasketOptimizeRequest,
+    db: Session = Depends(get_db)
+):
+    """
+    Cheapest way to buy a basket across stores.
+
+    Respects a limit on stores visited and a fixed cost per store (travel,
+    delivery), optionally swapping in like-for-like products. Item prices
+    are cached, so re-running with different constraints is near-instant.
+    """
+    if request.max_stores is not None and request.max_stores < 1:
+        raise HTTPException(status_code=400, detail="max_stores must be at least 1")
+    if not 1 <= request.time_budget_ms <= 2000:
+        raise HTTPException(status_code=400, detail="time_budget_ms must be between 1 and 2000")
+    if any(item.quantity < 1 for item in request.items):
+        raise HTTPException(status_code=400, detail="Quantities must be at least 1")
+
+    store_costs = {}
+    for slug, cost in request.store_costs.items():
+        store = store_registry.by_slug(slug)
+        if not store:
+            raise HTTPException(status_code=400, detail=f"Unknown store: {slug}")
+        store_costs[store.id] = int(cost * 100)
+
+    plan = optimize_basket(
+        db,
+        [BasketLine(item_id=item.product_id, quantity=item.quantity) for item in request.items],
+        max_stores=request.max_stores,
+        store_costs=store_costs,
+        allow_substitutes=request.allow_substitutes,
+        time_budget_ms=request.time_budget_ms,
+    )
+
+    lines = []
+    for assignment in plan.assignments:
+        store = store_registry.get(assignment.store_id)
+        lines.append(BasketOptimizeLine(
+            product_id=assignment.line.item_id,
+            product_name=assignment.name,
+            quantity=assignment.line.quantity,
+            store_slug=store.slug,
+            store_name=store.name,
+            bought_product_id=assignment.offer.product_id,
+            bought_product_name=assignment.offer.product_name,
+            substituted=assignment.substituted,
+            price=_display_cents(assignment.offer.unit_cents),
+            price_numeric=assignment.offer.unit_cents,
+        ))
+
+    single_store = store_registry.get(plan.best_single_store) if plan.best_single_store else None
+    return BasketOptimizeResponse(
+        stores=[store_registry.get(store_id).slug for store_id in plan.stores],
+        lines=lines,
+        items_missing=plan.missing,
+        unknown_product_ids=plan.unknown,
+        items_total=_display_cents(plan.items_cents),
+        store_costs_total=_display_cents(plan.store_costs_cents),
+        total=_display_cents(plan.total_cents),
+        total_numeric=plan.total_cents,
+        best_single_store=single_store.slug if single_store else None,
+        best_single_store_total=(
+            _display_cents(plan.best_single_store_cents) if single_store else None
+        ),
+        savings_vs_single_store=(
+            plan.best_single_store_cents - plan.total_cents if single_store else None
+        ),
+        solver=plan.solver,
+        exact=plan.exact,
+        elapsed_ms=round(plan.elapsed_ms, 3),
+    )
+
+
 # ============== Category/Type Comparison Endpoints ==============
 
 @router.get("/type/search", response_model=list[ProductTypeSuggestion])
@@ -554,7 +565,7 @@ def _get_product_store_prices(db: Session, product_id: int) -> list[StorePrice]:
         ).order_by(desc(Price.recorded_at)).first()
 
         if latest_price:
-            store = db.query(Store).filter(Store.id == sp.store_id).first()
+            store = store_registry.get(sp.store_id)
             if store:
                 store_prices.append(StorePrice(
                     store_id=store.id,
@@ -572,6 +583,22 @@ def _get_product_store_prices(db: Session, product_id: int) -> list[StorePrice]:
 
 # ============== Specials Comparison Endpoints ==============
 
+def _projection_store_price(special: CurrentSpecial) -> SpecialStorePrice:
+    return SpecialStorePrice(
+        special_id=special.id,
+        store_id=special.store_id,
+        store_name=special.store_name,
+        store_slug=special.store_slug,
+        price=special.price,
+        was_price=special.was_price,
+        discount_percent=special.reported_discount_percent,
+        unit_price=special.unit_price,
+        image_url=special.image_url,
+        product_url=special.product_url,
+        valid_to=special.valid_to
+    )
+
+
 @router.get("/specials/brand-match", response_model=list[BrandMatchResult])
 def compare_specials_brand_match(
     search: str = Query(..., min_length=2, description="Product name to search for"),
@@ -588,26 +615,18 @@ def compare_specials_brand_match(
     today = date.today()
 
     # Search for matching specials across stores
-    specials = db.query(Special).join(Store).filter(
-        Special.valid_to >= today,
-        or_(
-            Special.name.ilike(f"%{search}%"),
-            Special.brand.ilike(f"%{search}%")
-        )
-    ).order_by(Special.name, Special.price).all()
+    specials = db.query(CurrentSpecial).filter(
+        CurrentSpecial.valid_to >= today,
+        projection_search_condition(search)
+    ).order_by(CurrentSpecial.name, CurrentSpecial.price).all()
 
     if not specials:
         return []
 
-    # Group by normalized product name (name + size)
-    product_groups: dict[str, list[Special]] = {}
-
+    # Group by the precomputed product key (brand + name + size)
+    product_groups: dict[str, list[CurrentSpecial]] = {}
     for special in specials:
-        # Create a key from brand + name + size for exact matching
-        key = _normalize_product_key(special.name, special.brand, special.size)
-        if key not in product_groups:
-            product_groups[key] = []
-        product_groups[key].append(special)
+        product_groups.setdefault(special.product_key, []).append(special)
 
     results = []
     for key, group in product_groups.items():
@@ -624,19 +643,7 @@ def compare_specials_brand_match(
                 store_prices[store_id] = special
 
         stores = [
-            SpecialStorePrice(
-                special_id=s.id,
-                store_id=s.store_id,
-                store_name=s.store.name,
-                store_slug=s.store.slug,
-                price=s.price,
-                was_price=s.was_price,
-                discount_percent=s.discount_percent,
-                unit_price=s.unit_price,
-                image_url=s.image_url,
-                product_url=s.product_url,
-                valid_to=s.valid_to
-            )
+            _projection_store_price(s)
             for s in sorted(store_prices.values(), key=lambda x: x.price)
         ]
 
@@ -678,7 +685,7 @@ def compare_specials_type_match(
     today = date.today()
 
     # Get the reference special
-    reference = db.query(Special).join(Store).filter(
+    reference = db.query(Special).filter(
         Special.id == special_id
     ).first()
 
@@ -686,52 +693,25 @@ def compare_specials_type_match(
         raise HTTPException(status_code=404, detail="Special not found")
 
     # Extract product type (remove brand from name)
-    product_type = _extract_special_type(reference.name, reference.brand)
+    product_type = extract_special_type(reference.name, reference.brand)
 
     # Get category info
-    category_name = None
-    if reference.category_id:
-        category = db.query(Category).filter(Category.id == reference.category_id).first()
-        if category:
-            category_name = category.name
-
-    # Find similar products
-    # Strategy: Match on extracted product type within same category
-    similar_query = db.query(Special).join(Store).filter(
-        Special.valid_to >= today,
-        Special.id != special_id
-    )
+    category = category_tree.get(reference.category_id)
+    category_name = category.name if category else None
+
+    # Candidates share a type word with the reference (within its category
+    # and size); confirm each with the full type check
+    candidates = db.query(CurrentSpecial).filter(
+        CurrentSpecial.id.in_(similar_type_candidates(product_type, reference.category_id, reference.size)),
+        CurrentSpecial.valid_to >= today,
+        CurrentSpecial.id != special_id
+    ).all()
 
-    # Filter by category if available
-    if reference.category_id:
-        similar_query = similar_query.filter(Special.category_id == reference.category_id)
-
-    # Filter by size if available (exact match on size)
-    if reference.size:
-        similar_query = similar_query.filter(Special.size == reference.size)
-
-    # Get all candidates and filter by product type match
-    candidates = similar_query.all()
-
-    similar_products = []
-    for candidate in candidates:
-        candidate_type = _extract_special_type(candidate.name, candidate.brand)
-
-        # Check if product types are similar enough
-        if _is_similar_type(product_type, candidate_type):
-            similar_products.append(SpecialStorePrice(
-                special_id=candidate.id,
-                store_id=candidate.store_id,
-                store_name=candidate.store.name,
-                store_slug=candidate.store.slug,
-                price=candidate.price,
-                was_price=candidate.was_price,
-                discount_percent=candidate.discount_percent,
-                unit_price=candidate.unit_price,
-                image_url=candidate.image_url,
-                product_url=candidate.product_url,
-                valid_to=candidate.valid_to
-            ))
+    similar_products = [
+        _projection_store_price(candidate)
+        for candidate in candidates
+        if is_similar_type(product_type, extract_special_type(candidate.name, candidate.brand))
+    ]
 
     # Sort by price ascending
     similar_products.sort(key=lambda x: x.price)
@@ -740,8 +720,8 @@ def compare_specials_type_match(
     reference_price = SpecialStorePrice(
         special_id=reference.id,
         store_id=reference.store_id,
-        store_name=reference.store.name,
-        store_slug=reference.store.slug,
+        store_name=store_registry.get(reference.store_id).name,
+        store_slug=store_registry.get(reference.store_id).slug,
         price=reference.price,
         was_price=reference.was_price,
         discount_percent=reference.discount_percent,
@@ -785,7 +765,7 @@ def get_brand_products(
     today = date.today()
 
     # Get the reference special
-    reference = db.query(Special).join(Store).filter(
+    reference = db.query(Special).filter(
         Special.id == special_id
     ).first()
 
@@ -804,8 +784,8 @@ def get_brand_products(
         reference_price = SpecialStorePrice(
             special_id=reference.id,
             store_id=reference.store_id,
-            store_name=reference.store.name,
-            store_slug=reference.store.slug,
+            store_name=store_registry.get(reference.store_id).name,
+            store_slug=store_registry.get(reference.store_id).slug,
             price=reference.price,
             was_price=reference.was_price,
             discount_percent=reference.discount_percent,
@@ -820,11 +800,11 @@ def get_brand_products(
             brand_products=[],
             cheapest_price=reference.price,
             total_products=1,
-            stores_with_brand=[reference.store.name]
+            stores_with_brand=[store_registry.get(reference.store_id).name]
         )
 
     # Find all products with this brand across all stores
-    brand_specials = db.query(Special).join(Store).filter(
+    brand_specials = db.query(Special).filter(
         Special.valid_to >= today,
         Special.brand.ilike(brand)  # Case-insensitive brand match
     ).order_by(Special.price).all()
@@ -833,8 +813,8 @@ def get_brand_products(
     reference_price = SpecialStorePrice(
         special_id=reference.id,
         store_id=reference.store_id,
-        store_name=reference.store.name,
-        store_slug=reference.store.slug,
+        store_name=store_registry.get(reference.store_id).name,
+        store_slug=store_registry.get(reference.store_id).slug,
         price=reference.price,
         was_price=reference.was_price,
         discount_percent=reference.discount_percent,
@@ -847,16 +827,16 @@ def get_brand_products(
     # Build list of other brand products (excluding reference)
     brand_products = []
     stores_with_brand = set()
-    stores_with_brand.add(reference.store.name)
+    stores_with_brand.add(store_registry.get(reference.store_id).name)
 
     for special in brand_specials:
-        stores_with_brand.add(special.store.name)
+        stores_with_brand.add(store_registry.get(special.store_id).name)
         if special.id != reference.id:
             brand_products.append(SpecialStorePrice(
                 special_id=special.id,
                 store_id=special.store_id,
-                store_name=special.store.name,
-                store_slug=special.store.slug,
+                store_name=store_registry.get(special.store_id).name,
+                store_slug=store_registry.get(special.store_id).slug,
                 price=special.price,
                 was_price=special.was_price,
                 discount_percent=special.discount_percent,
@@ -879,108 +859,3 @@ def get_brand_products(
         stores_with_brand=sorted(list(stores_with_brand))
     )
 
-
-def _normalize_product_key(name: str, brand: str | None, size: str | None) -> str:
-    """Create a normalized key for grouping identical products."""
-    parts = []
-    if brand:
-        parts.append(brand.lower().strip())
-    parts.append(name.lower().strip())
-    if size:
-        parts.append(size.lower().strip())
-    return "|".join(parts)
-
-
-def _extract_special_type(name: str, brand: str | None) -> str:
-    """Extract the product type from a special name (removing brand)."""
-    product_type = name
-
-    if brand:
-        # Remove brand from the beginning of the name
-        brand_pattern = re.compile(re.escape(brand), re.IGNORECASE)
-        product_type = brand_pattern.sub("", product_type).strip()
-
-        # If removing brand leaves empty string, use original name
-        if not product_type:
-            product_type = name
-
-    # Remove size info from the end (e.g., "180g", "2L", "500ml")
-    product_type = re.sub(r'\s*\d+\s*(g|kg|ml|l|pk|pack|each)\s*$', '', product_type, flags=re.IGNORECASE)
-
-    # Clean up extra whitespace and punctuation
-    product_type = re.sub(r'\s+', ' ', product_type).strip()
-    product_type = product_type.strip('| -')
-
-    return product_type
-
-
-def _is_similar_type(type1: str, type2: str) -> bool:
-    """Check if two product types are similar enough to compare."""
-    t1 = type1.lower().strip()
-    t2 = type2.lower().strip()
-
-    # Skip empty types
-    if not t1 or not t2:
-        return False
-
-    # Exact match
-    if t1 == t2:
-        return True
-
-    # Normalize common plurals for produce
-    def normalize_plural(s: str) -> str:
-        # Handle common plural patterns
-        if s.endswith('oes'):  # mangoes -> mango, tomatoes -> tomato
-            return s[:-2]
-        if s.endswith('ies'):  # cherries -> cherry
-            return s[:-3] + 'y'
-        if s.endswith('es'):   # peaches -> peach
-            return s[:-2]
-        if s.endswith('s'):    # apples -> apple
-            return s[:-1]
-        return s
-
-    t1_norm = normalize_plural(t1)
-    t2_norm = normalize_plural(t2)
-
-    # Check normalized exact match
-    if t1_norm == t2_norm:
-        return True
-
-    # Containment check - but only for meaningful lengths (>3 chars)
-    # This prevents "s" or "es" from matching everything
-    if len(t1) > 3 and len(t2) > 3:
-        if t1 in t2 or t2 in t1:
-            return True
-        if t1_norm in t2_norm or t2_norm in t1_norm:
-            return True
-
-    # Word overlap check
-    words1 = set(t1.split())
-    words2 = set(t2.split())
-
-    # Remove common filler words
-    common_words = {'the', 'a', 'an', 'and', 'or', 'of', 'with', 'in', 'on',
-                    'fresh', 'australian', 'coles', 'woolworths', 'aldi', 'iga'}
-    words1 = words1 - common_words
-    words2 = words2 - common_words
-
-    if not words1 or not words2:
-        return False
-
-    # Normalize words for comparison
-    words1_norm = {normalize_plural(w) for w in words1}
-    words2_norm = {normalize_plural(w) for w in words2}
-
-    # Check for overlap in normalized words
-    overlap = len(words1_norm & words2_norm)
-
-    # For produce (typically 1-2 significant words), require actual word match
-    min_words = min(len(words1_norm), len(words2_norm))
-
-    if min_words <= 2:
-        # Must have at least 1 word in common
-        return overlap >= 1
-    else:
-        # For longer product names, 50% overlap is ok
-        return overlap >= min_words / 2
@@ -2,16 +2,19 @@
 Price history router for viewing historical price data.
 """
 from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import func, desc
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import func, select
 from pydantic import BaseModel
 from typing import Optional
 from datetime import datetime, timedelta
 from decimal import Decimal
 
-from ..database import get_db
+from ..database import get_async_db
 from .auth import get_current_user, require_premium
-from ..models import Product, Price, Store, User, StoreProduct
+from ..services.cursors import InvalidCursor, decode_cursor, encode_cursor, filter_fingerprint, keyset_condition
+from ..services.price_rollups import chart_period, period_start
+from ..services.store_registry import store_registry
+from ..models import LatestPrice, Product, Price, PriceRollup, User, StoreProduct
 
 router = APIRouter(prefix="/history", tags=["history"])
 
@@ -31,6 +34,7 @@ class PriceHistoryResponse(BaseModel):
     product_brand: Optional[str]
     history: list[PricePoint]
     stats: dict
+    next_cursor: Optional[str] = None  # Set when `limit` cut the history short
 
 
 @router.get("/{product_id}", response_model=PriceHistoryResponse)
@@ -38,12 +42,19 @@ async def get_price_history(
     product_id: int,
     days: int = Query(90, ge=7, le=365, description="Number of days of history"),
     store_id: Optional[int] = Query(None, description="Filter by store"),
+    limit: Optional[int] = Query(None, ge=1, le=1000, description="Page size (default: whole range)"),
+    cursor: Optional[str] = Query(None, description="Keyset cursor from the previous page's next_cursor"),
     current_user: User = Depends(require_premium),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Get price history for a product. Premium feature."""
+    """
+    Get price history for a product. Premium feature.
+
+    With `limit`, history is paged oldest first by (recorded_at, id); stats
+    always cover the whole range.
+    """
     # Get product
-    product = db.query(Product).filter(Product.id == product_id).first()
+    product = await db.get(Product, product_id)
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
 
@@ -51,63 +62,85 @@ async def get_price_history(
     end_date = datetime.utcnow()
     start_date = end_date - timedelta(days=days)
 
-    # Build query through StoreProduct
-    query = db.query(Price, StoreProduct, Store).join(
-        StoreProduct, Price.store_product_id == StoreProduct.id
-    ).join(
-        Store, StoreProduct.store_id == Store.id
-    ).filter(
+    # Prices of this product in range, through StoreProduct
+    in_range = [
         StoreProduct.product_id == product_id,
-        Price.recorded_at >= start_date
-    )
-
+        Price.recorded_at >= start_date,
+    ]
     if store_id:
-        query = query.filter(StoreProduct.store_id == store_id)
-
-    results = query.order_by(Price.recorded_at).all()
+        in_range.append(StoreProduct.store_id == store_id)
 
-    # Build history list
-    history = [
-        PricePoint(
+    query = select(Price, StoreProduct).join(
+        StoreProduct, Price.store_product_id == StoreProduct.id
+    ).filter(*in_range)
+
+    order = [(Price.recorded_at, False), (Price.id, False)]
+    fingerprint = filter_fingerprint(product_id=product_id, days=days, store_id=store_id)
+    if cursor:
+        try:
+            position = decode_cursor(cursor, "recorded", "asc", fingerprint, len(order))
+        except InvalidCursor as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        query = query.filter(keyset_condition(order, position.keys))
+
+    query = query.order_by(Price.recorded_at, Price.id)
+    if limit:
+        query = query.limit(limit + 1)
+    results = (await db.execute(query)).all()
+
+    next_cursor = None
+    if limit and len(results) > limit:
+        results = results[:limit]
+        last = results[-1][0]
+        next_cursor = encode_cursor("recorded", "asc", [last.recorded_at, last.id], fingerprint)
+
+    # Build history list (store names from the registry, no join on stores)
+    history = []
+    for price, sp in results:
+        store = store_registry.get(sp.store_id)
+        if store is None:
+            continue  # Unknown store: dropped, as the join on stores did
+        history.append(PricePoint(
             date=price.recorded_at.strftime("%Y-%m-%d"),
             price=float(price.price),
             is_special=price.is_special or False,
             store_name=store.name,
             store_slug=store.slug
-        )
-        for price, sp, store in results
-    ]
-
-    # Calculate stats
-    if results:
-        price_values = [float(price.price) for price, sp, store in results]
-
-        # Get current prices (most recent per store)
-        recent_query = db.query(Price, StoreProduct).join(
+        ))
+
+    # Stats over the whole range, aggregated in the database
+    totals = (await db.execute(
+        select(
+            func.min(Price.price),
+            func.max(Price.price),
+            func.avg(Price.price),
+            func.count(Price.id),
+            func.count(Price.id).filter(Price.is_special.is_(True)),
+        ).join(
             StoreProduct, Price.store_product_id == StoreProduct.id
-        ).filter(
-            StoreProduct.product_id == product_id
-        ).order_by(desc(Price.recorded_at))
-
-        recent_results = recent_query.all()
-        seen_stores = set()
-        current_prices = []
-        for price, sp in recent_results:
-            if sp.store_id not in seen_stores:
-                current_prices.append(float(price.price))
-                seen_stores.add(sp.store_id)
+        ).filter(*in_range)
+    )).one()
+    min_price, max_price, avg_price, price_points, special_count = totals
+
+    if price_points:
+        # Current prices (most recent per store), one row per store
+        current_prices = [
+            float(price) for price in (await db.scalars(
+                select(LatestPrice.price).where(LatestPrice.product_id == product_id)
+            ))
+        ]
 
         current_min = min(current_prices) if current_prices else None
         current_max = max(current_prices) if current_prices else None
 
         stats = {
-            "min_price": min(price_values),
-            "max_price": max(price_values),
-            "avg_price": round(sum(price_values) / len(price_values), 2),
+            "min_price": float(min_price),
+            "max_price": float(max_price),
+            "avg_price": round(float(avg_price), 2),
             "current_min": current_min,
             "current_max": current_max,
-            "price_points": len(results),
-            "special_count": sum(1 for price, sp, store in results if price.is_special),
+            "price_points": price_points,
+            "special_count": special_count,
         }
     else:
         stats = {
@@ -125,7 +158,8 @@ async def get_price_history(
         product_name=product.name,
         product_brand=product.brand,
         history=history,
-        stats=stats
+        stats=stats,
+        next_cursor=next_cursor
     )
 
 
@@ -133,40 +167,42 @@ async def get_price_history(
 async def get_price_summary(
     product_id: int,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get a quick price summary (available to all users, limited data)."""
-    product = db.query(Product).filter(Product.id == product_id).first()
+    product = await db.get(Product, product_id)
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
 
-    # Get 30-day stats
+    # 30-day stats from the daily rollups
     thirty_days_ago = datetime.utcnow() - timedelta(days=30)
-    recent_query = db.query(Price, StoreProduct).join(
-        StoreProduct, Price.store_product_id == StoreProduct.id
-    ).filter(
-        StoreProduct.product_id == product_id,
-        Price.recorded_at >= thirty_days_ago
-    ).order_by(desc(Price.recorded_at))
-
-    recent_results = recent_query.all()
-
-    if recent_results:
-        price_values = [float(price.price) for price, sp in recent_results]
-        min_30d = min(price_values)
-        max_30d = max(price_values)
-        avg_30d = round(sum(price_values) / len(price_values), 2)
-
-        # Get current prices (most recent per store)
-        seen_stores = set()
-        current_prices = []
-        has_special = False
-        for price, sp in recent_results:
-            if sp.store_id not in seen_stores:
-                current_prices.append(float(price.price))
-                seen_stores.add(sp.store_id)
-                if price.is_special:
-                    has_special = True
+    min_30d, max_30d, price_sum, price_count = (await db.execute(
+        select(
+            func.min(PriceRollup.min_price),
+            func.max(PriceRollup.max_price),
+            func.sum(PriceRollup.price_sum),
+            func.sum(PriceRollup.price_count),
+        ).where(
+            PriceRollup.product_id == product_id,
+            PriceRollup.period == "day",
+            PriceRollup.period_start >= thirty_days_ago.date(),
+        )
+    )).one()
+
+    if price_count:
+        min_30d = float(min_30d)
+        max_30d = float(max_30d)
+        avg_30d = round(float(price_sum) / price_count, 2)
+
+        # Current prices (most recent per store, if seen in the last 30 days)
+        latest = (await db.execute(
+            select(LatestPrice.price, LatestPrice.is_special).where(
+                LatestPrice.product_id == product_id,
+                LatestPrice.recorded_at >= thirty_days_ago,
+            )
+        )).all()
+        current_prices = [float(price) for price, _ in latest]
+        has_special = any(is_special for _, is_special in latest)
 
         current_min = min(current_prices) if current_prices else None
         current_max = max(current_prices) if current_prices else None
@@ -198,39 +234,50 @@ async def get_price_summary(
 @router.get("/{product_id}/chart-data")
 async def get_chart_data(
     product_id: int,
-    days: int = Query(90, ge=7, le=365),
+    days: int = Query(90, ge=7, le=1095),
     current_user: User = Depends(require_premium),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Get aggregated chart data for a product by store. Premium feature."""
-    product = db.query(Product).filter(Product.id == product_id).first()
+    """
+    Get aggregated chart data for a product by store. Premium feature.
+
+    Points are the closing price per day, week or month (whichever keeps the
+    range within a few dozen points), read from the price rollups.
+    """
+    product = await db.get(Product, product_id)
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
 
     end_date = datetime.utcnow()
     start_date = end_date - timedelta(days=days)
-
-    # Get all stores
-    stores = db.query(Store).all()
-
-    # Get prices grouped by date and store
-    results = db.query(Price, StoreProduct, Store).join(
-        StoreProduct, Price.store_product_id == StoreProduct.id
-    ).join(
-        Store, StoreProduct.store_id == Store.id
-    ).filter(
-        StoreProduct.product_id == product_id,
-        Price.recorded_at >= start_date
-    ).order_by(Price.recorded_at).all()
-
-    # Group by date
+    period = chart_period(days)
+
+    stores = store_registry.all()
+
+    rollups = (await db.execute(
+        select(
+            PriceRollup.period_start,
+            PriceRollup.store_id,
+            PriceRollup.close_price,
+            PriceRollup.special_count,
+        ).where(
+            PriceRollup.product_id == product_id,
+            PriceRollup.period == period,
+            PriceRollup.period_start >= period_start(period, start_date.date()),
+        ).order_by(PriceRollup.period_start)
+    )).all()
+
+    # Group by period
     date_data = {}
-    for price, sp, store in results:
-        date_str = price.recorded_at.strftime("%Y-%m-%d")
+    for start, store_id, close_price, special_count in rollups:
+        store = store_registry.get(store_id)
+        if store is None:
+            continue
+        date_str = start.strftime("%Y-%m-%d")
         if date_str not in date_data:
             date_data[date_str] = {"date": date_str}
-        date_data[date_str][store.slug] = float(price.price)
-        if price.is_special:
+        date_data[date_str][store.slug] = float(close_price)
+        if special_count:
             date_data[date_str][f"{store.slug}_special"] = True
 
     # Convert to list sorted by date
@@ -245,6 +292,7 @@ async def get_chart_data(
     return {
         "product_name": product.name,
         "product_brand": product.brand,
+        "resolution": period,
         "data": chart_data,
         "stores": store_info,
     }
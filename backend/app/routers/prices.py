@@ -4,6 +4,7 @@ from sqlalchemy import desc
 from app.database import get_db
 from app.models import Price, StoreProduct, Product, Store
 from app.schemas.price import Price as PriceSchema, SpecialItem
+from app.services.store_registry import store_registry
 
 router = APIRouter(prefix="/prices", tags=["prices"])
 
@@ -27,7 +28,7 @@ def get_latest_prices(product_id: int, db: Session = Depends(get_db)):
         ).order_by(desc(Price.recorded_at)).first()
 
         if latest_price:
-            store = db.query(Store).filter(Store.id == sp.store_id).first()
+            store = store_registry.get(sp.store_id)
             result.append({
                 "store_id": store.id,
                 "store_name": store.name,
@@ -134,7 +135,7 @@ def get_store_specials(
     db: Session = Depends(get_db)
 ):
     """Get current specials for a specific store."""
-    store = db.query(Store).filter(Store.slug == store_slug).first()
+    store = store_registry.by_slug(store_slug)
     if not store:
         raise HTTPException(status_code=404, detail="Store not found")
 
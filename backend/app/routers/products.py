@@ -1,9 +1,11 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import or_, func, desc
+from sqlalchemy.orm import Session
+from sqlalchemy import func, desc
 from app.database import get_db
-from app.models import Product, Category, Price, Store, StoreProduct
+from app.models import Product, Category, Price, StoreProduct
 from app.schemas.product import Product as ProductSchema, ProductCreate, ProductWithPrices, StorePriceInfo
+from app.services.search_index import search_condition, search_rank
+from app.services.store_registry import store_registry
 
 router = APIRouter(prefix="/products", tags=["products"])
 
@@ -35,12 +37,10 @@ def search_products(
     db: Session = Depends(get_db)
 ):
     """Search products by name or brand."""
-    query = db.query(Product).filter(
-        or_(
-            Product.name.ilike(f"%{q}%"),
-            Product.brand.ilike(f"%{q}%")
-        )
-    )
+    query = db.query(Product).filter(search_condition(Product, q))
+    rank = search_rank(Product, q)
+    if rank is not None:
+        query = query.order_by(rank.desc())
     return query.limit(limit).all()
 
 
@@ -67,12 +67,7 @@ def list_products_with_prices(
         query = query.filter(Product.category_id == category_id)
 
     if search:
-        query = query.filter(
-            or_(
-                Product.name.ilike(f"%{search}%"),
-                Product.brand.ilike(f"%{search}%")
-            )
-        )
+        query = query.filter(search_condition(Product, search))
 
     # Get products
     products = query.offset(skip).limit(limit).all()
@@ -89,7 +84,7 @@ def list_products_with_prices(
     # Get all store products for these products
     store_products = db.query(StoreProduct).filter(
         StoreProduct.product_id.in_(product_ids)
-    ).options(joinedload(StoreProduct.store)).all()
+    ).all()
 
     # Group store_products by product_id
     sp_map: dict[int, list] = {}
@@ -149,8 +144,8 @@ def list_products_with_prices(
                 price_map[sp.product_id] = []
             price_map[sp.product_id].append(StorePriceInfo(
                 store_id=sp.store_id,
-                store_name=sp.store.name,
-                store_slug=sp.store.slug,
+                store_name=store_registry.get(sp.store_id).name,
+                store_slug=store_registry.get(sp.store_id).slug,
                 price=price.price,
                 unit_price=price.unit_price,
                 was_price=price.was_price,
@@ -193,12 +188,11 @@ def search_products_with_prices(
     from datetime import datetime, timedelta
 
     # Search products
-    products = db.query(Product).filter(
-        or_(
-            Product.name.ilike(f"%{q}%"),
-            Product.brand.ilike(f"%{q}%")
-        )
-    ).limit(limit).all()
+    query = db.query(Product).filter(search_condition(Product, q))
+    rank = search_rank(Product, q)
+    if rank is not None:
+        query = query.order_by(rank.desc())
+    products = query.limit(limit).all()
 
     if not products:
         return []
@@ -208,7 +202,7 @@ def search_products_with_prices(
     # Get all store products for these products
     store_products = db.query(StoreProduct).filter(
         StoreProduct.product_id.in_(product_ids)
-    ).options(joinedload(StoreProduct.store)).all()
+    ).all()
 
     sp_ids = [sp.id for sp in store_products]
     if not sp_ids:
@@ -252,8 +246,8 @@ def search_products_with_prices(
                 price_map[sp.product_id] = []
             price_map[sp.product_id].append(StorePriceInfo(
                 store_id=sp.store_id,
-                store_name=sp.store.name,
-                store_slug=sp.store.slug,
+                store_name=store_registry.get(sp.store_id).name,
+                store_slug=store_registry.get(sp.store_id).slug,
                 price=price.price,
                 unit_price=price.unit_price,
                 was_price=price.was_price,
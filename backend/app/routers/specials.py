@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException, Query, Header
+from fastapi import APIRouter, Depends, HTTPException, Query, Header, Response
 from sqlalchemy.orm import Session
 from sqlalchemy import func, or_, desc
 from datetime import date, datetime
@@ -6,81 +6,12 @@ from typing import Optional, List, Tuple
 
 from app.database import get_db
 from app.config import get_settings
-from app.models import Special, Store, ScrapeLog, Category
-
-
-# Search term to category slug mapping for smart search
-# When user searches for these terms, filter to the matching category instead of text search
-SEARCH_CATEGORY_MAP = {
-    # Sauces & Condiments
-    "sauce": "sauces-condiments",
-    "sauces": "sauces-condiments",
-    "ketchup": "sauces-condiments",
-    "mayonnaise": "sauces-condiments",
-    "mustard": "sauces-condiments",
-    "condiment": "sauces-condiments",
-    "condiments": "sauces-condiments",
-    # Chips & Crisps
-    "chips": "chips-crisps",
-    "crisps": "chips-crisps",
-    # Chocolate
-    "chocolate": "chocolate",
-    # Biscuits
-    "biscuit": "biscuits",
-    "biscuits": "biscuits",
-    "cookie": "biscuits",
-    "cookies": "biscuits",
-    # Drinks subcategories
-    "soft drink": "soft-drinks",
-    "soft drinks": "soft-drinks",
-    "juice": "juice",
-    "water": "water",
-    "coffee": "coffee-tea",
-    "tea": "coffee-tea",
-    "energy drink": "energy-drinks",
-    "energy drinks": "energy-drinks",
-    # Dairy
-    "milk": "milk",
-    "cheese": "cheese",
-    "yoghurt": "yoghurt",
-    "yogurt": "yoghurt",
-    "butter": "butter-cream",
-    "eggs": "eggs",
-    # Meat
-    "chicken": "chicken",
-    "beef": "beef-veal",
-    "pork": "pork",
-    "lamb": "lamb",
-    "seafood": "seafood",
-    "sausage": "sausages-bbq",
-    "sausages": "sausages-bbq",
-    # Pantry
-    "pasta": "pasta-noodles",
-    "noodles": "pasta-noodles",
-    "rice": "rice-grains",
-    "cereal": "breakfast-cereals",
-    "cereals": "breakfast-cereals",
-    # Cleaning
-    "laundry": "laundry",
-    "cleaning": "cleaning-products",
-    "dishwashing": "dishwashing",
-    # Pet
-    "dog food": "dog-food",
-    "cat food": "cat-food",
-    "pet food": "pet",
-    # Baby
-    "nappies": "nappies-wipes",
-    "baby food": "baby-food",
-    "baby formula": "baby-formula",
-    # Personal care
-    "shampoo": "hair-care",
-    "deodorant": "deodorant",
-    "toothpaste": "oral-care",
-    # Frozen
-    "ice cream": "ice-cream-frozen-desserts",
-    "frozen pizza": "frozen-pizza",
-    "frozen meals": "frozen-meals",
-}
+from app.models import Special, CurrentSpecial, ScrapeLog, Category
+from app.services.current_specials import dataset_generation, projection_search_condition
+from app.services.cursors import InvalidCursor, decode_cursor, encode_cursor, filter_fingerprint, keyset_condition
+from app.services.search_index import SEARCH_CATEGORY_MAP, search_rank
+from app.services.special_counts import CountFilters, count_specials
+from app.services.store_registry import store_registry
 
 
 def find_category_for_search(search_term: str, db: Session) -> Optional[int]:
@@ -132,40 +63,45 @@ def get_specials(
     category_id: Optional[int] = Query(None, description="Filter by unified category ID"),
     min_discount: int = Query(0, ge=0, le=100, description="Minimum discount percentage"),
     search: Optional[str] = Query(None, min_length=2, description="Search in product name/brand"),
-    sort: str = Query("discount", description="Sort by: discount, price, name"),
-    page: int = Query(1, ge=1),
+    sort: str = Query("discount", description="Sort by: discount, price, name, relevance"),
+    page: int = Query(1, ge=1, description="Page number (ignored when a cursor is given)"),
     limit: int = Query(50, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="Keyset cursor from the previous page's next_cursor"),
+    estimate: bool = Query(False, description="Allow an estimated total for text searches"),
     db: Session = Depends(get_db)
 ):
-    """Get current specials with filters and pagination."""
+    """
+    Get current specials with filters and pagination.
+
+    Pass next_cursor back as `cursor` for keyset pagination: every page costs
+    the same and rows don't shift when a scrape lands. `page` (offset
+    pagination) is kept for existing clients.
+    """
     today = date.today()
 
-    # Base query - only active specials
-    query = db.query(Special).join(Store).filter(
-        Special.valid_to >= today
+    # Base query - the current specials projection (no store/category joins)
+    query = db.query(CurrentSpecial).filter(
+        CurrentSpecial.valid_to >= today
     )
 
-    # Apply filters
+    # Apply filters (slug resolved in memory, no join on stores)
     if store:
-        query = query.filter(Store.slug == store)
+        query = query.filter(CurrentSpecial.store_id == store_registry.id_for(store))
 
     if category:
-        query = query.filter(Special.category == category)
+        query = query.filter(CurrentSpecial.category == category)
+
+    # Filters that decide the total, so it can come from the counts summary
+    count_category_ids = None
+    text_search = None
 
     if category_id:
-        # Get category and its subcategories
         cat = db.query(Category).filter(Category.id == category_id).first()
         if cat:
-            # If this is a parent category, include all subcategory IDs
-            if cat.parent_id is None:
-                subcategory_ids = [c.id for c in cat.subcategories]
-                category_ids = [category_id] + subcategory_ids
-                query = query.filter(Special.category_id.in_(category_ids))
-            else:
-                query = query.filter(Special.category_id == category_id)
+            query, count_category_ids = _filter_category(query, cat)
 
     if min_discount > 0:
-        query = query.filter(Special.discount_percent >= min_discount)
+        query = query.filter(CurrentSpecial.discount_percent >= min_discount)
 
     if search:
         # Smart search: check if search term matches a category
@@ -176,51 +112,84 @@ def get_specials(
                 # Search term matches a category - filter to that category
                 cat = db.query(Category).filter(Category.id == matched_category_id).first()
                 if cat:
-                    if cat.parent_id is None:
-                        # Parent category - include subcategories
-                        subcategory_ids = [c.id for c in cat.subcategories]
-                        category_ids = [matched_category_id] + subcategory_ids
-                        query = query.filter(Special.category_id.in_(category_ids))
-                    else:
-                        query = query.filter(Special.category_id == matched_category_id)
+                    query, count_category_ids = _filter_category(query, cat)
             else:
                 # No category match - do regular text search
-                query = query.filter(
-                    or_(
-                        Special.name.ilike(f"%{search}%"),
-                        Special.brand.ilike(f"%{search}%")
-                    )
-                )
+                query = query.filter(projection_search_condition(search))
+                text_search = search
         else:
             # Explicit category already set - just do text search within that category
-            query = query.filter(
-                or_(
-                    Special.name.ilike(f"%{search}%"),
-                    Special.brand.ilike(f"%{search}%")
-                )
-            )
-
-    # Get total count before pagination
-    total = query.count()
-
-    # Apply sorting
-    if sort == "discount":
-        query = query.order_by(desc(Special.discount_percent))
+            query = query.filter(projection_search_condition(search))
+            text_search = search
+
+    # Total from the counts summary (or a memoized count for text searches)
+    total, total_is_estimate = count_specials(
+        db,
+        CountFilters(
+            store=store,
+            category=category,
+            category_ids=count_category_ids,
+            min_discount=min_discount,
+            search=text_search,
+        ),
+        query.statement,
+        estimate=estimate,
+    )
+
+    # Apply sorting (each order has a matching composite index); `order` is
+    # the ORDER BY as (column, descending) pairs, ending with the id tiebreaker
+    rank = search_rank(Special, search) if search and sort == "relevance" else None
+    if rank is not None:
+        # Rank comes from the specials search index, which shares ids
+        query = query.join(Special, Special.id == CurrentSpecial.id).add_columns(rank.label("rank"))
+        sort_key, direction = "relevance", "desc"
+        order = [(rank, True), (CurrentSpecial.discount_percent, True), (CurrentSpecial.id, False)]
     elif sort == "price":
-        query = query.order_by(Special.price)
+        sort_key, direction = "price", "asc"
+        order = [(CurrentSpecial.price_cents, False), (CurrentSpecial.id, False)]
     elif sort == "name":
-        query = query.order_by(Special.name)
+        sort_key, direction = "name", "asc"
+        order = [(CurrentSpecial.name, False), (CurrentSpecial.id, False)]
     else:
-        query = query.order_by(desc(Special.discount_percent))
+        sort_key, direction = "discount", "desc"
+        order = [(CurrentSpecial.discount_percent, True), (CurrentSpecial.id, False)]
+    query = query.order_by(*(desc(column) if descending else column for column, descending in order))
 
-    # Apply pagination
-    skip = (page - 1) * limit
-    specials = query.offset(skip).limit(limit).all()
+    fingerprint = filter_fingerprint(
+        store=store, category=category, category_id=category_id,
+        min_discount=min_discount, search=search,
+    )
+    generation = db.scalar(dataset_generation())
+    dataset_changed = False
+
+    if cursor:
+        try:
+            position = decode_cursor(cursor, sort_key, direction, fingerprint, len(order))
+        except InvalidCursor as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        query = query.filter(keyset_condition(order, position.keys))
+        dataset_changed = position.generation != generation
+    else:
+        query = query.offset((page - 1) * limit)
 
-    # Add store info to response
-    result = []
-    for special in specials:
-        item = SpecialSchema(
+    # Fetch one extra to check if there's more
+    rows = query.limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    specials = [special for special, _ in rows] if rank is not None else rows
+
+    next_cursor = None
+    if has_more:
+        if rank is not None:
+            last, last_rank = rows[-1]
+            keys = [last_rank, last.discount_percent, last.id]
+        else:
+            keys = [getattr(rows[-1], column.key) for column, _ in order]
+        next_cursor = encode_cursor(sort_key, direction, keys, fingerprint, generation)
+
+    result = [
+        SpecialSchema(
             id=special.id,
             name=special.name,
             brand=special.brand,
@@ -228,7 +197,7 @@ def get_specials(
             category=special.category,
             price=special.price,
             was_price=special.was_price,
-            discount_percent=special.discount_percent,
+            discount_percent=special.reported_discount_percent,
             unit_price=special.unit_price,
             store_product_id=special.store_product_id,
             product_url=special.product_url,
@@ -236,45 +205,57 @@ def get_specials(
             valid_from=special.valid_from,
             valid_to=special.valid_to,
             store_id=special.store_id,
-            store_name=special.store.name,
-            store_slug=special.store.slug,
+            store_name=special.store_name,
+            store_slug=special.store_slug,
             scraped_at=special.scraped_at,
             created_at=special.created_at,
         )
-        result.append(item)
+        for special in specials
+    ]
 
     return SpecialsList(
         items=result,
         total=total,
+        total_is_estimate=total_is_estimate,
         page=page,
         limit=limit,
-        has_more=(skip + limit) < total
+        has_more=has_more,
+        next_cursor=next_cursor,
+        dataset_changed=dataset_changed,
     )
 
 
+def _filter_category(query, cat: Category):
+    """
+    Filter the projection to a unified category (with subcategories for a parent).
+
+    Returns the filtered query and the category ids for the counts summary.
+    """
+    if cat.parent_id is None:
+        # parent_category_id covers the parent itself and all its subcategories
+        subcategory_ids = [c.id for c in cat.subcategories]
+        return query.filter(CurrentSpecial.parent_category_id == cat.id), (cat.id, *subcategory_ids)
+    return query.filter(CurrentSpecial.category_id == cat.id), (cat.id,)
+
+
 @router.get("/stats", response_model=SpecialsStats)
 def get_stats(db: Session = Depends(get_db)):
     """Get summary statistics for specials."""
     today = date.today()
 
-    # Total active specials
-    total = db.query(Special).filter(Special.valid_to >= today).count()
-
-    # Count by store
+    # Count by store, plus half price (50%+ discount), in one pass over the projection
     store_counts = db.query(
-        Store.slug,
-        func.count(Special.id)
-    ).join(Special).filter(
-        Special.valid_to >= today
-    ).group_by(Store.slug).all()
-
-    by_store = {slug: count for slug, count in store_counts}
+        CurrentSpecial.store_id,
+        func.count(CurrentSpecial.id),
+        func.count(CurrentSpecial.id).filter(CurrentSpecial.discount_percent >= 50),
+    ).filter(
+        CurrentSpecial.valid_to >= today
+    ).group_by(CurrentSpecial.store_id).all()
 
-    # Half price count (50%+ discount)
-    half_price = db.query(Special).filter(
-        Special.valid_to >= today,
-        Special.discount_percent >= 50
-    ).count()
+    slugs = store_registry.slugs_by_id()
+    by_store = {slugs[store_id]: count for store_id, count, _ in store_counts if store_id in slugs}
+    total = sum(count for _, count, _ in store_counts)
+    half_price = sum(half for _, _, half in store_counts)
 
     # Last scrape time
     last_scrape = db.query(func.max(ScrapeLog.completed_at)).filter(
@@ -295,12 +276,12 @@ def get_categories(db: Session = Depends(get_db)):
     today = date.today()
 
     categories = db.query(
-        Special.category,
-        func.count(Special.id).label("count")
+        CurrentSpecial.category,
+        func.count(CurrentSpecial.id).label("count")
     ).filter(
-        Special.valid_to >= today,
-        Special.category.isnot(None)
-    ).group_by(Special.category).order_by(desc("count")).all()
+        CurrentSpecial.valid_to >= today,
+        CurrentSpecial.category.isnot(None)
+    ).group_by(CurrentSpecial.category).order_by(desc("count")).all()
 
     return [CategoryCount(name=cat, count=count) for cat, count in categories if cat]
 
@@ -317,19 +298,19 @@ def get_category_tree(db: Session = Depends(get_db)):
 
     # Build category counts mapping (category_id -> count of active specials)
     category_counts = db.query(
-        Special.category_id,
-        func.count(Special.id).label("count")
+        CurrentSpecial.category_id,
+        func.count(CurrentSpecial.id).label("count")
     ).filter(
-        Special.valid_to >= today,
-        Special.category_id.isnot(None)
-    ).group_by(Special.category_id).all()
+        CurrentSpecial.valid_to >= today,
+        CurrentSpecial.category_id.isnot(None)
+    ).group_by(CurrentSpecial.category_id).all()
 
     count_map = {cat_id: count for cat_id, count in category_counts}
 
     # Count uncategorized specials
-    uncategorized_count = db.query(func.count(Special.id)).filter(
-        Special.valid_to >= today,
-        Special.category_id.is_(None)
+    uncategorized_count = db.query(func.count(CurrentSpecial.id)).filter(
+        CurrentSpecial.valid_to >= today,
+        CurrentSpecial.category_id.is_(None)
     ).scalar() or 0
 
     # Total categorized
@@ -378,41 +359,54 @@ def get_stores_with_specials(db: Session = Depends(get_db)):
     """Get stores with their special counts."""
     today = date.today()
 
-    stores = db.query(Store).all()
-
-    result = []
-    for store in stores:
-        count = db.query(Special).filter(
-            Special.store_id == store.id,
-            Special.valid_to >= today
-        ).count()
+    counts = dict(db.query(
+        CurrentSpecial.store_id,
+        func.count(CurrentSpecial.id)
+    ).filter(
+        CurrentSpecial.valid_to >= today
+    ).group_by(CurrentSpecial.store_id).all())
 
-        result.append({
+    return [
+        {
             "id": store.id,
             "name": store.name,
             "slug": store.slug,
             "logo_url": store.logo_url,
-            "specials_count": count
-        })
-
-    return result
+            "specials_count": counts.get(store.id, 0)
+        }
+        for store in store_registry.all()
+    ]
 
 
 @router.get("/scrape-logs", response_model=list[ScrapeLogResponse])
 def get_scrape_logs(
+    response: Response,
     limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="Keyset cursor from the X-Next-Cursor header"),
     db: Session = Depends(get_db)
 ):
-    """Get recent scrape logs for monitoring."""
-    logs = db.query(ScrapeLog).join(Store, isouter=True).order_by(
-        desc(ScrapeLog.started_at)
-    ).limit(limit).all()
+    """Get recent scrape logs for monitoring (next page cursor in X-Next-Cursor)."""
+    # Logs are created when a scrape starts, so id order is start order
+    order = [(ScrapeLog.id, True)]
+    fingerprint = filter_fingerprint()
+    query = db.query(ScrapeLog).order_by(desc(ScrapeLog.id))
+    if cursor:
+        try:
+            position = decode_cursor(cursor, "started", "desc", fingerprint, len(order))
+        except InvalidCursor as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        query = query.filter(keyset_condition(order, position.keys))
+
+    logs = query.limit(limit + 1).all()
+    if len(logs) > limit:
+        logs = logs[:limit]
+        response.headers["X-Next-Cursor"] = encode_cursor("started", "desc", [logs[-1].id], fingerprint)
 
     return [
         ScrapeLogResponse(
             id=log.id,
             store_id=log.store_id,
-            store_name=log.store.name if log.store else None,
+            store_name=store_registry.name_for(log.store_id),
             started_at=log.started_at,
             completed_at=log.completed_at,
             items_found=log.items_found,
@@ -506,7 +500,7 @@ def rescrape_all(
 @router.get("/{special_id}", response_model=SpecialSchema)
 def get_special(special_id: int, db: Session = Depends(get_db)):
     """Get a specific special by ID."""
-    special = db.query(Special).join(Store).filter(Special.id == special_id).first()
+    special = db.query(Special).filter(Special.id == special_id).first()
     if not special:
         raise HTTPException(status_code=404, detail="Special not found")
 
@@ -526,8 +520,8 @@ def get_special(special_id: int, db: Session = Depends(get_db)):
         valid_from=special.valid_from,
         valid_to=special.valid_to,
         store_id=special.store_id,
-        store_name=special.store.name,
-        store_slug=special.store.slug,
+        store_name=store_registry.get(special.store_id).name,
+        store_slug=store_registry.get(special.store_id).slug,
         scraped_at=special.scraped_at,
         created_at=special.created_at,
     )
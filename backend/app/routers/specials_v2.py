@@ -7,19 +7,25 @@ Performance improvements:
 - Optimized queries with proper indexing
 - Compatible with existing specials table (migration-ready)
 
-Note: Currently uses existing specials table for compatibility.
+Note: Listings read the current_specials projection of the specials table.
 After running migration script, update queries to use MasterProduct + ProductPrice.
 """
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import func, or_, desc, and_, inspect
+from sqlalchemy import func, desc, inspect, select
 from datetime import date, datetime, timedelta
 from typing import Optional
 import logging
 
-from app.database import get_db
-from app.models import Special, Store
-from app.services.cache import cache, PREFIX_SPECIALS, PREFIX_STATS
+from app.database import get_async_db
+from app.models import Special, CurrentSpecial
+from app.services.cache import cache, CachedBody, PREFIX_SPECIALS, PREFIX_STATS
+from app.services.current_specials import dataset_generation, projection_search_condition
+from app.services.cursors import InvalidCursor, decode_cursor, encode_cursor, filter_fingerprint, keyset_condition
+from app.services.image_variants import image_srcset
+from app.services.special_counts import CountFilters, count_specials_async
+from app.services.store_registry import store_registry
 from pydantic import BaseModel
 
 logger = logging.getLogger(__name__)
@@ -44,7 +50,8 @@ class ProductV2(BaseModel):
     brand: Optional[str] = None
     size: Optional[str] = None
     category: Optional[str] = None
-    image_url: str
+    image_url: str  # Local responsive image when cached, otherwise the store CDN URL
+    image_srcset: Optional[str] = None  # "<url> 160w, <url> 320w, ..." for <img srcset>
     product_url: Optional[str] = None
     store_id: int
     store_name: str
@@ -66,8 +73,10 @@ class ProductV2(BaseModel):
 class SpecialsListV2(BaseModel):
     items: list[ProductV2]
     total: int
+    total_is_estimate: bool = False
     cursor: Optional[str] = None  # For keyset pagination
     has_more: bool
+    dataset_changed: bool = False  # Specials were rescraped since the cursor was issued
 
 
 class StatsV2(BaseModel):
@@ -83,309 +92,254 @@ class CategoryCountV2(BaseModel):
     count: int
 
 
-@router.get("/", response_model=SpecialsListV2)
-async def get_specials_v2(
-    store: Optional[str] = Query(None, description="Filter by store slug"),
-    category: Optional[str] = Query(None, description="Filter by category"),
-    min_discount: int = Query(0, ge=0, le=100, description="Minimum discount percentage"),
-    search: Optional[str] = Query(None, min_length=2, description="Search in product name/brand"),
-    sort: str = Query("discount", description="Sort by: discount, price, name"),
-    cursor: Optional[str] = Query(None, description="Pagination cursor"),
-    limit: int = Query(50, ge=1, le=100),
-    db: Session = Depends(get_db)
-):
-    """
-    Get current specials with optimized queries and caching.
-
-    Uses keyset pagination for consistent performance with large datasets.
-    Currently uses existing specials table for backward compatibility.
-    """
+async def _specials_payload(
+    db: AsyncSession,
+    store: Optional[str],
+    category: Optional[str],
+    min_discount: int,
+    search: Optional[str],
+    sort: str,
+    cursor: Optional[str],
+    limit: int,
+    estimate: bool = False,
+) -> dict:
+    """Run the specials list query and return the serialized response."""
     today = date.today()
 
-    # Try cache first
-    cache_params = {
-        "store": store, "category": category, "min_discount": min_discount,
-        "search": search, "sort": sort, "cursor": cursor, "limit": limit
-    }
-    cached_result = await cache.get_specials(cache_params)
-    if cached_result:
-        return SpecialsListV2(**cached_result)
-
-    # Build query using existing specials table
-    query = (
-        db.query(Special)
-        .join(Store, Special.store_id == Store.id)
-        .filter(Special.valid_to >= today)
-    )
+    # Build query on the current specials projection (prices and store
+    # names are precomputed, and each sort order has a composite index)
+    query = select(CurrentSpecial).filter(CurrentSpecial.valid_to >= today)
 
-    # Apply filters
+    # Apply filters (slug resolved in memory, no join on stores)
     if store:
-        query = query.filter(Store.slug == store)
+        query = query.filter(CurrentSpecial.store_id == store_registry.id_for(store))
 
     if category:
-        query = query.filter(Special.category == category)
+        query = query.filter(CurrentSpecial.category == category)
 
     if min_discount > 0:
-        query = query.filter(Special.discount_percent >= min_discount)
+        query = query.filter(CurrentSpecial.discount_percent >= min_discount)
 
     if search:
-        search_term = f"%{search}%"
-        query = query.filter(
-            or_(
-                Special.name.ilike(search_term),
-                Special.brand.ilike(search_term)
-            )
-        )
-
-    # Get total count
-    total = query.count()
+        query = query.filter(projection_search_condition(search))
+
+    # Total from the counts summary; searches are counted once per filter set,
+    # so cursor pages never recount
+    total, total_is_estimate = await count_specials_async(
+        db,
+        CountFilters(store=store, category=category, min_discount=min_discount, search=search),
+        query,
+        estimate=estimate,
+    )
 
-    # Apply sorting with keyset pagination support
+    # Apply sorting with keyset pagination support; `order` is the ORDER BY
+    # as (column, descending) pairs, ending with the id tiebreaker
     if sort == "discount":
-        query = query.order_by(desc(Special.discount_percent), Special.id)
-        if cursor:
-            try:
-                cursor_discount, cursor_id = cursor.split(":")
-                query = query.filter(
-                    or_(
-                        Special.discount_percent < int(cursor_discount),
-                        and_(
-                            Special.discount_percent == int(cursor_discount),
-                            Special.id > int(cursor_id)
-                        )
-                    )
-                )
-            except ValueError:
-                pass
+        direction = "desc"
+        order = [(CurrentSpecial.discount_percent, True), (CurrentSpecial.id, False)]
     elif sort == "price":
-        query = query.order_by(Special.price, Special.id)
-        if cursor:
-            try:
-                cursor_price, cursor_id = cursor.split(":")
-                query = query.filter(
-                    or_(
-                        Special.price > float(cursor_price),
-                        and_(
-                            Special.price == float(cursor_price),
-                            Special.id > int(cursor_id)
-                        )
-                    )
-                )
-            except ValueError:
-                pass
-    else:  # name
-        query = query.order_by(Special.name, Special.id)
-        if cursor:
-            try:
-                cursor_name, cursor_id = cursor.split(":", 1)
-                query = query.filter(
-                    or_(
-                        Special.name > cursor_name,
-                        and_(
-                            Special.name == cursor_name,
-                            Special.id > int(cursor_id)
-                        )
-                    )
-                )
-            except ValueError:
-                pass
+        direction = "asc"
+        order = [(CurrentSpecial.price_cents, False), (CurrentSpecial.id, False)]
+    else:
+        sort, direction = "name", "asc"
+        order = [(CurrentSpecial.name, False), (CurrentSpecial.id, False)]
+    query = query.order_by(*(desc(column) if descending else column for column, descending in order))
+
+    fingerprint = filter_fingerprint(store=store, category=category, min_discount=min_discount, search=search)
+    generation = await db.scalar(dataset_generation())
+    dataset_changed = False
+    if cursor:
+        try:
+            position = decode_cursor(cursor, sort, direction, fingerprint, len(order))
+        except InvalidCursor as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        query = query.filter(keyset_condition(order, position.keys))
+        dataset_changed = position.generation != generation
 
     # Fetch one extra to check if there's more
-    results = query.limit(limit + 1).all()
+    results = (await db.scalars(query.limit(limit + 1))).all()
     has_more = len(results) > limit
     results = results[:limit]
 
-    # Build response
+    # Build response straight from the projection columns
     items = []
-    next_cursor = None
-
     for special in results:
-        # Get store info
-        store_obj = db.query(Store).filter(Store.id == special.store_id).first()
-
-        # Convert price to cents
-        price_cents = int(float(special.price) * 100) if special.price else 0
-        was_price_cents = int(float(special.was_price) * 100) if special.was_price else None
-
-        item = ProductV2(
+        image_src, srcset = image_srcset(special.image_hash)
+        items.append(ProductV2(
             id=special.id,
             stockcode=special.store_product_id or str(special.id),
             name=special.name,
             brand=special.brand,
             size=special.size,
             category=special.category,
-            image_url=special.image_url or "",
+            image_url=image_src or special.image_url or "",
+            image_srcset=srcset,
             product_url=special.product_url,
             store_id=special.store_id,
-            store_name=store_obj.name if store_obj else "Unknown",
-            store_slug=store_obj.slug if store_obj else "unknown",
-            price=f"${float(special.price):.2f}" if special.price else "$0.00",
-            price_cents=price_cents,
-            was_price=f"${float(special.was_price):.2f}" if special.was_price else None,
-            was_price_cents=was_price_cents,
-            discount_percent=special.discount_percent or 0,
+            store_name=special.store_name,
+            store_slug=special.store_slug,
+            price=special.price_display,
+            price_cents=special.price_cents,
+            was_price=special.was_price_display,
+            was_price_cents=special.was_price_cents,
+            discount_percent=special.discount_percent,
             unit_price=special.unit_price,
-            valid_until=datetime.combine(special.valid_to, datetime.min.time()) if special.valid_to else datetime.now()
-        )
-        items.append(item)
+            valid_until=special.valid_until,
+        ))
 
     # Generate cursor for next page
+    next_cursor = None
     if has_more and results:
         last = results[-1]
-        if sort == "discount":
-            next_cursor = f"{last.discount_percent}:{last.id}"
-        elif sort == "price":
-            next_cursor = f"{float(last.price):.2f}:{last.id}"
-        else:
-            next_cursor = f"{last.name}:{last.id}"
+        keys = [getattr(last, column.key) for column, _ in order]
+        next_cursor = encode_cursor(sort, direction, keys, fingerprint, generation)
 
     response = SpecialsListV2(
         items=items,
         total=total,
+        total_is_estimate=total_is_estimate,
         cursor=next_cursor,
-        has_more=has_more
+        has_more=has_more,
+        dataset_changed=dataset_changed
     )
+    return response.model_dump()
 
-    # Cache the response
-    await cache.set_specials(cache_params, response.model_dump())
 
-    return response
-
-
-@router.get("/stats", response_model=StatsV2)
-async def get_stats_v2(db: Session = Depends(get_db)):
-    """Get summary statistics with caching."""
-    # Try cache
-    cached_result = await cache.get_stats()
-    if cached_result:
-        return StatsV2(**cached_result)
+@router.get("/", response_model=SpecialsListV2)
+async def get_specials_v2(
+    request: Request,
+    store: Optional[str] = Query(None, description="Filter by store slug"),
+    category: Optional[str] = Query(None, description="Filter by category"),
+    min_discount: int = Query(0, ge=0, le=100, description="Minimum discount percentage"),
+    search: Optional[str] = Query(None, min_length=2, description="Search in product name/brand"),
+    sort: str = Query("discount", description="Sort by: discount, price, name"),
+    cursor: Optional[str] = Query(None, description="Pagination cursor"),
+    limit: int = Query(50, ge=1, le=100),
+    estimate: bool = Query(False, description="Allow an estimated total for text searches"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Get current specials with optimized queries and caching.
 
-    today = date.today()
+    Uses keyset pagination for consistent performance with large datasets.
+    Reads the current_specials projection (see services/current_specials).
+    The cached response body is sent as-is, without re-validation.
+    """
+    cache_params = {
+        "store": store, "category": category, "min_discount": min_discount,
+        "search": search, "sort": sort, "cursor": cursor, "limit": limit,
+        "estimate": estimate,
+    }
+    # Concurrent misses (e.g. right after invalidation) share one query
+    async def build() -> CachedBody:
+        return CachedBody.from_value(
+            await _specials_payload(db, store, category, min_discount, search, sort, cursor, limit, estimate)
+        )
 
-    # Total active specials
-    total = (
-        db.query(func.count(Special.id))
-        .filter(Special.valid_to >= today)
-        .scalar()
-    )
+    body = await cache.get_or_compute_specials(cache_params, build)
+    return body.to_response(request.headers.get("accept-encoding", ""))
 
-    # Count by store
-    store_counts = (
-        db.query(Store.slug, func.count(Special.id))
-        .join(Special, Special.store_id == Store.id)
-        .filter(Special.valid_to >= today)
-        .group_by(Store.slug)
-        .all()
-    )
-    by_store = {slug: count for slug, count in store_counts}
 
-    # Half price count
-    half_price = (
-        db.query(func.count(Special.id))
-        .filter(
-            Special.valid_to >= today,
-            Special.discount_percent >= 50
-        )
-        .scalar()
-    )
+async def _stats_payload(db: AsyncSession) -> dict:
+    """Compute summary statistics."""
+    today = date.today()
 
-    # Count specials with images
-    images_count = (
-        db.query(func.count(Special.id))
-        .filter(
-            Special.valid_to >= today,
-            Special.image_url.isnot(None)
+    # Per-store totals, half price and with-image counts in one pass
+    store_counts = (await db.execute(
+        select(
+            CurrentSpecial.store_id,
+            func.count(CurrentSpecial.id),
+            func.count(CurrentSpecial.id).filter(CurrentSpecial.discount_percent >= 50),
+            func.count(CurrentSpecial.image_url),
         )
-        .scalar()
-    )
+        .filter(CurrentSpecial.valid_to >= today)
+        .group_by(CurrentSpecial.store_id)
+    )).all()
+    slugs = store_registry.slugs_by_id()
+    by_store = {slugs[store_id]: count for store_id, count, _, _ in store_counts if store_id in slugs}
 
     # Last scrape time
-    last_update = (
-        db.query(func.max(Special.scraped_at))
-        .scalar()
-    )
+    last_update = await db.scalar(select(func.max(CurrentSpecial.scraped_at)))
 
     response = StatsV2(
-        total_specials=total or 0,
+        total_specials=sum(row[1] for row in store_counts),
         by_store=by_store,
-        half_price_count=half_price or 0,
-        products_with_images=images_count or 0,
+        half_price_count=sum(row[2] for row in store_counts),
+        products_with_images=sum(row[3] for row in store_counts),
         last_updated=last_update
     )
+    return response.model_dump()
 
-    # Cache
-    await cache.set_stats(response.model_dump())
 
-    return response
+@router.get("/stats", response_model=StatsV2)
+async def get_stats_v2(request: Request, db: AsyncSession = Depends(get_async_db)):
+    """Get summary statistics with caching."""
+    async def build() -> CachedBody:
+        return CachedBody.from_value(await _stats_payload(db))
 
+    body = await cache.get_or_compute_stats(build)
+    return body.to_response(request.headers.get("accept-encoding", ""))
 
-@router.get("/categories", response_model=list[CategoryCountV2])
-async def get_categories_v2(db: Session = Depends(get_db)):
-    """Get categories with counts, cached."""
-    # Try cache
-    cached_result = await cache.get_categories()
-    if cached_result:
-        return [CategoryCountV2(**c) for c in cached_result]
 
+async def _categories_payload(db: AsyncSession) -> list[dict]:
+    """Count active specials per category."""
     today = date.today()
 
-    categories = (
-        db.query(Special.category, func.count(Special.id).label("count"))
+    categories = (await db.execute(
+        select(CurrentSpecial.category, func.count(CurrentSpecial.id).label("count"))
         .filter(
-            Special.valid_to >= today,
-            Special.category.isnot(None)
+            CurrentSpecial.valid_to >= today,
+            CurrentSpecial.category.isnot(None)
         )
-        .group_by(Special.category)
+        .group_by(CurrentSpecial.category)
         .order_by(desc("count"))
-        .all()
-    )
+    )).all()
 
-    result = [CategoryCountV2(name=cat, count=count) for cat, count in categories if cat]
+    return [CategoryCountV2(name=cat, count=count).model_dump() for cat, count in categories if cat]
 
-    # Cache
-    await cache.set_categories([c.model_dump() for c in result])
 
-    return result
+@router.get("/categories", response_model=list[CategoryCountV2])
+async def get_categories_v2(request: Request, db: AsyncSession = Depends(get_async_db)):
+    """Get categories with counts, cached."""
+    async def build() -> CachedBody:
+        return CachedBody.from_value(await _categories_payload(db))
+
+    body = await cache.get_or_compute_categories(build)
+    return body.to_response(request.headers.get("accept-encoding", ""))
 
 
 @router.get("/stores")
-async def get_stores_v2(db: Session = Depends(get_db)):
+async def get_stores_v2(db: AsyncSession = Depends(get_async_db)):
     """Get stores with special counts."""
     today = date.today()
 
-    stores = db.query(Store).all()
-    result = []
-
-    for store in stores:
-        count = (
-            db.query(func.count(Special.id))
-            .filter(
-                Special.store_id == store.id,
-                Special.valid_to >= today
-            )
-            .scalar()
-        )
+    counts = dict((await db.execute(
+        select(CurrentSpecial.store_id, func.count(CurrentSpecial.id))
+        .filter(CurrentSpecial.valid_to >= today)
+        .group_by(CurrentSpecial.store_id)
+    )).all())
 
-        result.append({
+    return [
+        {
             "id": store.id,
             "name": store.name,
             "slug": store.slug,
             "logo_url": store.logo_url,
-            "specials_count": count or 0
-        })
-
-    return result
+            "specials_count": counts.get(store.id, 0)
+        }
+        for store in store_registry.all()
+    ]
 
 
 @router.get("/product/{product_id}")
-async def get_product_v2(product_id: int, db: Session = Depends(get_db)):
+async def get_product_v2(product_id: int, db: AsyncSession = Depends(get_async_db)):
     """Get a single product/special details."""
-    special = db.query(Special).filter(Special.id == product_id).first()
+    special = await db.get(Special, product_id)
 
     if not special:
         raise HTTPException(status_code=404, detail="Product not found")
 
-    store_obj = db.query(Store).filter(Store.id == special.store_id).first()
+    store_obj = store_registry.get(special.store_id)
 
     return {
         "product": {
@@ -411,7 +365,16 @@ async def get_product_v2(product_id: int, db: Session = Depends(get_db)):
 
 
 @router.post("/admin/invalidate-cache")
-async def invalidate_cache():
-    """Clear all specials caches (call after scraping)."""
-    await cache.invalidate_specials()
-    return {"status": "success", "message": "Cache invalidated"}
+async def invalidate_cache(store: Optional[str] = Query(None, description="Only retire this store's entries")):
+    """Clear specials caches (scrapes already invalidate their own store)."""
+    if store:
+        orphaned = await cache.invalidate_store(store)
+    else:
+        orphaned = await cache.invalidate_specials()
+    return {"status": "success", "message": "Cache invalidated", "orphaned_keys": orphaned}
+
+
+@router.get("/admin/cache-metrics")
+async def get_cache_metrics():
+    """Generation bump counts and how many keys each bump orphaned."""
+    return await cache.get_metrics()
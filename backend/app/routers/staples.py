@@ -12,7 +12,7 @@ from decimal import Decimal
 from datetime import date
 
 from app.database import get_db
-from app.models import Special, Store, Category, Product, StoreProduct, Price
+from app.models import Special, CurrentSpecial, Category, Product, StoreProduct, Price
 from app.schemas.price import (
     StapleStorePrice,
     StapleProduct,
@@ -22,8 +22,13 @@ from app.schemas.price import (
     BasketItem,
     BasketStoreTotal,
     BasketCompareRequest,
+    BasketSplitLine,
     BasketCompareResponse,
 )
+from app.services.basket_pricing import BasketLine, load_special_prices, price_basket
+from app.services.current_specials import projection_search_condition
+from app.services.search_index import search_condition
+from app.services.store_registry import store_registry
 
 router = APIRouter(prefix="/staples", tags=["staples"])
 
@@ -247,7 +252,7 @@ def list_staples(
     - Product/StoreProduct/Price tables (everyday prices)
     """
     today = date.today()
-    stores_db = {s.id: s for s in db.query(Store).all()}
+    stores_db = {s.id: s for s in store_registry.all()}
     products_map: dict[str, StapleProduct] = {}
 
     # Get all staple category IDs
@@ -265,17 +270,14 @@ def list_staples(
         filter_cat_ids = all_cat_ids
 
     # Get store filter
-    store_id_filter = None
-    if store:
-        store_obj = db.query(Store).filter(Store.slug == store).first()
-        if store_obj:
-            store_id_filter = store_obj.id
+    store_id_filter = store_registry.id_for(store)
 
     # ========== 1. Query Specials table ==========
     # Get ALL valid specials, then filter by category using keywords
-    # This ensures we catch fresh products even if category_id isn't set
-    specials_query = db.query(Special).join(Store).filter(
-        Special.valid_to >= today
+    # This ensures we catch fresh products even if category_id isn't set.
+    # Reads the current_specials projection: store and price display are precomputed
+    specials_query = db.query(CurrentSpecial).filter(
+        CurrentSpecial.valid_to >= today
     )
 
     # Optionally filter by category_id if available (performance optimization)
@@ -283,22 +285,16 @@ def list_staples(
     if filter_cat_ids:
         specials_query = specials_query.filter(
             or_(
-                Special.category_id.in_(filter_cat_ids),
-                Special.category_id.is_(None)  # Include uncategorized for keyword matching
+                CurrentSpecial.category_id.in_(filter_cat_ids),
+                CurrentSpecial.category_id.is_(None)  # Include uncategorized for keyword matching
             )
         )
 
     if store_id_filter:
-        specials_query = specials_query.filter(Special.store_id == store_id_filter)
+        specials_query = specials_query.filter(CurrentSpecial.store_id == store_id_filter)
 
     if search:
-        search_term = f"%{search}%"
-        specials_query = specials_query.filter(
-            or_(
-                Special.name.ilike(search_term),
-                Special.brand.ilike(search_term)
-            )
-        )
+        specials_query = specials_query.filter(projection_search_condition(search))
 
     specials = specials_query.all()
 
@@ -315,17 +311,12 @@ def list_staples(
         # Create a key for this product type (using name as identifier)
         product_key = special.name.lower().strip()
 
-        price_cents = _price_to_cents(special.price)
-        store_obj = stores_db.get(special.store_id)
-        if not store_obj:
-            continue
-
         store_price = StapleStorePrice(
-            store_id=store_obj.id,
-            store_name=store_obj.name,
-            store_slug=store_obj.slug,
-            price=f"${special.price}",
-            price_numeric=price_cents,
+            store_id=special.store_id,
+            store_name=special.store_name,
+            store_slug=special.store_slug,
+            price=special.price_display,
+            price_numeric=special.price_cents,
             unit_price=special.unit_price,
             image_url=special.image_url,
             product_url=special.product_url,
@@ -349,7 +340,7 @@ def list_staples(
             # Add this store's price
             existing = products_map[product_key]
             # Check if we already have a price from this store
-            if not any(p.store_id == store_obj.id for p in existing.prices):
+            if not any(p.store_id == special.store_id for p in existing.prices):
                 existing.prices.append(store_price)
 
     # ========== 2. Query Product/StoreProduct/Price tables (everyday prices) ==========
@@ -357,13 +348,11 @@ def list_staples(
     fruit_veg_category_id = 1  # From the database check earlier
 
     everyday_query = db.query(
-        Product, StoreProduct, Price, Store
+        Product, StoreProduct, Price
     ).select_from(Product).join(
         StoreProduct, StoreProduct.product_id == Product.id
     ).join(
         Price, Price.store_product_id == StoreProduct.id
-    ).join(
-        Store, Store.id == StoreProduct.store_id
     ).filter(
         Product.category_id == fruit_veg_category_id
     )
@@ -372,17 +361,15 @@ def list_staples(
         everyday_query = everyday_query.filter(StoreProduct.store_id == store_id_filter)
 
     if search:
-        search_term = f"%{search}%"
-        everyday_query = everyday_query.filter(
-            or_(
-                Product.name.ilike(search_term),
-                Product.brand.ilike(search_term)
-            )
-        )
+        everyday_query = everyday_query.filter(search_condition(Product, search))
 
     everyday_products = everyday_query.all()
 
-    for product, store_product, price, store_obj in everyday_products:
+    for product, store_product, price in everyday_products:
+        store_obj = stores_db.get(store_product.store_id)
+        if not store_obj:
+            continue
+
         # Determine category by name keywords
         cat_slug, cat_display = _get_category_for_product_name(product.name)
         if not cat_slug:
@@ -491,11 +478,11 @@ def get_staple_categories(db: Session = Depends(get_db)):
     all_cat_ids = list(set(all_cat_ids))
 
     # Include specials with matching category_id OR without category_id (for keyword matching)
-    specials = db.query(Special).filter(
-        Special.valid_to >= today,
+    specials = db.query(CurrentSpecial.name, CurrentSpecial.category_id).filter(
+        CurrentSpecial.valid_to >= today,
         or_(
-            Special.category_id.in_(all_cat_ids),
-            Special.category_id.is_(None)
+            CurrentSpecial.category_id.in_(all_cat_ids),
+            CurrentSpecial.category_id.is_(None)
         )
     ).all()
 
@@ -576,8 +563,7 @@ def get_staple(product_id: int, db: Session = Depends(get_db)):
 
     cat_slug, cat_display = _get_category_for_special(special, db)
 
-    stores = {s.id: s for s in db.query(Store).all()}
-    store = stores.get(special.store_id)
+    store = store_registry.get(special.store_id)
 
     price_cents = _price_to_cents(special.price)
     store_price = StapleStorePrice(
@@ -616,49 +602,39 @@ def compare_basket(
     if not request.items:
         raise HTTPException(status_code=400, detail="Basket is empty")
 
-    stores = db.query(Store).all()
-    store_totals = {
-        store.id: {
-            "store": store,
-            "total_cents": 0,
-            "items_found": 0,
-            "items_missing": []
-        }
-        for store in stores
-    }
-
-    for item in request.items:
-        # Find the special by ID
-        special = db.query(Special).filter(Special.id == item.product_id).first()
-        if not special:
-            for store_id in store_totals:
-                store_totals[store_id]["items_missing"].append(item.product_name)
-            continue
-
-        # Add price to the store that has this special
-        store_id = special.store_id
-        if store_id in store_totals:
-            price_cents = _price_to_cents(special.price)
-            store_totals[store_id]["total_cents"] += price_cents * item.quantity
-            store_totals[store_id]["items_found"] += 1
-
-        # Mark as missing for other stores
-        for sid in store_totals:
-            if sid != store_id:
-                store_totals[sid]["items_missing"].append(special.name)
+    # Whole basket in one query, priced in memory
+    lines = [
+        BasketLine(item_id=item.product_id, name=item.product_name, quantity=item.quantity)
+        for item in request.items
+    ]
+    quote = price_basket(load_special_prices(db, lines))
 
     # Build response
     basket_totals = []
-    for store_id, data in store_totals.items():
-        store = data["store"]
+    for total in quote.store_totals:
+        store = store_registry.get(total.store_id)
         basket_totals.append(BasketStoreTotal(
             store_id=store.id,
             store_name=store.name,
             store_slug=store.slug,
-            total=_cents_to_display(data["total_cents"]),
-            total_numeric=data["total_cents"],
-            items_available=data["items_found"],
-            items_missing=data["items_missing"]
+            total=_cents_to_display(total.total_cents),
+            total_numeric=total.total_cents,
+            items_available=total.items_found,
+            items_missing=total.items_missing
+        ))
+
+    mixed_basket = []
+    for line in quote.split:
+        store = store_registry.get(line.store_id)
+        mixed_basket.append(BasketSplitLine(
+            product_id=line.line.item_id,
+            product_name=line.name,
+            quantity=line.line.quantity,
+            store_id=store.id,
+            store_name=store.name,
+            store_slug=store.slug,
+            price=_cents_to_display(line.unit_cents),
+            price_numeric=line.unit_cents
         ))
 
     # Sort by total (cheapest first), but prioritize stores with items
@@ -691,5 +667,8 @@ def compare_basket(
         best_total=best_total,
         best_total_numeric=best_total_numeric,
         savings_vs_worst=savings_vs_worst,
-        savings_numeric=savings_numeric
+        savings_numeric=savings_numeric,
+        mixed_basket=mixed_basket,
+        mixed_total=_cents_to_display(quote.split_total_cents) if mixed_basket else None,
+        mixed_total_numeric=quote.split_total_cents if mixed_basket else None
     )
@@ -269,6 +269,18 @@ class BasketStoreTotal(BaseModel):
     items_missing: list[str] = []
 
 
+class BasketSplitLine(BaseModel):
+    """Where one basket item is cheapest in the mixed-store split."""
+    product_id: int
+    product_name: str
+    quantity: int = 1
+    store_id: int
+    store_name: str
+    store_slug: str
+    price: str  # Display unit price like "$3.90"
+    price_numeric: int  # Unit price in cents
+
+
 class BasketCompareRequest(BaseModel):
     """Request to compare a basket across stores."""
     items: list[BasketItem]
@@ -282,6 +294,57 @@ class BasketCompareResponse(BaseModel):
     best_total_numeric: int | None = None
     savings_vs_worst: str | None = None  # "Save $6.30"
     savings_numeric: int | None = None  # Savings in cents
+    # Buying each item wherever it is cheapest
+    mixed_basket: list[BasketSplitLine] = []
+    mixed_total: str | None = None
+    mixed_total_numeric: int | None = None
+
+
+class BasketOptimizeItem(BaseModel):
+    """Product and quantity in a basket to optimize."""
+    product_id: int
+    quantity: int = 1
+
+
+class BasketOptimizeRequest(BaseModel):
+    """Basket plus shopping constraints for the multi-store optimizer."""
+    items: list[BasketOptimizeItem]
+    max_stores: int | None = None  # Most stores to visit (default: any)
+    store_costs: dict[str, Decimal] = {}  # Fixed cost per visited store slug, e.g. {"aldi": 4.00}
+    allow_substitutes: bool = False  # Same type and size, any brand
+    time_budget_ms: int = 50  # Solver time budget (1-2000)
+
+
+class BasketOptimizeLine(BaseModel):
+    """Where one basket item is bought in the optimized plan."""
+    product_id: int  # Requested product
+    product_name: str
+    quantity: int = 1
+    store_slug: str
+    store_name: str
+    bought_product_id: int  # Differs from product_id when substituted
+    bought_product_name: str
+    substituted: bool = False
+    price: str  # Display unit price like "$3.90"
+    price_numeric: int  # Unit price in cents
+
+
+class BasketOptimizeResponse(BaseModel):
+    """Cheapest multi-store plan for a basket."""
+    stores: list[str]  # Store slugs to visit
+    lines: list[BasketOptimizeLine]
+    items_missing: list[str] = []
+    unknown_product_ids: list[int] = []
+    items_total: str
+    store_costs_total: str
+    total: str
+    total_numeric: int  # Items plus store costs, in cents
+    best_single_store: str | None = None
+    best_single_store_total: str | None = None
+    savings_vs_single_store: int | None = None  # In cents
+    solver: str  # "exact", "exact+greedy" or "greedy"
+    exact: bool
+    elapsed_ms: float
 
 
 # Update forward references
@@ -38,9 +38,12 @@ class Special(SpecialBase):
 class SpecialsList(BaseModel):
     items: list[Special]
     total: int
+    total_is_estimate: bool = False
     page: int
     limit: int
     has_more: bool
+    next_cursor: str | None = None  # Keyset cursor for the next page
+    dataset_changed: bool = False  # Specials were rescraped since the cursor was issued
 
 
 class SpecialsStats(BaseModel):
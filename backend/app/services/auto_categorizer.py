@@ -11,7 +11,7 @@ Features:
 - Descriptor pattern stripping to identify core product type
 """
 import re
-from typing import Optional, Tuple, List
+from typing import Iterable, Optional
 
 # Category priority weights - higher number = higher priority when multiple matches
 # Specific product categories beat generic descriptor categories
@@ -966,6 +966,9 @@ CATEGORY_KEYWORDS = {
 }
 
 
+_DESCRIPTOR_REGEXES = [re.compile(pattern, re.IGNORECASE) for pattern in DESCRIPTOR_PATTERNS]
+
+
 def extract_primary_product(name: str) -> str:
     """
     Extract the primary product from a product name by stripping descriptors.
@@ -984,66 +987,230 @@ def extract_primary_product(name: str) -> str:
     text = name.lower()
 
     # Strip descriptor patterns
-    for pattern in DESCRIPTOR_PATTERNS:
-        text = re.sub(pattern, '', text, flags=re.IGNORECASE)
+    for regex in _DESCRIPTOR_REGEXES:
+        text = regex.sub('', text)
 
     return text.strip()
 
 
-def _keyword_matches(keyword: str, text: str) -> bool:
-    """
-    Check if keyword matches in text, using word boundaries for short words.
-
-    Short keywords (4 chars or less) use word boundary matching to prevent
-    false positives like "rump" matching "crumpet" or "veal" matching "reveal".
+def _is_word_char(char: str) -> bool:
+    """Match the definition of \\w used by the re module."""
+    return char.isalnum() or char == '_'
 
-    Args:
-        keyword: The keyword to search for
-        text: The text to search in (should be lowercase)
 
-    Returns:
-        True if keyword matches, False otherwise
+class _KeywordAutomaton:
     """
-    if len(keyword) <= 4 and ' ' not in keyword:
-        # Use word boundary for short single-word keywords
-        pattern = rf'\b{re.escape(keyword)}\b'
-        return bool(re.search(pattern, text, re.IGNORECASE))
-    else:
-        # Longer keywords or multi-word phrases use substring match
-        return keyword in text
+    Aho-Corasick automaton over every keyword and exclusion phrase.
 
-
-def _calculate_match_score(text: str, rules: dict, category_slug: str) -> int:
+    A single pass over the text reports every (possibly overlapping)
+    occurrence of every term, so the cost per product no longer grows with
+    the number of categories.
     """
-    Calculate a match score for a category based on keywords and patterns.
 
-    Returns:
-        Score (0 if no match, higher = better match)
+    def __init__(self, terms: list[str]):
+        self.terms = terms
+        self._goto: list[dict[str, int]] = [{}]
+        self._fail: list[int] = [0]
+        self._output: list[list[int]] = [[]]
+
+        for term_id, term in enumerate(terms):
+            state = 0
+            for char in term:
+                next_state = self._goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self._goto)
+                    self._goto[state][char] = next_state
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._output.append([])
+                state = next_state
+            self._output[state].append(term_id)
+
+        # Breadth-first pass to wire failure links
+        queue = list(self._goto[0].values())
+        for state in queue:
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(char, 0)
+                self._fail[next_state] = target if target != next_state else 0
+                self._output[next_state] = self._output[next_state] + self._output[self._fail[next_state]]
+
+    def iter_matches(self, text: str):
+        """Yield (term_id, start, end) for every occurrence of every term."""
+        goto = self._goto
+        fail = self._fail
+        output = self._output
+        terms = self.terms
+        state = 0
+        for index, char in enumerate(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for term_id in output[state]:
+                end = index + 1
+                yield term_id, end - len(terms[term_id]), end
+
+
+class CompiledCategorizer:
     """
-    # Check exclusions first - if any exclusion matches, return 0
-    exclusions = rules.get("exclude", [])
-    if any(excl in text for excl in exclusions):
-        return 0
+    Pre-compiled form of SUBCATEGORY_KEYWORDS and CATEGORY_KEYWORDS.
 
-    score = 0
+    Built once at import time. All keywords and exclusions across every
+    category are merged into one Aho-Corasick automaton, and each
+    category's regex patterns are joined into a single compiled alternation
+    that is only evaluated when no keyword already decided the score.
+    Produces exactly the same results as scoring each category in turn.
+    """
 
-    # Keywords get higher base score than patterns
-    for keyword in rules.get("keywords", []):
-        if _keyword_matches(keyword, text):
-            # Longer keyword matches are more specific
-            score = max(score, 100 + len(keyword))
+    def __init__(self, subcategory_rules: dict, category_rules: dict):
+        self._terms: list[str] = []
+        self._term_ids: dict[str, int] = {}
+        # Per tier: list of (slug, priority, keyword_term_ids, exclusion_term_ids, pattern_regex)
+        self._tiers = [
+            self._compile_tier(subcategory_rules),
+            self._compile_tier(category_rules),
+        ]
+        # Short single-word keywords need word boundaries so "rump" doesn't
+        # match "crumpet" and "veal" doesn't match "reveal"
+        self._needs_boundary = [len(term) <= 4 and ' ' not in term for term in self._terms]
+        self._automaton = _KeywordAutomaton(self._terms)
+
+    def _term_id(self, term: str) -> int:
+        term = term.lower()
+        term_id = self._term_ids.get(term)
+        if term_id is None:
+            term_id = len(self._terms)
+            self._terms.append(term)
+            self._term_ids[term] = term_id
+        return term_id
+
+    def _compile_tier(self, rules_by_slug: dict) -> list[tuple]:
+        compiled = []
+        for slug, rules in rules_by_slug.items():
+            keyword_ids = frozenset(self._term_id(keyword) for keyword in rules.get("keywords", []))
+            exclusion_ids = frozenset(self._term_id(excl) for excl in rules.get("exclude", []))
+            patterns = rules.get("patterns", [])
+            pattern_regex = None
+            if patterns:
+                pattern_regex = re.compile("|".join(f"(?:{p})" for p in patterns), re.IGNORECASE)
+            compiled.append((slug, CATEGORY_PRIORITY.get(slug, 50), keyword_ids, exclusion_ids, pattern_regex))
+        return compiled
+
+    def _scan(self, text: str) -> tuple[set[int], set[int]]:
+        """
+        Return (keyword hits, substring hits) for one pass over text.
+
+        Substring hits ignore word boundaries (used for exclusions and long
+        keywords); keyword hits additionally honour the boundary rule for
+        short keywords.
+        """
+        substring_hits = set()
+        keyword_hits = set()
+        needs_boundary = self._needs_boundary
+        length = len(text)
+        for term_id, start, end in self._automaton.iter_matches(text):
+            substring_hits.add(term_id)
+            if needs_boundary[term_id]:
+                term = self._terms[term_id]
+                # Same semantics as re's \b on either side of the keyword
+                if start > 0 and _is_word_char(text[start - 1]) == _is_word_char(term[0]):
+                    continue
+                if end < length and _is_word_char(text[end]) == _is_word_char(term[-1]):
+                    continue
+            keyword_hits.add(term_id)
+        return keyword_hits, substring_hits
+
+    def _keyword_score(self, keyword_ids: frozenset, exclusion_ids: frozenset, priority: int, hits) -> Optional[int]:
+        """
+        Keyword-only score for one category, or None if an exclusion matched.
+
+        Returns 0 when nothing excluded the category but no keyword matched.
+        """
+        keyword_hits, substring_hits = hits
+        if not exclusion_ids.isdisjoint(substring_hits):
+            return None
+        matched = keyword_ids.intersection(keyword_hits)
+        if not matched:
+            return 0
+        # Longer keyword matches are more specific
+        return 100 + max(len(self._terms[term_id]) for term_id in matched) + priority
+
+    def _best_in_tier(self, tier: list[tuple], text: str, text_hits, get_primary) -> Optional[str]:
+        """
+        Return the highest scoring category in a tier (first declared wins ties).
+
+        Keyword scores come straight from the automaton scan. Regex patterns
+        are the expensive part, so they are evaluated in order of the best
+        score they could still produce and skipped once they can no longer
+        beat the current leader.
+        """
+        best = (0, 0)  # (score, -index)
+        best_slug = None
+        pending = []
+
+        for index, (slug, priority, keyword_ids, exclusion_ids, pattern_regex) in enumerate(tier):
+            full_score = self._keyword_score(keyword_ids, exclusion_ids, priority, text_hits)
+            if full_score:
+                if (full_score, -index) > best:
+                    best, best_slug = (full_score, -index), slug
+                continue
+
+            # No keyword on the full text: pattern on the full text, then the
+            # primary product (descriptors stripped) as a second chance
+            primary_text, primary_hits = get_primary()
+            primary_score = self._keyword_score(keyword_ids, exclusion_ids, priority, primary_hits)
+            bound = primary_score or 0
+            if pattern_regex is not None and (full_score is not None or primary_score is not None):
+                bound = max(bound, 50 + priority)
+            if bound:
+                pending.append((bound, index, full_score, primary_score))
+
+        pending.sort(key=lambda entry: (-entry[0], entry[1]))
+        for bound, index, full_score, primary_score in pending:
+            if (bound, -index) < best:
+                break
+            slug, priority, _, _, pattern_regex = tier[index]
+            score = 0
+            if full_score is not None and pattern_regex is not None and pattern_regex.search(text):
+                score = 50 + priority
+            elif primary_score is not None:
+                score = primary_score
+                if not score and pattern_regex is not None and pattern_regex.search(get_primary()[0]):
+                    score = 50 + priority
+            if score and (score, -index) > best:
+                best, best_slug = (score, -index), slug
+
+        return best_slug
+
+    def categorize(self, name: str, brand: Optional[str] = None) -> Optional[str]:
+        """Return the best category slug for a product, or None."""
+        if not name:
+            return None
+
+        raw_text = f"{name} {brand or ''}"
+        text = raw_text.lower()
+        text_hits = self._scan(text)
+        primary = []
+
+        def get_primary():
+            if not primary:
+                primary_text = extract_primary_product(raw_text)
+                primary.extend((primary_text, self._scan(primary_text)))
+            return primary
+
+        # Subcategories first, then fall back to parent categories
+        for tier in self._tiers:
+            best_slug = self._best_in_tier(tier, text, text_hits, get_primary)
+            if best_slug:
+                return best_slug
 
-    # Patterns get moderate score
-    for pattern in rules.get("patterns", []):
-        if re.search(pattern, text, re.IGNORECASE):
-            score = max(score, 50)
+        return None
 
-    # Apply category priority modifier
-    priority = CATEGORY_PRIORITY.get(category_slug, 50)
-    if score > 0:
-        score += priority
 
-    return score
+_categorizer = CompiledCategorizer(SUBCATEGORY_KEYWORDS, CATEGORY_KEYWORDS)
 
 
 def categorize_product(name: str, brand: Optional[str] = None) -> Optional[str]:
@@ -1068,50 +1235,39 @@ def categorize_product(name: str, brand: Optional[str] = None) -> Optional[str]:
         "Heinz Tomato Sauce 500ml" -> "sauces-condiments"
         "Arnott's Shapes BBQ 175g" -> "biscuits" (not "sausages-bbq")
     """
-    if not name:
-        return None
-
-    # Combine name and brand for matching
-    text = f"{name} {brand or ''}".lower()
-
-    # Also try matching with primary product only (descriptors stripped)
-    primary_text = extract_primary_product(f"{name} {brand or ''}")
-
-    matches: List[Tuple[str, int]] = []  # List of (category_slug, score)
+    return _categorizer.categorize(name, brand)
 
-    # Check all subcategories and collect matches with scores
-    for subcategory_slug, rules in SUBCATEGORY_KEYWORDS.items():
-        # Try matching full text first
-        score = _calculate_match_score(text, rules, subcategory_slug)
 
-        # If no match on full text, try primary product text
-        if score == 0:
-            score = _calculate_match_score(primary_text, rules, subcategory_slug)
-
-        if score > 0:
-            matches.append((subcategory_slug, score))
-
-    # If we have subcategory matches, return the best one
-    if matches:
-        best_match = max(matches, key=lambda x: x[1])
-        return best_match[0]
-
-    # Fall back to parent categories
-    matches = []
-    for category_slug, rules in CATEGORY_KEYWORDS.items():
-        score = _calculate_match_score(text, rules, category_slug)
+def categorize_many(
+    names: Iterable[str],
+    brands: Optional[Iterable[Optional[str]]] = None,
+) -> list[Optional[str]]:
+    """
+    Categorize a batch of products in one call.
 
-        if score == 0:
-            score = _calculate_match_score(primary_text, rules, category_slug)
+    Weekly catalogues repeat the same name/brand pair many times (multiple
+    sizes, store duplicates), so results are memoized within the batch.
 
-        if score > 0:
-            matches.append((category_slug, score))
-
-    if matches:
-        best_match = max(matches, key=lambda x: x[1])
-        return best_match[0]
+    Args:
+        names: Product names
+        brands: Optional brands, aligned with names
 
-    return None
+    Returns:
+        List of category slugs (or None) in the same order as names
+    """
+    names = list(names)
+    brands = list(brands) if brands is not None else [None] * len(names)
+    if len(brands) != len(names):
+        raise ValueError("names and brands must be the same length")
+
+    seen: dict[tuple[str, Optional[str]], Optional[str]] = {}
+    results = []
+    for name, brand in zip(names, brands):
+        key = (name, brand)
+        if key not in seen:
+            seen[key] = _categorizer.categorize(name, brand)
+        results.append(seen[key])
+    return results
 
 
 def categorize_batch(products: list[dict]) -> dict[int, str]:
@@ -1124,15 +1280,15 @@ def categorize_batch(products: list[dict]) -> dict[int, str]:
     Returns:
         Dict mapping product_id to category_slug
     """
-    results = {}
-    for product in products:
-        category = categorize_product(
-            product.get("name", ""),
-            product.get("brand")
-        )
-        if category:
-            results[product["id"]] = category
-    return results
+    categories = categorize_many(
+        [product.get("name", "") for product in products],
+        [product.get("brand") for product in products],
+    )
+    return {
+        product["id"]: category
+        for product, category in zip(products, categories)
+        if category
+    }
 
 
 def get_category_suggestions(name: str, brand: Optional[str] = None) -> list[str]:
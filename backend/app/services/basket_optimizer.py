@@ -0,0 +1,360 @@
+"""
+Basket Optimizer
+
+Finds the cheapest way to buy a basket across stores, given:
+- max_stores: how many stores the shopper is willing to visit
+- store_costs: a fixed cost per visited store (travel, delivery fee), in cents
+- allow_substitutes: a like-for-like product (product_matching.
+  find_similar_products: same type and size, any brand) may replace an item
+  when it is cheaper at a store
+
+Objective: fewest unavailable items first, then lowest items + store costs.
+
+Solvers:
+- exact: every store subset up to max_stores is evaluated (each item goes
+  to its cheapest store in the subset; a store's fixed cost is paid only if
+  it gets an item). Used while the subset count is within EXACT_MAX_SUBSETS,
+  which covers the four supermarkets many times over.
+- greedy: add the store that most improves the objective until max_stores
+  or no improvement, then try dropping each store. Used for large store
+  counts, and to finish when the exact search runs out of time_budget_ms
+  (the result then says exact=False).
+
+Per-item offers (each store's best unit price, after substitution) are
+cached for ITEM_CACHE_TTL, so repeated what-if queries on the same basket
+(changing max_stores or store costs) skip the database entirely and solve in
+well under a millisecond.
+"""
+import itertools
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Optional
+
+from sqlalchemy.orm import Session
+
+from app.models import Product
+from app.services.basket_pricing import BasketLine, load_product_prices
+from app.services.product_matching import extract_product_type, find_similar_products
+from app.services.store_registry import store_registry
+
+logger = logging.getLogger(__name__)
+
+ITEM_CACHE_TTL = 300.0  # Seconds an item's offers are reused
+ITEM_CACHE_MAX_ENTRIES = 20000
+SUBSTITUTE_LIMIT = 10  # Similar products considered per item
+EXACT_MAX_SUBSETS = 4096  # Largest store-subset count searched exhaustively
+DEFAULT_TIME_BUDGET_MS = 50
+
+
+@dataclass(frozen=True)
+class Offer:
+    """An item's best unit price at one store."""
+    unit_cents: int
+    product_id: int
+    product_name: str
+
+
+@dataclass(frozen=True)
+class ItemOffers:
+    """Every store's offer for one basket product."""
+    product_id: int
+    name: str
+    offers: dict[int, Offer]  # store_id -> offer
+
+
+@dataclass
+class Assignment:
+    """Where one basket line is bought."""
+    line: BasketLine
+    name: str
+    store_id: int
+    offer: Offer
+
+    @property
+    def substituted(self) -> bool:
+        return self.offer.product_id != self.line.item_id
+
+
+@dataclass
+class OptimizedBasket:
+    """The chosen stores and per-item assignment."""
+    stores: list[int]
+    assignments: list[Assignment]
+    missing: list[str]
+    items_cents: int
+    store_costs_cents: int
+    exact: bool
+    solver: str
+    elapsed_ms: float
+    best_single_store: Optional[int] = None
+    best_single_store_cents: Optional[int] = None
+    unknown: list[int] = field(default_factory=list)  # Product ids that don't exist
+
+    @property
+    def total_cents(self) -> int:
+        return self.items_cents + self.store_costs_cents
+
+
+class _ItemOfferCache:
+    """Thread-safe TTL memo of per-item offers (sync handlers run in a threadpool)."""
+
+    def __init__(self, max_entries: int = ITEM_CACHE_MAX_ENTRIES):
+        self._entries: OrderedDict[tuple, tuple[Optional[ItemOffers], float]] = OrderedDict()
+        self._max_entries = max_entries
+        self._lock = threading.Lock()
+
+    def get(self, key: tuple) -> tuple[bool, Optional[ItemOffers]]:
+        """(hit, offers); offers is None for a cached unknown product."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return False, None
+            offers, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return False, None
+            self._entries.move_to_end(key)
+            return True, offers
+
+    def set(self, key: tuple, offers: Optional[ItemOffers]):
+        with self._lock:
+            self._entries[key] = (offers, time.monotonic() + ITEM_CACHE_TTL)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+_item_offers = _ItemOfferCache()
+
+
+# ============== Loading offers ==============
+
+def _substitutes(db: Session, product_ids: list[int]) -> dict[int, list[int]]:
+    """Like-for-like alternatives for each product (excluding itself)."""
+    alternatives = {}
+    for product in db.query(Product).filter(Product.id.in_(product_ids)).all():
+        product_type = extract_product_type(product.name, product.brand)
+        similar = find_similar_products(db, product_type, product.size, product.category_id, limit=SUBSTITUTE_LIMIT)
+        alternatives[product.id] = [p.id for p in similar if p.id != product.id]
+    return alternatives
+
+
+def load_item_offers(db: Session, product_ids: list[int], allow_substitutes: bool) -> dict[int, Optional[ItemOffers]]:
+    """
+    Offers for each product, from the cache where possible.
+
+    Missing entries are loaded together: one price query for the products
+    (plus their substitutes), and one similarity lookup per product when
+    substitution is on.
+    """
+    result: dict[int, Optional[ItemOffers]] = {}
+    to_load = []
+    for product_id in dict.fromkeys(product_ids):
+        hit, offers = _item_offers.get((product_id, allow_substitutes))
+        if hit:
+            result[product_id] = offers
+        else:
+            to_load.append(product_id)
+    if not to_load:
+        return result
+
+    alternatives = _substitutes(db, to_load) if allow_substitutes else {}
+    candidate_ids = list(dict.fromkeys(
+        itertools.chain(to_load, itertools.chain.from_iterable(alternatives.values()))
+    ))
+    matrix = load_product_prices(db, [BasketLine(item_id=pid) for pid in candidate_ids])
+    rows = {line.item_id: row for row, line in enumerate(matrix.lines)}
+
+    for product_id in to_load:
+        row = rows[product_id]
+        if not matrix.found[row]:
+            result[product_id] = None
+            _item_offers.set((product_id, allow_substitutes), None)
+            continue
+
+        offers: dict[int, Offer] = {}
+        # The basket's own product first, so it wins ties with substitutes
+        for candidate in [product_id, *alternatives.get(product_id, [])]:
+            candidate_row = rows[candidate]
+            for column, store_id in enumerate(matrix.store_ids):
+                cents = matrix.cents[candidate_row][column]
+                if cents is not None and (store_id not in offers or cents < offers[store_id].unit_cents):
+                    offers[store_id] = Offer(cents, candidate, matrix.names[candidate_row])
+
+        offers_for_item = ItemOffers(product_id=product_id, name=matrix.names[row], offers=offers)
+        result[product_id] = offers_for_item
+        _item_offers.set((product_id, allow_substitutes), offers_for_item)
+    return result
+
+
+# ============== Solving ==============
+
+class _Problem:
+    """Basket lines as a cost matrix over candidate stores."""
+
+    def __init__(self, lines: list[BasketLine], items: list[ItemOffers], store_ids: list[int], store_costs: dict[int, int]):
+        self.lines = lines
+        self.items = items
+        self.store_ids = store_ids
+        self.fixed = [store_costs.get(store_id, 0) for store_id in store_ids]
+        # cost[row][s]: line total at store s, or None where it isn't sold
+        self.cost = [
+            [
+                item.offers[store_id].unit_cents * line.quantity if store_id in item.offers else None
+                for store_id in store_ids
+            ]
+            for line, item in zip(lines, items)
+        ]
+
+    def evaluate(self, subset: tuple[int, ...]) -> tuple[tuple[int, int], list[Optional[int]]]:
+        """((missing, total cents), chosen store index per line) for a store subset."""
+        missing = 0
+        items_cents = 0
+        choice: list[Optional[int]] = []
+        used = set()
+        for row_costs in self.cost:
+            best = None
+            best_store = None
+            for s in subset:
+                cents = row_costs[s]
+                if cents is not None and (best is None or cents < best):
+                    best, best_store = cents, s
+            if best_store is None:
+                missing += 1
+            else:
+                items_cents += best
+                used.add(best_store)
+            choice.append(best_store)
+        return (missing, items_cents + sum(self.fixed[s] for s in used)), choice
+
+
+def _solve_exact(problem: _Problem, max_stores: int, deadline: float):
+    """Exhaustive subset search; returns (best, finished)."""
+    best = problem.evaluate(())
+    best_subset: tuple[int, ...] = ()
+    store_count = len(problem.store_ids)
+    for size in range(1, max_stores + 1):
+        for subset in itertools.combinations(range(store_count), size):
+            if time.perf_counter() > deadline:
+                return best_subset, best, False
+            candidate = problem.evaluate(subset)
+            if candidate[0] < best[0]:
+                best, best_subset = candidate, subset
+    return best_subset, best, True
+
+
+def _solve_greedy(problem: _Problem, max_stores: int, start: tuple[int, ...] = ()):
+    """Add the most improving store until nothing helps, then try dropping stores."""
+    subset = start
+    best = problem.evaluate(subset)
+    while len(subset) < max_stores:
+        options = [
+            (problem.evaluate(subset + (s,)), subset + (s,))
+            for s in range(len(problem.store_ids)) if s not in subset
+        ]
+        if not options:
+            break
+        candidate, candidate_subset = min(options, key=lambda option: option[0][0])
+        if candidate[0] >= best[0]:
+            break
+        best, subset = candidate, candidate_subset
+
+    improved = True
+    while improved and subset:
+        improved = False
+        for s in subset:
+            smaller = tuple(x for x in subset if x != s)
+            candidate = problem.evaluate(smaller)
+            if candidate[0] < best[0]:
+                best, subset, improved = candidate, smaller, True
+                break
+    return subset, best
+
+
+def optimize_basket(
+    db: Session,
+    lines: list[BasketLine],
+    max_stores: Optional[int] = None,
+    store_costs: Optional[dict[int, int]] = None,
+    allow_substitutes: bool = False,
+    time_budget_ms: int = DEFAULT_TIME_BUDGET_MS,
+) -> OptimizedBasket:
+    """
+    Cheapest assignment of basket lines to stores under the constraints.
+
+    Args:
+        db: Database session (only used for items not in the offer cache)
+        lines: Basket products and quantities
+        max_stores: Most stores to visit (default: no limit)
+        store_costs: Fixed cost in cents per visited store_id
+        allow_substitutes: Allow like-for-like substitutes
+        time_budget_ms: Solver time budget; past it the greedy result is used
+    """
+    started = time.perf_counter()
+    offers = load_item_offers(db, [line.item_id for line in lines], allow_substitutes)
+
+    known = [line for line in lines if offers.get(line.item_id) is not None]
+    unknown = [line.item_id for line in lines if offers.get(line.item_id) is None]
+    items = [offers[line.item_id] for line in known]
+
+    store_ids = [store.id for store in store_registry.all()]
+    max_stores = len(store_ids) if max_stores is None else min(max_stores, len(store_ids))
+    problem = _Problem(known, items, store_ids, store_costs or {})
+
+    # The solver budget starts after loading, so cold caches don't starve it
+    deadline = time.perf_counter() + time_budget_ms / 1000
+    subset_count = sum(math.comb(len(store_ids), size) for size in range(1, max_stores + 1))
+
+    if subset_count <= EXACT_MAX_SUBSETS:
+        subset, (objective, choice), exact = _solve_exact(problem, max_stores, deadline)
+        solver = "exact"
+        if not exact:
+            # Out of time: improve on the best subset found so far greedily
+            subset, (objective, choice) = _solve_greedy(problem, max_stores, subset)
+            solver = "exact+greedy"
+    else:
+        subset, (objective, choice) = _solve_greedy(problem, max_stores)
+        exact, solver = False, "greedy"
+
+    assignments = []
+    missing = []
+    for line, item, store_index in zip(known, items, choice):
+        if store_index is None:
+            missing.append(item.name)
+            continue
+        store_id = store_ids[store_index]
+        assignments.append(Assignment(line=line, name=item.name, store_id=store_id, offer=item.offers[store_id]))
+
+    used = list(dict.fromkeys(a.store_id for a in assignments))
+    items_cents = sum(a.offer.unit_cents * a.line.quantity for a in assignments)
+
+    # Baseline: everything from the one best store (including its fixed cost)
+    singles = [(problem.evaluate((s,))[0], store_ids[s]) for s in range(len(store_ids))]
+    best_single = min(singles, default=None)
+
+    result = OptimizedBasket(
+        stores=used,
+        assignments=assignments,
+        missing=missing,
+        items_cents=items_cents,
+        store_costs_cents=objective[1] - items_cents,
+        exact=exact,
+        solver=solver,
+        elapsed_ms=(time.perf_counter() - started) * 1000,
+        best_single_store=best_single[1] if best_single else None,
+        best_single_store_cents=best_single[0][1] if best_single else None,
+        unknown=unknown,
+    )
+    logger.debug(
+        f"Optimized {len(lines)}-line basket over {len(store_ids)} stores with {solver} "
+        f"in {result.elapsed_ms:.2f}ms"
+    )
+    return result
@@ -0,0 +1,211 @@
+"""
+Basket Pricing Engine
+
+Prices a whole shopping basket across every store at once, for
+/compare/basket (catalogue products) and /staples/basket-compare (specials).
+
+1. Load: one query resolves every basket line's price at every store into a
+   price matrix (lines x stores, in cents; None where the store doesn't
+   sell it). Latest prices come from a ROW_NUMBER() window, so the query
+   count doesn't depend on basket size or store count.
+2. Price: column sums give each store's total and missing items, and a row
+   minimum picks the cheapest store for each line (the mixed-store split).
+
+Everything after the load is plain list arithmetic over the matrix, so
+baskets of hundreds of items cost a few milliseconds.
+"""
+from dataclasses import dataclass, field
+from decimal import Decimal
+from typing import Optional
+
+from sqlalchemy import and_, desc, func, select
+from sqlalchemy.orm import Session
+
+from app.models import Price, Product, Special, StoreProduct
+from app.services.store_registry import store_registry
+
+
+@dataclass(frozen=True)
+class BasketLine:
+    """One line of a basket: a product (or special) id and how many."""
+    item_id: int
+    name: Optional[str] = None  # Fallback name when the item doesn't exist
+    quantity: int = 1
+
+
+@dataclass
+class PriceMatrix:
+    """Unit prices in cents for each basket line (rows) at each store (columns)."""
+    lines: list[BasketLine]
+    names: list[str]  # Display name per line
+    found: list[bool]  # Whether the line's item exists at all
+    store_ids: list[int]
+    cents: list[list[Optional[int]]]
+
+
+@dataclass
+class StoreTotal:
+    """A store's price for the lines it sells."""
+    store_id: int
+    total_cents: int = 0
+    items_found: int = 0
+    items_missing: list[str] = field(default_factory=list)
+
+
+@dataclass
+class SplitLine:
+    """Where a line is cheapest in the mixed-store split."""
+    line: BasketLine
+    name: str
+    store_id: int
+    unit_cents: int
+
+
+@dataclass
+class BasketQuote:
+    """Per-store totals plus the cheapest mixed-store split."""
+    store_totals: list[StoreTotal]
+    split: list[SplitLine]
+    split_total_cents: int
+    split_missing: list[str]
+
+
+def _to_cents(price: Decimal) -> int:
+    return int(price * 100)
+
+
+def _empty_matrix(lines: list[BasketLine]) -> PriceMatrix:
+    store_ids = [store.id for store in store_registry.all()]
+    return PriceMatrix(
+        lines=lines,
+        names=[line.name or str(line.item_id) for line in lines],
+        found=[False] * len(lines),
+        store_ids=store_ids,
+        cents=[[None] * len(store_ids) for _ in lines],
+    )
+
+
+# ============== Loading ==============
+
+def load_product_prices(db: Session, lines: list[BasketLine]) -> PriceMatrix:
+    """
+    Latest catalogue price of each product at each store, in one query.
+
+    A product with several store products at one store uses the first one
+    (lowest id) that has a price.
+    """
+    matrix = _empty_matrix(lines)
+    product_ids = {line.item_id for line in lines}
+    if not product_ids:
+        return matrix
+
+    latest = (
+        select(
+            Price.store_product_id,
+            Price.price,
+            func.row_number().over(
+                partition_by=Price.store_product_id,
+                order_by=(desc(Price.recorded_at), desc(Price.id)),
+            ).label("position"),
+        )
+        .join(StoreProduct, StoreProduct.id == Price.store_product_id)
+        .where(StoreProduct.product_id.in_(product_ids))
+        .subquery()
+    )
+    rows = db.execute(
+        select(Product.id, Product.name, StoreProduct.store_id, latest.c.price)
+        .outerjoin(StoreProduct, StoreProduct.product_id == Product.id)
+        .outerjoin(latest, and_(latest.c.store_product_id == StoreProduct.id, latest.c.position == 1))
+        .where(Product.id.in_(product_ids))
+        .order_by(Product.id, StoreProduct.id)
+    ).all()
+
+    names: dict[int, str] = {}
+    prices: dict[tuple[int, int], int] = {}
+    for product_id, name, store_id, price in rows:
+        names[product_id] = name
+        if price is not None and (product_id, store_id) not in prices:
+            prices[(product_id, store_id)] = _to_cents(price)
+
+    _fill(matrix, names, prices)
+    return matrix
+
+
+def load_special_prices(db: Session, lines: list[BasketLine]) -> PriceMatrix:
+    """Price of each special at the one store that has it, in one query."""
+    matrix = _empty_matrix(lines)
+    special_ids = {line.item_id for line in lines}
+    if not special_ids:
+        return matrix
+
+    rows = db.execute(
+        select(Special.id, Special.name, Special.store_id, Special.price)
+        .where(Special.id.in_(special_ids))
+    ).all()
+
+    names = {special_id: name for special_id, name, _, _ in rows}
+    prices = {(special_id, store_id): _to_cents(price) for special_id, _, store_id, price in rows}
+    _fill(matrix, names, prices)
+    return matrix
+
+
+def _fill(matrix: PriceMatrix, names: dict[int, str], prices: dict[tuple[int, int], int]):
+    for row, line in enumerate(matrix.lines):
+        if line.item_id not in names:
+            continue
+        matrix.found[row] = True
+        matrix.names[row] = names[line.item_id]
+        matrix.cents[row] = [prices.get((line.item_id, store_id)) for store_id in matrix.store_ids]
+
+
+# ============== Pricing ==============
+
+def price_basket(matrix: PriceMatrix, skip_unknown: bool = False) -> BasketQuote:
+    """
+    Per-store totals, missing items and the cheapest mixed-store split.
+
+    Args:
+        matrix: Prices from one of the load_* functions
+        skip_unknown: Leave lines whose item doesn't exist out of the
+            missing lists (instead of listing them missing everywhere)
+    """
+    rows = [
+        row for row in range(len(matrix.lines))
+        if matrix.found[row] or not skip_unknown
+    ]
+    quantities = [matrix.lines[row].quantity for row in rows]
+
+    store_totals = []
+    for column, store_id in enumerate(matrix.store_ids):
+        prices = [matrix.cents[row][column] for row in rows]
+        store_totals.append(StoreTotal(
+            store_id=store_id,
+            total_cents=sum(cents * qty for cents, qty in zip(prices, quantities) if cents is not None),
+            items_found=sum(1 for cents in prices if cents is not None),
+            items_missing=[matrix.names[row] for row, cents in zip(rows, prices) if cents is None],
+        ))
+
+    split = []
+    split_missing = []
+    for row in rows:
+        offers = [
+            (cents, column) for column, cents in enumerate(matrix.cents[row]) if cents is not None
+        ]
+        if not offers:
+            split_missing.append(matrix.names[row])
+            continue
+        # Ties go to the earlier store (registry order), like min() over stores
+        cents, column = min(offers)
+        split.append(SplitLine(
+            line=matrix.lines[row],
+            name=matrix.names[row],
+            store_id=matrix.store_ids[column],
+            unit_cents=cents,
+        ))
+
+    return BasketQuote(
+        store_totals=store_totals,
+        split=split,
+        split_total_cents=sum(s.unit_cents * s.line.quantity for s in split),
+        split_missing=split_missing,
+    )
@@ -4,7 +4,9 @@ Brand Extractor Service
 Extracts brand names from product names using a comprehensive list of
 Australian supermarket brands.
 """
-from typing import Optional
+import re
+from functools import lru_cache
+from typing import Iterable, Optional
 
 
 # Comprehensive list of Australian supermarket brands
@@ -136,6 +138,72 @@ KNOWN_BRANDS = [
 ]
 
 
+class BrandIndex:
+    """
+    Prefix trie over a canonical brand list.
+
+    Built once and shared by every extraction call. Walking the product name
+    through the trie finds the longest known brand prefix in time
+    proportional to the brand length, independent of how many brands are
+    known.
+    """
+
+    _END = ""  # Trie key holding the canonical brand at a terminal node
+
+    def __init__(self, brands: Iterable[str]):
+        self._root: dict = {}
+        self.size = 0
+        for brand in brands:
+            node = self._root
+            for char in brand.lower():
+                node = node.setdefault(char, {})
+            # First spelling in the list wins (e.g. "Masterfoods" over "MasterFoods")
+            if self._END not in node:
+                node[self._END] = brand
+                self.size += 1
+
+    def match_prefix(self, name_lower: str) -> Optional[str]:
+        """
+        Return the longest brand that prefixes name_lower and is not followed
+        by another letter (so "Heinz500ml" matches but "Surfside" doesn't
+        match "Surf").
+        """
+        best = None
+        node = self._root
+        for index, char in enumerate(name_lower):
+            node = node.get(char)
+            if node is None:
+                break
+            brand = node.get(self._END)
+            if brand is not None:
+                following = name_lower[index + 1:index + 2]
+                if not following or not following.isalpha():
+                    best = brand
+        return best
+
+
+_brand_index = BrandIndex(KNOWN_BRANDS)
+
+
+def reload_brands(brands: Optional[Iterable[str]] = None) -> int:
+    """
+    Rebuild the brand index, e.g. after KNOWN_BRANDS has been extended.
+
+    The new index is built off to the side and swapped in with a single
+    assignment, so concurrent extractions never see a half-built trie.
+
+    Args:
+        brands: Replacement brand list (defaults to KNOWN_BRANDS)
+
+    Returns:
+        Number of distinct brands in the new index
+    """
+    global _brand_index
+    index = BrandIndex(KNOWN_BRANDS if brands is None else brands)
+    _brand_index = index
+    return index.size
+
+
 def extract_brand_from_name(product_name: str) -> Optional[str]:
     """
     Extract brand from product name.
@@ -158,22 +226,10 @@ def extract_brand_from_name(product_name: str) -> Optional[str]:
     if not product_name:
         return None
 
-    name_lower = product_name.lower()
-
-    # Check each known brand (longest match first to handle "John West" before "John")
-    sorted_brands = sorted(KNOWN_BRANDS, key=len, reverse=True)
-
-    for brand in sorted_brands:
-        brand_lower = brand.lower()
-        # Check if product name starts with this brand
-        if name_lower.startswith(brand_lower + " "):
-            # Return the brand in its canonical form
-            return brand
-        if name_lower.startswith(brand_lower):
-            # Handle cases like "Heinz500ml" (no space)
-            remaining = name_lower[len(brand_lower):]
-            if not remaining or not remaining[0].isalpha():
-                return brand
+    # Longest known brand first (handles "John West" before "John")
+    brand = _brand_index.match_prefix(product_name.lower())
+    if brand:
+        return brand
 
     # Fallback: try to extract brand from first word(s)
     words = product_name.split()
@@ -210,10 +266,40 @@ def extract_brand_from_name(product_name: str) -> Optional[str]:
     return None
 
 
+def extract_brands(product_names: Iterable[str]) -> list[Optional[str]]:
+    """
+    Extract brands for a batch of product names.
+
+    Args:
+        product_names: Product names to process
+
+    Returns:
+        List of brands (or None) in the same order as product_names
+    """
+    return [extract_brand_from_name(name) for name in product_names]
+
+
+# Common size patterns, checked in order
+SIZE_PATTERNS = [
+    re.compile(pattern, re.IGNORECASE)
+    for pattern in [
+        r'(\d+(?:\.\d+)?\s*(?:ml|mL|ML|l|L|litre|litres|liter|liters))',
+        r'(\d+(?:\.\d+)?\s*(?:g|kg|KG|Kg))',
+        r'(\d+\s*(?:pack|pk|Pack|PK))',
+        r'(\d+\s*x\s*\d+(?:\.\d+)?\s*(?:ml|mL|g|kg)?)',  # e.g., "6 x 375ml"
+        r'(\d+(?:\.\d+)?\s*(?:oz|OZ))',
+    ]
+]
+
+
+@lru_cache(maxsize=16384)
 def extract_size_from_name(product_name: str) -> Optional[str]:
     """
     Extract size/quantity from product name.
 
+    Results are memoized (bounded LRU) since the same names recur across
+    stores and weekly scrapes.
+
     Examples:
         - "Heinz Ketchup Tomato Sauce 500mL" → "500mL"
         - "John West Tuna 95g" → "95g"
@@ -225,22 +311,11 @@ def extract_size_from_name(product_name: str) -> Optional[str]:
     Returns:
         The extracted size, or None if not found
     """
-    import re
-
     if not product_name:
         return None
 
-    # Common size patterns
-    patterns = [
-        r'(\d+(?:\.\d+)?\s*(?:ml|mL|ML|l|L|litre|litres|liter|liters))',
-        r'(\d+(?:\.\d+)?\s*(?:g|kg|KG|Kg))',
-        r'(\d+\s*(?:pack|pk|Pack|PK))',
-        r'(\d+\s*x\s*\d+(?:\.\d+)?\s*(?:ml|mL|g|kg)?)',  # e.g., "6 x 375ml"
-        r'(\d+(?:\.\d+)?\s*(?:oz|OZ))',
-    ]
-
-    for pattern in patterns:
-        match = re.search(pattern, product_name, re.IGNORECASE)
+    for pattern in SIZE_PATTERNS:
+        match = pattern.search(product_name)
         if match:
             return match.group(1).strip()
 
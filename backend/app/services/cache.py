@@ -6,17 +6,60 @@ Cache invalidation happens on:
 - New scrape completion
 - Manual cache clear
 - TTL expiration
+
+Invalidation is versioned rather than deleted: every key embeds the current
+generation of the namespaces it depends on (global, store, category), so
+retiring a namespace is one INCR and its old keys simply stop being read and
+age out through their TTL. Filtered listings depend on their own store or
+category generation; unfiltered ones depend on the "all stores" / "all
+categories" generations, which every store or category bump also advances.
+
+Stampede protection (get_or_compute):
+- Entries carry a soft expiry inside a longer hard Redis TTL. Past the soft
+  expiry the stale value is still served while a single caller refreshes it.
+- Refreshes are single-flight: concurrent misses in one process share one
+  computation, and a short Redis lock elects one refresher across workers.
+- Probabilistic early expiration (XFetch) spreads refreshes out ahead of the
+  soft expiry, weighted by how long the value took to compute.
+
+Two tiers:
+- L1: a bounded, size-aware LRU in each worker holding already-deserialized
+  entries and recently read generation counters, so hot keys skip both the
+  network round trip and JSON parsing.
+- L2: Redis, shared by all workers. Generation bumps are broadcast over
+  pub/sub so every worker drops its cached counters at once.
+If Redis is down the L1 tier keeps working on its own, bounded by size and TTL.
+
+Hot endpoints cache their final HTTP body (CachedBody): serialized once with
+orjson, optionally compressed, and stored as raw bytes, so a hit is returned
+as a Response with no JSON parsing or model validation.
 """
+import asyncio
+import gzip
+import inspect
 import json
 import hashlib
-from typing import Optional, Any, Callable
+import math
+import random
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional, Any, Awaitable, Callable
 from datetime import timedelta
 import logging
 from functools import wraps
 
+import orjson
 import redis.asyncio as redis
+from fastapi import Response
 from redis.exceptions import ConnectionError as RedisConnectionError
 
+try:
+    import zstandard
+except ImportError:  # Optional: zstd falls back to gzip when not installed
+    zstandard = None
+
 from app.config import get_settings
 
 logger = logging.getLogger(__name__)
@@ -33,42 +76,206 @@ TTL_STATS = timedelta(minutes=10)  # Stats can be slightly stale
 TTL_CATEGORIES = timedelta(hours=1)  # Categories rarely change
 TTL_PRODUCT = timedelta(hours=24)  # Individual products rarely change
 
+# Generation counters (see module docstring)
+GEN_GLOBAL = "gen:global"
+GEN_ALL_STORES = "gen:store:*"
+GEN_ALL_CATEGORIES = "gen:category:*"
+PREFIX_GEN_KEYS = "genkeys:"  # Set of keys written under one generation
+METRICS_KEY = "cache:metrics"
+
+# In-process L1 tier
+LOCAL_MAX_TTL = timedelta(minutes=5)  # Upper bound on how long L1 keeps an entry
+LOCAL_GEN_TTL = timedelta(seconds=10)  # Safety net if a pub/sub message is missed
+INVALIDATION_CHANNEL = "cache:invalidations"
+SYNC_INVALIDATE_TIMEOUT = 10.0  # Seconds a sync caller waits for the app loop to bump
+
+# Pre-serialized responses smaller than this are not worth compressing
+COMPRESS_MIN_BYTES = 1024
+
+# Stampede protection
+PREFIX_LOCK = "lock:"
+LOCK_TIMEOUT = timedelta(seconds=30)  # Longest a refresher may hold the lock
+LOCK_POLL_INTERVAL = 0.05  # Seconds between checks while another worker computes
+EARLY_EXPIRY_BETA = 1.0  # >1 refreshes earlier, 0 disables early expiration
+
+# Compare-and-delete so a worker only releases its own lock
+RELEASE_LOCK_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+
+@dataclass(frozen=True)
+class CachedBody:
+    """A final JSON response body, serialized once and optionally compressed."""
+    body: bytes
+    encoding: Optional[str] = None  # "gzip", "zstd" or None for identity
+
+    @classmethod
+    def from_value(cls, value: Any, compression: Optional[str] = None) -> "CachedBody":
+        """Serialize a JSON-compatible value (datetimes allowed) with orjson."""
+        body = orjson.dumps(value, default=str)
+        compression = compression or get_settings().cache_response_compression
+        if len(body) < COMPRESS_MIN_BYTES or compression == "none":
+            return cls(body)
+        if compression == "zstd" and zstandard is not None:
+            return cls(zstandard.ZstdCompressor(level=3).compress(body), "zstd")
+        return cls(gzip.compress(body, compresslevel=6), "gzip")
+
+    def decoded(self) -> bytes:
+        if self.encoding == "gzip":
+            return gzip.decompress(self.body)
+        if self.encoding == "zstd":
+            return zstandard.ZstdDecompressor().decompress(self.body)
+        return self.body
+
+    def to_response(self, accept_encoding: str = "") -> Response:
+        """Send the stored bytes as-is when the client accepts their encoding."""
+        accepted = {token.split(";")[0].strip().lower() for token in accept_encoding.split(",")}
+        headers = {"Vary": "Accept-Encoding"}
+        if self.encoding and self.encoding in accepted:
+            headers["Content-Encoding"] = self.encoding
+            return Response(self.body, media_type="application/json", headers=headers)
+        return Response(self.decoded(), media_type="application/json", headers=headers)
+
+
+class LocalCache:
+    """
+    Size-aware LRU with per-entry TTL, local to one worker process.
+
+    Values are stored as-is (deserialized objects or raw bytes) and shared
+    between callers, so treat them as read-only.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # key -> (expires_at monotonic, size, value)
+        self._entries: OrderedDict[str, tuple[float, int, Any]] = OrderedDict()
+
+    def get(self, key: str) -> Optional[Any]:
+        item = self._entries.get(key)
+        if item is None:
+            self.misses += 1
+            return None
+        expires_at, size, value = item
+        if expires_at <= time.monotonic():
+            self._remove(key)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: str, value: Any, ttl: float, size: int):
+        if size > self.max_bytes or ttl <= 0:
+            return
+        self._remove(key)
+        self._entries[key] = (time.monotonic() + ttl, size, value)
+        self.size += size
+        while self.size > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def _remove(self, key: str):
+        item = self._entries.pop(key, None)
+        if item is not None:
+            self.size -= item[1]
+
+    def clear(self):
+        self._entries.clear()
+        self.size = 0
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "l1_entries": len(self._entries),
+            "l1_bytes": self.size,
+            "l1_hits": self.hits,
+            "l1_misses": self.misses,
+            "l1_evictions": self.evictions,
+        }
+
 
 class CacheService:
-    """Redis-based caching service with fallback to no-cache."""
+    """Two-tier (in-process L1 + Redis) caching service."""
 
     def __init__(self):
         self._client: Optional[redis.Redis] = None
         self._connected = False
+        # Per-process single-flight: key -> future of the in-progress refresh
+        self._inflight: dict[str, asyncio.Future] = {}
+        self._local = LocalCache(get_settings().cache_local_max_mb * 1024 * 1024)
+        # Generation counters read from Redis: key -> (value, fresh until)
+        self._local_gens: dict[str, tuple[int, float]] = {}
+        self._listener: Optional[asyncio.Task] = None
+        # The app's event loop, for bumps requested from sync code (scrape threads)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
 
     async def connect(self):
         """Initialize Redis connection."""
+        self._loop = asyncio.get_running_loop()
         if self._connected:
             return
 
         try:
             settings = get_settings()
-            self._client = redis.from_url(
-                settings.redis_url,
-                encoding="utf-8",
-                decode_responses=True
-            )
+            # Raw bytes, so pre-serialized (compressed) bodies round-trip intact
+            self._client = redis.from_url(settings.redis_url)
             # Test connection
             await self._client.ping()
             self._connected = True
+            self._local_gens.clear()
             logger.info("Redis cache connected")
         except (RedisConnectionError, Exception) as e:
-            logger.warning(f"Redis not available, caching disabled: {e}")
+            logger.warning(f"Redis not available, using in-process cache only: {e}")
             self._client = None
             self._connected = False
 
     async def disconnect(self):
         """Close Redis connection."""
+        self._loop = None
+        await self.stop_invalidation_listener()
         if self._client:
             await self._client.close()
             self._client = None
             self._connected = False
 
+    async def start_invalidation_listener(self):
+        """Drop cached generations whenever any worker bumps one (long-lived apps only)."""
+        if not self._client or self._listener:
+            return
+        self._listener = asyncio.create_task(self._listen_for_invalidations())
+
+    async def stop_invalidation_listener(self):
+        if self._listener:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+
+    async def _listen_for_invalidations(self):
+        pubsub = self._client.pubsub()
+        try:
+            await pubsub.subscribe(INVALIDATION_CHANNEL)
+            async for message in pubsub.listen():
+                if message.get("type") == "message":
+                    self._local_gens.clear()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # Generations still expire after LOCAL_GEN_TTL without the listener
+            logger.error(f"Cache invalidation listener stopped: {e}")
+        finally:
+            await pubsub.close()
+
     def _make_key(self, prefix: str, params: dict) -> str:
         """Generate cache key from prefix and parameters."""
         # Sort params for consistent key generation
@@ -76,6 +283,134 @@ class CacheService:
         hash_val = hashlib.md5(param_str.encode()).hexdigest()[:12]
         return f"{prefix}{hash_val}"
 
+    # ============== Generation namespaces ==============
+
+    @staticmethod
+    def _store_gen(store_slug: str) -> str:
+        return f"gen:store:{store_slug}"
+
+    @staticmethod
+    def _category_gen(category: str) -> str:
+        return f"gen:category:{category}"
+
+    def _cached_generation(self, gen_key: str) -> Optional[int]:
+        item = self._local_gens.get(gen_key)
+        if item is None:
+            return None
+        value, fresh_until = item
+        # Without Redis the local counters are the only source of truth
+        if self._client and fresh_until <= time.monotonic():
+            return None
+        return value
+
+    async def _generations(self, gen_keys: list[str]) -> list[int]:
+        """Current value of each generation counter (0 if never bumped)."""
+        cached = [self._cached_generation(k) for k in gen_keys]
+        if None not in cached or not self._client:
+            return [g or 0 for g in cached]
+        try:
+            values = await self._client.mget(gen_keys)
+        except Exception as e:
+            logger.error(f"Cache generation read error: {e}")
+            return [g or 0 for g in cached]
+        gens = [int(v or 0) for v in values]
+        fresh_until = time.monotonic() + LOCAL_GEN_TTL.total_seconds()
+        for gen_key, gen in zip(gen_keys, gens):
+            self._local_gens[gen_key] = (gen, fresh_until)
+        return gens
+
+    async def _namespaced_key(
+        self,
+        prefix: str,
+        params: dict,
+        store: Optional[str] = None,
+        category: Optional[str] = None,
+    ) -> tuple[str, dict[str, int]]:
+        """
+        Build a key that embeds the generations it depends on.
+
+        Returns the key and its namespace ({generation key: value}), which is
+        recorded on write so invalidation can report how many keys it orphaned.
+        """
+        gen_keys = [
+            GEN_GLOBAL,
+            self._store_gen(store) if store else GEN_ALL_STORES,
+            self._category_gen(category) if category else GEN_ALL_CATEGORIES,
+        ]
+        gens = await self._generations(gen_keys)
+        version = ".".join(str(g) for g in gens)
+        base = self._make_key(prefix, params)
+        return f"{prefix}v{version}:{base[len(prefix):]}", dict(zip(gen_keys, gens))
+
+    async def _track_namespace(self, key: str, namespace: dict[str, int], ttl: timedelta):
+        """Remember which generations key was written under."""
+        if not self._client or not namespace:
+            return
+        try:
+            async with self._client.pipeline(transaction=False) as pipe:
+                for gen_key, gen in namespace.items():
+                    members = f"{PREFIX_GEN_KEYS}{gen_key}:{gen}"
+                    pipe.sadd(members, key)
+                    pipe.expire(members, int(ttl.total_seconds()))
+                await pipe.execute()
+        except Exception as e:
+            logger.error(f"Cache namespace tracking error: {e}")
+
+    async def _bump(self, scope: str, gen_keys: list[str]) -> int:
+        """
+        Advance generation counters and return how many keys that retires.
+
+        The count covers keys written under the old generations, so a key
+        already retired through another scope can be counted again.
+        """
+        if not self._client:
+            # L1-only mode: bump the local counters so new keys are used
+            for gen_key in gen_keys:
+                value = self._local_gens.get(gen_key, (0, 0.0))[0]
+                self._local_gens[gen_key] = (value + 1, 0.0)
+            return 0
+        try:
+            async with self._client.pipeline(transaction=True) as pipe:
+                for gen_key in gen_keys:
+                    pipe.incr(gen_key)
+                pipe.publish(INVALIDATION_CHANNEL, scope)
+                *new_gens, _ = await pipe.execute()
+            fresh_until = time.monotonic() + LOCAL_GEN_TTL.total_seconds()
+            for gen_key, gen in zip(gen_keys, new_gens):
+                self._local_gens[gen_key] = (gen, fresh_until)
+
+            retired = [f"{PREFIX_GEN_KEYS}{k}:{g - 1}" for k, g in zip(gen_keys, new_gens)]
+            async with self._client.pipeline(transaction=False) as pipe:
+                pipe.sunion(retired)
+                pipe.delete(*retired)
+                orphaned_keys, _ = await pipe.execute()
+            orphaned = len(orphaned_keys)
+
+            async with self._client.pipeline(transaction=False) as pipe:
+                pipe.hincrby(METRICS_KEY, f"bumps:{scope}", 1)
+                pipe.hincrby(METRICS_KEY, f"orphaned:{scope}", orphaned)
+                pipe.hset(METRICS_KEY, f"last_orphaned:{scope}", orphaned)
+                await pipe.execute()
+        except Exception as e:
+            logger.error(f"Cache invalidation error ({scope}): {e}")
+            return 0
+
+        logger.info(f"Invalidated {scope} cache generation, orphaned {orphaned} keys")
+        return orphaned
+
+    async def get_metrics(self) -> dict[str, int]:
+        """Invalidation counters (bumps, orphaned, last_orphaned per scope) and L1 stats."""
+        metrics = self._local.stats()
+        if not self._client:
+            return metrics
+        try:
+            counters = await self._client.hgetall(METRICS_KEY)
+        except Exception as e:
+            logger.error(f"Cache metrics error: {e}")
+            return metrics
+        metrics.update({field.decode(): int(value) for field, value in counters.items()})
+        return metrics
+
     async def get(self, key: str) -> Optional[Any]:
         """Get value from cache."""
         if not self._client:
@@ -136,45 +471,228 @@ class CacheService:
         except Exception as e:
             logger.error(f"Cache delete pattern error: {e}")
 
-    async def invalidate_specials(self):
+    async def invalidate_specials(self) -> int:
         """Invalidate all specials-related caches."""
-        await self.delete_pattern(f"{PREFIX_SPECIALS}*")
-        await self.delete_pattern(f"{PREFIX_STATS}*")
-        await self.delete_pattern(f"{PREFIX_CATEGORIES}*")
-        logger.info("Invalidated all specials caches")
+        return await self._bump("global", [GEN_GLOBAL])
 
-    async def invalidate_store(self, store_slug: str):
-        """Invalidate cache for a specific store."""
-        # Store-specific keys include store in params, so we clear all specials
-        await self.invalidate_specials()
+    async def invalidate_store(self, store_slug: str) -> int:
+        """Invalidate caches that include a store's specials."""
+        return await self._bump(f"store:{store_slug}", [self._store_gen(store_slug), GEN_ALL_STORES])
 
-    # Convenience methods for specific cache operations
+    async def invalidate_category(self, category: str) -> int:
+        """Invalidate caches that include a category's specials."""
+        return await self._bump(f"category:{category}", [self._category_gen(category), GEN_ALL_CATEGORIES])
 
-    async def get_specials(self, params: dict) -> Optional[dict]:
-        """Get cached specials list."""
-        key = self._make_key(PREFIX_SPECIALS, params)
-        return await self.get(key)
+    # ============== Stampede-protected reads ==============
 
-    async def set_specials(self, params: dict, data: dict):
-        """Cache specials list."""
-        key = self._make_key(PREFIX_SPECIALS, params)
-        await self.set(key, data, TTL_SPECIALS_LIST)
+    def _set_local(self, key: str, entry: dict, size: int, stale_ttl: float):
+        """Keep an envelope in L1 until its hard expiry (capped at LOCAL_MAX_TTL)."""
+        hard_ttl = entry["expires"] + stale_ttl - time.time()
+        self._local.set(key, entry, min(hard_ttl, LOCAL_MAX_TTL.total_seconds()), size)
 
-    async def get_stats(self) -> Optional[dict]:
-        """Get cached stats."""
-        return await self.get(f"{PREFIX_STATS}all")
+    async def _get_entry(self, key: str) -> Optional[dict]:
+        """
+        Read an entry written by _set_entry from Redis into L1.
 
-    async def set_stats(self, data: dict):
-        """Cache stats."""
-        await self.set(f"{PREFIX_STATS}all", data, TTL_STATS)
+        On the wire an entry is a JSON header line (expiry metadata) followed
+        by the body: orjson for plain values, raw bytes for a CachedBody.
+        """
+        if not self._client:
+            return None
+        try:
+            raw = await self._client.get(key)
+            if not raw:
+                return None
+            header, _, body = raw.partition(b"\n")
+            entry = orjson.loads(header)
+            if not isinstance(entry, dict) or "expires" not in entry or "value" in entry:
+                return None  # Not an entry (or one from an older format)
+            if entry.get("raw"):
+                entry["value"] = CachedBody(body, entry.get("encoding"))
+            else:
+                entry["value"] = orjson.loads(body)
+        except Exception as e:
+            logger.error(f"Cache get error: {e}")
+            return None
+        self._set_local(key, entry, len(raw), entry.get("stale", 0))
+        return entry
+
+    async def _set_entry(self, key: str, value: Any, ttl: timedelta, stale_ttl: timedelta, delta: float):
+        """Store value with a soft expiry in both tiers; kept for ttl + stale_ttl."""
+        header = {
+            "expires": time.time() + ttl.total_seconds(),
+            "stale": stale_ttl.total_seconds(),
+            "delta": delta,
+        }
+        if isinstance(value, CachedBody):
+            header.update(raw=True, encoding=value.encoding)
+            body = value.body
+        else:
+            body = orjson.dumps(value, default=str)
+            # L1 keeps the round-tripped form, so hits look the same from either tier
+            value = orjson.loads(body)
+        payload = orjson.dumps(header) + b"\n" + body
+        self._set_local(key, {**header, "value": value}, len(payload), stale_ttl.total_seconds())
+        if not self._client:
+            return
+        try:
+            await self._client.setex(key, int((ttl + stale_ttl).total_seconds()), payload)
+        except Exception as e:
+            logger.error(f"Cache set error: {e}")
+
+    @staticmethod
+    def _needs_refresh(entry: dict, beta: float) -> bool:
+        """Stale, or picked for probabilistic early expiration (XFetch)."""
+        early = entry.get("delta", 0) * beta * -math.log(1.0 - random.random())
+        return time.time() + early >= entry["expires"]
+
+    async def _compute_and_store(
+        self, key: str, compute: Callable, ttl: timedelta, stale_ttl: timedelta, namespace: Optional[dict]
+    ) -> Any:
+        started = time.monotonic()
+        value = compute()
+        if inspect.isawaitable(value):
+            value = await value
+        await self._set_entry(key, value, ttl, stale_ttl, time.monotonic() - started)
+        if namespace:
+            await self._track_namespace(key, namespace, ttl + stale_ttl)
+        return value
+
+    async def _acquire_lock(self, key: str) -> Optional[str]:
+        """Try to become the refresher for key. Returns a token, or None if taken."""
+        token = uuid.uuid4().hex
+        if not self._client:
+            return token
+        try:
+            acquired = await self._client.set(
+                f"{PREFIX_LOCK}{key}", token, nx=True, px=int(LOCK_TIMEOUT.total_seconds() * 1000)
+            )
+        except Exception as e:
+            logger.error(f"Cache lock error: {e}")
+            return token
+        return token if acquired else None
 
-    async def get_categories(self) -> Optional[list]:
-        """Get cached categories."""
-        return await self.get(f"{PREFIX_CATEGORIES}all")
+    async def _release_lock(self, key: str, token: str):
+        if not self._client:
+            return
+        try:
+            await self._client.eval(RELEASE_LOCK_SCRIPT, 1, f"{PREFIX_LOCK}{key}", token)
+        except Exception as e:
+            logger.error(f"Cache unlock error: {e}")
+
+    async def _wait_for_entry(self, key: str) -> Optional[dict]:
+        """Poll until another worker's refresh lands or the lock would expire."""
+        deadline = time.monotonic() + LOCK_TIMEOUT.total_seconds()
+        while time.monotonic() < deadline:
+            await asyncio.sleep(LOCK_POLL_INTERVAL)
+            entry = await self._get_entry(key)
+            if entry is not None:
+                return entry
+            try:
+                if not await self._client.exists(f"{PREFIX_LOCK}{key}"):
+                    return await self._get_entry(key)
+            except Exception:
+                return None
+        return None
+
+    async def _refresh(
+        self,
+        key: str,
+        compute: Callable,
+        ttl: timedelta,
+        stale_ttl: timedelta,
+        stale: Optional[dict],
+        namespace: Optional[dict],
+    ) -> Any:
+        """Recompute key across workers, serving `stale` to callers that lose the race."""
+        token = await self._acquire_lock(key)
+        if token is None:
+            if stale is not None:
+                return stale["value"]
+            entry = await self._wait_for_entry(key)
+            if entry is not None:
+                return entry["value"]
+            # Refresher died or timed out: compute without the lock
+            return await self._compute_and_store(key, compute, ttl, stale_ttl, namespace)
 
-    async def set_categories(self, data: list):
-        """Cache categories."""
-        await self.set(f"{PREFIX_CATEGORIES}all", data, TTL_CATEGORIES)
+        try:
+            return await self._compute_and_store(key, compute, ttl, stale_ttl, namespace)
+        finally:
+            await self._release_lock(key, token)
+
+    async def get_or_compute(
+        self,
+        key: str,
+        compute: Callable,
+        ttl: timedelta = TTL_SPECIALS_LIST,
+        stale_ttl: Optional[timedelta] = None,
+        beta: float = EARLY_EXPIRY_BETA,
+        namespace: Optional[dict[str, int]] = None,
+    ) -> Any:
+        """
+        Return the cached value for key, computing it at most once at a time.
+
+        Args:
+            key: Cache key
+            compute: Sync or async callable producing a JSON-serializable value
+                or a CachedBody (stored as raw bytes)
+            ttl: Soft TTL; after it the value is stale and gets refreshed
+            stale_ttl: How long a stale value may still be served (defaults to ttl)
+            beta: Early expiration aggressiveness (0 disables it)
+            namespace: Generations the key was built from (see _namespaced_key)
+        """
+        stale_ttl = ttl if stale_ttl is None else stale_ttl
+
+        local = self._local.get(key)
+        if local is not None and not self._needs_refresh(local, beta):
+            return local["value"]
+
+        # Another worker may already have refreshed it in Redis
+        entry = await self._get_entry(key) or local
+        if entry is not None and not self._needs_refresh(entry, beta):
+            return entry["value"]
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            if entry is not None:
+                return entry["value"]
+            return await asyncio.shield(inflight)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            value = await self._refresh(key, compute, ttl, stale_ttl, entry, namespace)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # Mark retrieved when nobody else was waiting
+            raise
+        else:
+            future.set_result(value)
+            return value
+        finally:
+            self._inflight.pop(key, None)
+
+    # Convenience methods for specific cache operations
+
+    async def get_or_compute_specials(self, params: dict, compute: Callable) -> Any:
+        """Cached specials list for a filter combination."""
+        key, namespace = await self._namespaced_key(
+            PREFIX_SPECIALS, params, store=params.get("store"), category=params.get("category")
+        )
+        return await self.get_or_compute(key, compute, TTL_SPECIALS_LIST, namespace=namespace)
+
+    async def get_or_compute_stats(self, compute: Callable) -> Any:
+        """Cached stats."""
+        key, namespace = await self._namespaced_key(PREFIX_STATS, {"scope": "all"})
+        return await self.get_or_compute(key, compute, TTL_STATS, namespace=namespace)
+
+    async def get_or_compute_categories(self, compute: Callable) -> Any:
+        """Cached categories."""
+        key, namespace = await self._namespaced_key(PREFIX_CATEGORIES, {"scope": "all"})
+        return await self.get_or_compute(key, compute, TTL_CATEGORIES, namespace=namespace)
 
     @property
     def is_connected(self) -> bool:
@@ -207,32 +725,70 @@ def cached(
     def decorator(func: Callable):
         @wraps(func)
         async def wrapper(*args, **kwargs):
-            # Skip caching if Redis not available
-            if not cache.is_connected:
-                return await func(*args, **kwargs)
-
             # Build cache key from specified params
             if key_params:
                 cache_params = {k: kwargs.get(k) for k in key_params if k in kwargs}
             else:
                 cache_params = {}
 
-            cache_key = cache._make_key(prefix, cache_params)
+            cache_key, namespace = await cache._namespaced_key(
+                prefix, cache_params, store=cache_params.get("store"), category=cache_params.get("category")
+            )
 
-            # Try cache first
-            cached_result = await cache.get(cache_key)
-            if cached_result is not None:
-                logger.debug(f"Cache hit: {cache_key}")
-                return cached_result
+            # Concurrent misses share one call of func
+            return await cache.get_or_compute(cache_key, lambda: func(*args, **kwargs), ttl, namespace=namespace)
 
-            # Execute function
-            result = await func(*args, **kwargs)
+        return wrapper
+    return decorator
 
-            # Cache the result
-            await cache.set(cache_key, result, ttl)
-            logger.debug(f"Cache miss, stored: {cache_key}")
 
-            return result
+def _invalidate_sync(invalidate: Callable[["CacheService"], Awaitable[int]], what: str) -> int:
+    """
+    Run a generation bump from synchronous code such as scheduled jobs.
 
-        return wrapper
-    return decorator
+    Inside the app the bump is scheduled onto the app's event loop through
+    the shared `cache`, so its L1 tier is invalidated even when Redis is
+    down (its local generations are then the only ones). Outside the app
+    (scripts, no connected cache) a short-lived connection bumps the Redis
+    generations instead.
+    """
+    loop = cache._loop
+    if loop is not None and loop.is_running():
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            # Called on the app loop itself: blocking here would deadlock
+            loop.create_task(invalidate(cache))
+            return 0
+        try:
+            future = asyncio.run_coroutine_threadsafe(invalidate(cache), loop)
+            return future.result(SYNC_INVALIDATE_TIMEOUT)
+        except Exception as e:
+            logger.warning(f"Could not invalidate cache for {what}: {e}")
+            return 0
+
+    async def bump():
+        service = CacheService()
+        await service.connect()
+        try:
+            return await invalidate(service)
+        finally:
+            await service.disconnect()
+
+    try:
+        return asyncio.run(bump())
+    except Exception as e:
+        logger.warning(f"Could not invalidate cache for {what}: {e}")
+        return 0
+
+
+def invalidate_store_sync(store_slug: str) -> int:
+    """Retire a store's cache entries from synchronous code such as scrape jobs."""
+    return _invalidate_sync(lambda service: service.invalidate_store(store_slug), store_slug)
+
+
+def invalidate_specials_sync() -> int:
+    """Retire every specials cache entry from synchronous code (all-store projection refreshes)."""
+    return _invalidate_sync(lambda service: service.invalidate_specials(), "all specials")
@@ -0,0 +1,168 @@
+"""
+Process-wide cache of the unified category tree.
+
+The categories table is small and only changes when it is seeded or
+edited by an admin, so endpoints resolve slugs, parents and subcategories
+from memory instead of issuing a Category query per lookup.
+
+Like the store registry, the tree is loaded in the app lifespan and reloaded
+lazily after any commit in this process that touched a Category. Other
+workers pick up changes on their next miss (at most once per
+MISS_RELOAD_INTERVAL) or on restart.
+"""
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from typing import Iterable, Optional
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.database import SessionLocal
+from app.models import Category
+
+logger = logging.getLogger(__name__)
+
+MISS_RELOAD_INTERVAL = 60.0  # Seconds between reloads triggered by unknown ids/slugs
+
+
+@dataclass(frozen=True)
+class CategoryInfo:
+    """Detached, read-only copy of a Category row."""
+    id: int
+    name: str
+    slug: str
+    parent_id: Optional[int] = None
+    display_order: int = 0
+    icon: Optional[str] = None
+
+    @classmethod
+    def from_model(cls, category: Category) -> "CategoryInfo":
+        return cls(
+            id=category.id,
+            name=category.name,
+            slug=category.slug,
+            parent_id=category.parent_id,
+            display_order=category.display_order or 0,
+            icon=category.icon,
+        )
+
+
+class CategoryTree:
+    """In-memory id/slug/children index over the categories table."""
+
+    def __init__(self):
+        self._by_id: dict[int, CategoryInfo] = {}
+        self._by_slug: dict[str, CategoryInfo] = {}
+        self._children: dict[int, tuple[int, ...]] = {}
+        self._loaded = False
+        self._last_miss_reload = 0.0
+        self._lock = threading.Lock()
+
+    def load(self, db: Optional[Session] = None):
+        """(Re)load all categories, using a short-lived session if none is given."""
+        own_session = db is None
+        db = db or SessionLocal()
+        try:
+            categories = [CategoryInfo.from_model(c) for c in db.query(Category).all()]
+        finally:
+            if own_session:
+                db.close()
+
+        children: dict[int, list[CategoryInfo]] = {}
+        for category in categories:
+            if category.parent_id is not None:
+                children.setdefault(category.parent_id, []).append(category)
+
+        # Swap all indexes at once so readers never see a half-built tree
+        with self._lock:
+            self._by_id = {c.id: c for c in categories}
+            self._by_slug = {c.slug: c for c in categories}
+            self._children = {
+                parent_id: tuple(c.id for c in sorted(subs, key=lambda c: (c.display_order, c.id)))
+                for parent_id, subs in children.items()
+            }
+            self._loaded = True
+        logger.info(f"Category tree loaded {len(categories)} categories")
+
+    def invalidate(self):
+        """Drop the loaded tree; the next lookup reloads it."""
+        with self._lock:
+            self._loaded = False
+
+    def _ensure_loaded(self):
+        if not self._loaded:
+            self.load()
+
+    def _reload_on_miss(self) -> bool:
+        now = time.monotonic()
+        if now - self._last_miss_reload < MISS_RELOAD_INTERVAL:
+            return False
+        self._last_miss_reload = now
+        self.load()
+        return True
+
+    def get(self, category_id: Optional[int]) -> Optional[CategoryInfo]:
+        """Look up a category by id."""
+        if category_id is None:
+            return None
+        self._ensure_loaded()
+        category = self._by_id.get(category_id)
+        if category is None and self._reload_on_miss():
+            category = self._by_id.get(category_id)
+        return category
+
+    def by_slug(self, slug: Optional[str]) -> Optional[CategoryInfo]:
+        """Look up a category by slug."""
+        if not slug:
+            return None
+        self._ensure_loaded()
+        category = self._by_slug.get(slug)
+        if category is None and self._reload_on_miss():
+            category = self._by_slug.get(slug)
+        return category
+
+    def subcategory_ids(self, category_id: int) -> tuple[int, ...]:
+        """Direct subcategories of a category, in display order."""
+        self._ensure_loaded()
+        return self._children.get(category_id, ())
+
+    def ids_for_slugs(self, slugs: Iterable[str]) -> set[int]:
+        """Ids of the categories with these slugs plus their subcategories (unknown slugs are skipped)."""
+        self._ensure_loaded()
+        ids = set()
+        for slug in slugs:
+            category = self._by_slug.get(slug)
+            if category is not None:
+                ids.add(category.id)
+                ids.update(self._children.get(category.id, ()))
+        return ids
+
+    def parents_by_id(self) -> dict[int, Optional[int]]:
+        """Snapshot of category_id -> parent_id."""
+        self._ensure_loaded()
+        return {category_id: c.parent_id for category_id, c in self._by_id.items()}
+
+
+category_tree = CategoryTree()
+
+
+# ============== Change events ==============
+
+@event.listens_for(Session, "before_flush")
+def _track_category_changes(session, flush_context, instances):
+    if any(isinstance(obj, Category) for obj in (*session.new, *session.dirty, *session.deleted)):
+        session.info["categories_changed"] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _reload_after_category_commit(session):
+    if session.info.pop("categories_changed", False):
+        # Can't query through the committing session here; reload lazily
+        category_tree.invalidate()
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_category_changes(session):
+    session.info.pop("categories_changed", None)
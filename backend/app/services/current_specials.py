@@ -0,0 +1,230 @@
+"""
+Current Specials Projection
+
+Maintains current_specials (CurrentSpecial), a denormalized copy of the
+active specials that the listing, stats, categories and staples endpoints
+read instead of specials + stores + categories.
+
+Each row carries what those endpoints used to compute per request:
+- store slug and name (from the store registry)
+- the special's category id and its top-level parent id, so a category
+  filter is one equality on an indexed column
+- price and was-price in cents and as display strings
+- valid_until (valid_to at midnight) and a normalized product key
+- the fresh produce / fresh meat keyword classification
+- the product type's word postings (services/product_equivalence)
+- the cached image's content hash, for responsive variant URLs
+
+A store's rows are replaced (DELETE + INSERT) in the same transaction as the
+scrape that changed them, so readers see either the old week or the new one,
+never a half-built table. The special_counts summary is refreshed alongside,
+and the projection generation (embedded in listing cursors) incremented.
+"""
+import logging
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Optional
+
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import Select
+from sqlalchemy.sql.elements import ColumnElement
+
+from app.database import SessionLocal
+from app.models import Category, CurrentSpecial, CurrentSpecialTypeWord, ImageMetadata, ProjectionGeneration, Special
+from app.services.fresh_foods import is_fresh_meat, is_fresh_produce
+from app.services.product_equivalence import extract_special_type, type_word_rows
+from app.services.search_index import search_condition
+from app.services.special_counts import refresh_special_counts
+from app.services.store_registry import store_registry
+
+logger = logging.getLogger(__name__)
+
+INSERT_CHUNK_SIZE = 1000
+
+
+def normalize_product_key(name: str, brand: Optional[str], size: Optional[str]) -> str:
+    """Create a normalized key for grouping identical products."""
+    parts = []
+    if brand:
+        parts.append(brand.lower().strip())
+    parts.append(name.lower().strip())
+    if size:
+        parts.append(size.lower().strip())
+    return "|".join(parts)
+
+
+def _cents(price: Optional[Decimal]) -> Optional[int]:
+    if price is None:
+        return None
+    return int(price * 100)
+
+
+def _display(price: Optional[Decimal]) -> Optional[str]:
+    if price is None:
+        return None
+    return f"${float(price):.2f}"
+
+
+def _projection_row(
+    special,
+    parents: dict[int, Optional[int]],
+    product_type: str,
+    image_hashes: dict[str, str],
+) -> Optional[dict]:
+    store = store_registry.get(special.store_id)
+    if store is None:
+        return None
+    category_id = special.category_id
+    parent_id = parents.get(category_id) if category_id is not None else None
+    return {
+        "id": special.id,
+        "store_id": special.store_id,
+        "store_slug": store.slug,
+        "store_name": store.name,
+        "name": special.name,
+        "brand": special.brand,
+        "size": special.size,
+        "category": special.category,
+        "category_id": category_id,
+        "parent_category_id": parent_id or category_id,
+        "product_key": normalize_product_key(special.name, special.brand, special.size),
+        "fresh_produce": is_fresh_produce(special.name),
+        "fresh_meat": is_fresh_meat(special.name),
+        "price": special.price,
+        "was_price": special.was_price,
+        "price_cents": _cents(special.price) or 0,
+        "was_price_cents": _cents(special.was_price),
+        "price_display": _display(special.price) or "$0.00",
+        "was_price_display": _display(special.was_price),
+        "discount_percent": special.discount_percent or 0,
+        "discount_missing": special.discount_percent is None,
+        "unit_price": special.unit_price,
+        "store_product_id": special.store_product_id,
+        "product_url": special.product_url,
+        "image_url": special.image_url,
+        "image_hash": image_hashes.get(special.image_url),
+        "valid_from": special.valid_from,
+        "valid_to": special.valid_to,
+        "valid_until": datetime.combine(special.valid_to, datetime.min.time()),
+        "scraped_at": special.scraped_at,
+        "created_at": special.created_at,
+    }
+
+
+# ============== Projection maintenance ==============
+
+def refresh_current_specials(db: Session, store_id: Optional[int] = None) -> int:
+    """
+    Rebuild the projection (and the counts summary) for one store or all stores.
+
+    Runs inside the caller's transaction; the caller's commit publishes the
+    new rows and removes the old ones together.
+
+    Returns:
+        Number of projection rows written
+    """
+    parents = dict(db.execute(select(Category.id, Category.parent_id)).all())
+
+    specials = select(Special.__table__).where(Special.valid_to >= date.today())
+    clear = delete(CurrentSpecial)
+    clear_type_words = delete(CurrentSpecialTypeWord)
+    if store_id is not None:
+        specials = specials.where(Special.store_id == store_id)
+        clear = clear.where(CurrentSpecial.store_id == store_id)
+        clear_type_words = clear_type_words.where(CurrentSpecialTypeWord.store_id == store_id)
+
+    db.execute(clear_type_words)
+    db.execute(clear)
+
+    image_urls = specials.with_only_columns(Special.image_url).where(Special.image_url.isnot(None))
+    image_hashes = dict(db.execute(
+        select(ImageMetadata.url, ImageMetadata.content_hash).where(
+            ImageMetadata.url.in_(image_urls),
+            ImageMetadata.variants_ready.is_(True),
+        )
+    ).all())
+
+    written = 0
+    chunk = []
+    type_words = []
+    for special in db.execute(specials).all():
+        product_type = extract_special_type(special.name, special.brand)
+        row = _projection_row(special, parents, product_type, image_hashes)
+        if row is None:
+            continue
+        chunk.append(row)
+        type_words.extend(type_word_rows(special.id, special.store_id, special.category_id, special.size, product_type))
+        if len(chunk) >= INSERT_CHUNK_SIZE:
+            _insert_rows(db, chunk, type_words)
+            written += len(chunk)
+            chunk, type_words = [], []
+    if chunk:
+        _insert_rows(db, chunk, type_words)
+        written += len(chunk)
+
+    refresh_special_counts(db, store_id)
+    _bump_generation(db)
+    return written
+
+
+def _insert_rows(db: Session, rows: list[dict], type_words: list[dict]):
+    db.execute(insert(CurrentSpecial), rows)
+    if type_words:
+        db.execute(insert(CurrentSpecialTypeWord), type_words)
+
+
+def _dialect_insert(db: Session):
+    """The dialect's insert(), which supports ON CONFLICT."""
+    if db.get_bind().dialect.name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    else:
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    return dialect_insert
+
+
+def _bump_generation(db: Session):
+    """Increment the projection generation (creating its row on first use)."""
+    table = ProjectionGeneration.__table__
+    stmt = _dialect_insert(db)(table).values(id=1, generation=1)
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=["id"], set_={"generation": table.c.generation + 1}
+    ))
+
+
+def rebuild_current_specials():
+    """Rebuild the whole projection in its own session (startup, admin clears)."""
+    db = SessionLocal()
+    try:
+        written = refresh_current_specials(db)
+        db.commit()
+        logger.info(f"Rebuilt current specials projection ({written} rows)")
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Failed to rebuild current specials: {e}")
+    finally:
+        db.close()
+
+
+# ============== Querying ==============
+
+def projection_search_condition(search: str) -> ColumnElement:
+    """
+    Text search over the projection.
+
+    Projection rows share ids with specials, so the match runs on the
+    specials search index and the projection is filtered by id.
+    """
+    return CurrentSpecial.id.in_(select(Special.id).where(search_condition(Special, search)))
+
+
+def dataset_generation() -> Select:
+    """
+    Statement for the projection's generation, embedded in listing cursors.
+
+    A counter incremented by every refresh_current_specials(), so it
+    changes whenever listed rows may have (new, updated or expired
+    specials, new image URLs). 0 before the first refresh.
+    """
+    generation = select(ProjectionGeneration.generation).where(ProjectionGeneration.id == 1)
+    return select(func.coalesce(generation.scalar_subquery(), 0))
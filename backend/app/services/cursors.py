@@ -0,0 +1,178 @@
+"""
+Pagination Cursors
+
+Opaque, signed keyset-pagination cursors shared by the listing endpoints.
+
+A cursor is `base64url(json payload).base64url(hmac)` where the payload holds:
+- s: the sort it was issued for ("discount", "price", ...)
+- d: the primary sort direction ("asc" / "desc")
+- k: the sort-key values of the last row served (id last, as tiebreaker)
+- f: a fingerprint of the request's filters
+- g: the dataset generation when it was issued
+
+Cursors are signed with the app secret, so clients can't forge key values,
+and a cursor replayed against a different sort or filter set is rejected
+instead of silently paging through the wrong listing. A generation change
+is reported (Cursor.generation) rather than rejected: keyset paging stays
+consistent across a scrape, it just may include the new rows.
+
+keyset_condition() turns the decoded key values into the WHERE clause that
+continues after the last row, so page N costs the same as page one.
+"""
+import base64
+import hashlib
+import hmac
+import json
+from dataclasses import dataclass
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Optional
+
+from sqlalchemy import and_, or_
+from sqlalchemy.sql.elements import ColumnElement
+
+from app.config import get_settings
+
+SIGNATURE_BYTES = 16
+
+
+class InvalidCursor(ValueError):
+    """Cursor is malformed, tampered with, or was issued for another listing."""
+
+
+@dataclass(frozen=True)
+class Cursor:
+    """A decoded cursor."""
+    sort: str
+    direction: str
+    keys: tuple
+    fingerprint: str
+    generation: int = 0
+
+
+# ============== Encoding ==============
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def _b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+
+def _sign(payload: bytes) -> bytes:
+    secret = get_settings().secret_key.encode()
+    return hmac.new(secret, payload, hashlib.sha256).digest()[:SIGNATURE_BYTES]
+
+
+def _encode_value(value: Any) -> Any:
+    """JSON-safe form of a sort-key value (datetimes and decimals are tagged)."""
+    if isinstance(value, datetime):
+        return {"dt": value.isoformat()}
+    if isinstance(value, date):
+        return {"d": value.isoformat()}
+    if isinstance(value, Decimal):
+        return {"n": str(value)}
+    return value
+
+
+def _decode_value(value: Any) -> Any:
+    if isinstance(value, dict):
+        if "dt" in value:
+            return datetime.fromisoformat(value["dt"])
+        if "d" in value:
+            return date.fromisoformat(value["d"])
+        if "n" in value:
+            return Decimal(value["n"])
+        raise InvalidCursor("Unknown cursor value")
+    return value
+
+
+def filter_fingerprint(**filters: Any) -> str:
+    """Short stable hash of a request's filters."""
+    canonical = json.dumps(
+        {name: _encode_value(value) for name, value in filters.items()},
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(canonical.encode()).hexdigest()[:12]
+
+
+def encode_cursor(
+    sort: str,
+    direction: str,
+    keys: list,
+    fingerprint: str,
+    generation: Optional[int] = 0,
+) -> str:
+    """Build a signed cursor pointing after the row with these sort-key values."""
+    payload = json.dumps(
+        {
+            "s": sort,
+            "d": direction,
+            "k": [_encode_value(key) for key in keys],
+            "f": fingerprint,
+            "g": generation or 0,
+        },
+        separators=(",", ":"),
+    ).encode()
+    return f"{_b64encode(payload)}.{_b64encode(_sign(payload))}"
+
+
+def decode_cursor(token: str, sort: str, direction: str, fingerprint: str, key_count: int) -> Cursor:
+    """
+    Verify and decode a cursor issued for this sort and filter set.
+
+    Raises:
+        InvalidCursor: bad encoding or signature, or a cursor from another listing
+    """
+    try:
+        encoded_payload, encoded_signature = token.split(".")
+        payload = _b64decode(encoded_payload)
+        signature = _b64decode(encoded_signature)
+    except ValueError:
+        raise InvalidCursor("Malformed cursor")
+
+    if not hmac.compare_digest(signature, _sign(payload)):
+        raise InvalidCursor("Cursor signature mismatch")
+
+    try:
+        data = json.loads(payload)
+        cursor = Cursor(
+            sort=data["s"],
+            direction=data["d"],
+            keys=tuple(_decode_value(key) for key in data["k"]),
+            fingerprint=data["f"],
+            generation=int(data.get("g", 0)),
+        )
+    except (ValueError, KeyError, TypeError):
+        raise InvalidCursor("Malformed cursor")
+
+    if cursor.sort != sort or cursor.direction != direction:
+        raise InvalidCursor("Cursor was issued for a different sort order")
+    if cursor.fingerprint != fingerprint:
+        raise InvalidCursor("Cursor was issued for different filters")
+    if len(cursor.keys) != key_count:
+        raise InvalidCursor("Malformed cursor")
+    return cursor
+
+
+# ============== Query building ==============
+
+def keyset_condition(order: list[tuple[ColumnElement, bool]], keys: tuple) -> ColumnElement:
+    """
+    WHERE clause for the rows strictly after `keys` in ORDER BY `order`.
+
+    Columns must never be NULL (comparisons with NULL match no rows); wrap
+    nullable sort expressions in coalesce().
+
+    Args:
+        order: (column, descending) pairs, in ORDER BY order, ending with a unique column
+        keys: The last served row's values for those columns
+    """
+    column, descending = order[0]
+    key = keys[0]
+    after = column < key if descending else column > key
+    if len(order) == 1:
+        return after
+    return or_(after, and_(column == key, keyset_condition(order[1:], keys[1:])))
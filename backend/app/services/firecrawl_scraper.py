@@ -5,20 +5,20 @@ Uses Firecrawl to scrape and extract product data from store websites.
 import os
 import re
 import logging
-from datetime import date, datetime, timedelta
-from decimal import Decimal
+from datetime import date, datetime
 from typing import Optional
-import time
 
 from firecrawl import Firecrawl
 from sqlalchemy.orm import Session
 
 from app.database import SessionLocal
-from app.models import Store, Special, ScrapeLog, MasterProduct, ProductPrice, Category
+from app.models import Store, Special, ScrapeLog
 from app.config import get_settings
 from app.services.image_cache import image_cache
-from app.services.auto_categorizer import categorize_product
-from app.services.brand_extractor import extract_brand_from_name, extract_size_from_name
+from app.services.cache import invalidate_store_sync
+from app.services.current_specials import refresh_current_specials
+from app.services.special_ingest import ingest_specials
+from app.services.scrape_orchestrator import TokenBucket, run_concurrent_firecrawl_scrape
 
 logger = logging.getLogger(__name__)
 
@@ -48,6 +48,10 @@ class FirecrawlScraper:
         },
     }
 
+    # Shared across instances (and threads) so parallel store scrapes
+    # together stay within ~1 Firecrawl request per second
+    rate_limiter = TokenBucket(rate=1.0)
+
     def __init__(self):
         api_key = get_settings().firecrawl_api_key
         if not api_key:
@@ -55,24 +59,25 @@ class FirecrawlScraper:
         self.app = Firecrawl(api_key=api_key)
 
     def scrape_all_stores(self, db: Optional[Session] = None) -> dict:
-        """Scrape specials from all stores."""
-        close_db = False
+        """
+        Scrape specials from all stores.
+
+        Without a session the stores are scraped in parallel worker threads
+        by the ScrapeOrchestrator (one session per store). A caller-supplied
+        session can't be shared across threads, so in that case stores are
+        processed one after another.
+        """
         if db is None:
-            db = SessionLocal()
-            close_db = True
+            return run_concurrent_firecrawl_scrape(["woolworths", "coles", "aldi"])
 
         results = {}
-        try:
-            for store_slug in ["woolworths", "coles", "aldi"]:
-                try:
-                    count = self.scrape_store(store_slug, db)
-                    results[store_slug] = {"status": "success", "items": count}
-                except Exception as e:
-                    logger.error(f"Failed to scrape {store_slug}: {e}")
-                    results[store_slug] = {"status": "failed", "error": str(e)}
-        finally:
-            if close_db:
-                db.close()
+        for store_slug in ["woolworths", "coles", "aldi"]:
+            try:
+                count = self.scrape_store(store_slug, db)
+                results[store_slug] = {"status": "success", "items": count}
+            except Exception as e:
+                logger.error(f"Failed to scrape {store_slug}: {e}")
+                results[store_slug] = {"status": "failed", "error": str(e)}
 
         return results
 
@@ -112,6 +117,9 @@ class FirecrawlScraper:
                         url = self._get_paginated_url(base_url, page, store_slug)
                         logger.info(f"Scraping {store_slug} page {page}: {url}")
 
+                        # Rate limiting - be nice to the API
+                        self.rate_limiter.acquire()
+
                         specials = self._scrape_url(url, store_slug)
 
                         # Deduplicate
@@ -130,9 +138,6 @@ class FirecrawlScraper:
                             logger.info(f"Few results on page {page}, stopping pagination")
                             break
 
-                        # Rate limiting - be nice to the API
-                        time.sleep(1)
-
                     except Exception as e:
                         logger.error(f"Error scraping {url}: {e}")
                         break
@@ -145,6 +150,7 @@ class FirecrawlScraper:
             scrape_log.items_found = saved_count
             scrape_log.status = "success"
             db.commit()
+            invalidate_store_sync(store_slug)
 
             logger.info(f"Saved {saved_count} specials for {store_slug}")
             return saved_count
@@ -512,113 +518,8 @@ Include ALL products. Return in the products array."""
 
     def _save_specials(self, db: Session, store: Store, specials: list[dict]) -> int:
         """Save scraped specials to database (both old and new schema)."""
-        today = date.today()
-        # Specials typically valid for 7 days
-        valid_to = today + timedelta(days=7)
-
-        saved_count = 0
-        seen_product_ids = set()  # Track to avoid duplicate store_product_id in same batch
-        images_to_cache = []  # Queue images for background caching
-
-        # Build category slug -> id mapping for auto-categorization
-        # Include ALL categories (both parents and subcategories) for granular matching
-        category_map = {}
-        all_categories = db.query(Category).all()
-        for cat in all_categories:
-            category_map[cat.slug] = cat.id
-
-        for item in specials:
-            try:
-                # Calculate discount percentage
-                discount_percent = None
-                if item.get("was_price") and item.get("price"):
-                    was_price = float(item["was_price"])
-                    price = float(item["price"])
-                    if was_price > price and was_price > 0:
-                        discount_percent = int(((was_price - price) / was_price) * 100)
-
-                # Skip if we already processed this store_product_id in this batch
-                store_product_id = item.get("store_product_id")
-                if store_product_id and store_product_id in seen_product_ids:
-                    logger.debug(f"Skipping duplicate store_product_id: {store_product_id}")
-                    continue
-                if store_product_id:
-                    seen_product_ids.add(store_product_id)
-
-                # === SAVE TO NEW NORMALIZED SCHEMA ===
-                self._save_to_normalized_schema(
-                    db, store, item, today, valid_to, discount_percent, images_to_cache
-                )
-
-                # === SAVE TO OLD SCHEMA (for backwards compatibility) ===
-                # Check for existing special by store_product_id (matches unique constraint)
-                existing = None
-                if store_product_id:
-                    existing = db.query(Special).filter(
-                        Special.store_id == store.id,
-                        Special.store_product_id == store_product_id,
-                        Special.valid_from == today
-                    ).first()
-                # If no store_product_id, check by name
-                if not existing:
-                    existing = db.query(Special).filter(
-                        Special.store_id == store.id,
-                        Special.name == item["name"],
-                        Special.valid_from == today
-                    ).first()
-
-                # Extract brand and size from name if not provided
-                brand = item.get("brand") or extract_brand_from_name(item["name"])
-                size = item.get("size") or extract_size_from_name(item["name"])
-
-                # Auto-categorize product
-                category_slug = categorize_product(item["name"], brand)
-                category_id = category_map.get(category_slug) if category_slug else None
-
-                if existing:
-                    # Update existing
-                    existing.price = Decimal(str(item["price"]))
-                    existing.was_price = Decimal(str(item["was_price"])) if item.get("was_price") else None
-                    existing.discount_percent = discount_percent
-                    existing.image_url = item.get("image_url") or existing.image_url
-                    existing.scraped_at = datetime.utcnow()
-                    # Update category_id if not set
-                    if not existing.category_id and category_id:
-                        existing.category_id = category_id
-                    # Update brand if not set
-                    if not existing.brand and brand:
-                        existing.brand = brand
-                    # Update size if not set
-                    if not existing.size and size:
-                        existing.size = size
-                else:
-                    # Create new
-                    special = Special(
-                        store_id=store.id,
-                        name=item["name"],
-                        brand=brand,
-                        size=size,
-                        category=item.get("category"),
-                        category_id=category_id,  # Auto-categorized
-                        price=Decimal(str(item["price"])),
-                        was_price=Decimal(str(item["was_price"])) if item.get("was_price") else None,
-                        discount_percent=discount_percent,
-                        unit_price=item.get("unit_price"),
-                        store_product_id=store_product_id,
-                        product_url=item.get("product_url"),
-                        image_url=item.get("image_url"),
-                        valid_from=today,
-                        valid_to=valid_to,
-                    )
-                    db.add(special)
-
-                saved_count += 1
-            except Exception as e:
-                logger.warning(f"Failed to save special {item.get('name')}: {e}")
-                db.rollback()
-                continue
-
         try:
+            result = ingest_specials(db, store, specials, master_products=True)
             db.commit()
         except Exception as e:
             logger.error(f"Failed to commit specials: {e}")
@@ -626,110 +527,11 @@ Include ALL products. Return in the products array."""
             raise
 
         # Queue images for background caching
-        if images_to_cache:
-            logger.info(f"Queuing {len(images_to_cache)} images for caching")
-            self._cache_images_background(images_to_cache)
-
-        return saved_count
-
-    def _save_to_normalized_schema(
-        self, db: Session, store: Store, item: dict,
-        today: date, valid_to: date, discount_percent: int,
-        images_to_cache: list
-    ):
-        """Save product to normalized MasterProduct + ProductPrice schema."""
-        store_product_id = item.get("store_product_id")
-        if not store_product_id:
-            store_product_id = f"unknown_{hash(item['name'])}"
-
-        # Check if product already exists
-        product = db.query(MasterProduct).filter(
-            MasterProduct.store_id == store.id,
-            MasterProduct.stockcode == store_product_id
-        ).first()
-
-        if product:
-            # Update existing product
-            product.last_seen_at = datetime.utcnow()
-            # Update product details if changed
-            if item.get("name"):
-                product.name = item["name"]
-            if item.get("brand"):
-                product.brand = item["brand"]
-            if item.get("size"):
-                product.size = item["size"]
-            if item.get("product_url"):
-                product.product_url = item["product_url"]
-            if item.get("image_url") and not product.image_cached:
-                product.original_image_url = item["image_url"]
-        else:
-            # Create new product
-            product = MasterProduct(
-                store_id=store.id,
-                stockcode=store_product_id,
-                name=item["name"],
-                brand=item.get("brand"),
-                size=item.get("size"),
-                category=item.get("category"),
-                product_url=item.get("product_url"),
-                original_image_url=item.get("image_url"),
-                image_cached=False,
-                created_at=datetime.utcnow(),
-                last_seen_at=datetime.utcnow()
-            )
-            db.add(product)
-            db.flush()  # Get product ID
-
-            # Queue image for caching if URL exists
-            if item.get("image_url"):
-                images_to_cache.append({
-                    "url": item["image_url"],
-                    "store_slug": store.slug,
-                    "stockcode": store_product_id,
-                    "product_id": product.id
-                })
+        if result.images_to_cache:
+            logger.info(f"Queuing {len(result.images_to_cache)} images for caching")
+            self._cache_images_background(result.images_to_cache)
 
-        # Convert price to cents
-        price_cents = int(float(item["price"]) * 100)
-        was_price_cents = int(float(item["was_price"]) * 100) if item.get("was_price") else None
-
-        # Check if price record already exists for this period
-        existing_price = db.query(ProductPrice).filter(
-            ProductPrice.product_id == product.id,
-            ProductPrice.valid_from == today
-        ).first()
-
-        if existing_price:
-            # Update existing price
-            existing_price.price = f"${item['price']:.2f}"
-            existing_price.price_numeric = price_cents
-            existing_price.was_price = f"${item['was_price']:.2f}" if item.get("was_price") else None
-            existing_price.was_price_numeric = was_price_cents
-            existing_price.discount_percent = discount_percent or 0
-            existing_price.unit_price = item.get("unit_price")
-            existing_price.scraped_at = datetime.utcnow()
-        else:
-            # Mark all previous prices as not current
-            db.query(ProductPrice).filter(
-                ProductPrice.product_id == product.id,
-                ProductPrice.is_current == True
-            ).update({"is_current": False})
-
-            # Create new price record
-            price_record = ProductPrice(
-                product_id=product.id,
-                price=f"${item['price']:.2f}",
-                price_numeric=price_cents,
-                was_price=f"${item['was_price']:.2f}" if item.get("was_price") else None,
-                was_price_numeric=was_price_cents,
-                discount_percent=discount_percent or 0,
-                unit_price=item.get("unit_price"),
-                valid_from=today,
-                valid_to=valid_to,
-                is_current=True,
-                scraped_at=datetime.utcnow()
-            )
-            db.add(price_record)
+        return result.saved
 
     def _cache_images_background(self, images: list):
         """Cache images in background (non-blocking)."""
@@ -763,6 +565,7 @@ Include ALL products. Return in the products array."""
         try:
             today = date.today()
             deleted = db.query(Special).filter(Special.valid_to < today).delete()
+            refresh_current_specials(db)
             db.commit()
             return deleted
         finally:
@@ -778,6 +581,7 @@ Include ALL products. Return in the products array."""
 
         try:
             deleted = db.query(Special).delete()
+            refresh_current_specials(db)
             db.commit()
             return deleted
         except Exception as e:
@@ -0,0 +1,61 @@
+"""
+Fresh Food Classification
+
+Keyword rules that decide whether a product name is fresh produce or fresh
+meat/seafood. They run once per special when the current_specials projection
+is rebuilt at ingestion (CurrentSpecial.fresh_produce / fresh_meat), so the
+fresh-foods comparison filters on stored flags instead of scanning names per
+request.
+"""
+
+# Unified category slugs for each fresh section; subcategories are included
+# through the category tree
+PRODUCE_CATEGORY_SLUGS = ["fruit-veg", "fruit-vegetables", "fresh-fruit", "fresh-vegetables"]
+MEAT_CATEGORY_SLUGS = ["meat-seafood", "poultry-meat-seafood", "beef-veal", "chicken", "pork", "lamb", "seafood"]
+
+# Keywords for fresh food filtering (used when category_id not set)
+PRODUCE_KEYWORDS = [
+    "apple", "banana", "orange", "mango", "grape", "strawberry", "blueberry",
+    "raspberry", "watermelon", "melon", "pear", "peach", "plum", "kiwi",
+    "avocado", "lemon", "lime", "mandarin", "pineapple", "cherry", "nectarine",
+    "potato", "onion", "carrot", "tomato", "lettuce", "broccoli", "capsicum",
+    "cucumber", "spinach", "mushroom", "zucchini", "corn", "bean", "pea",
+    "cauliflower", "celery", "garlic", "ginger", "chilli", "cabbage", "pumpkin",
+    "sweet potato", "salad", "herb", "vegetable", "fruit"
+]
+
+MEAT_KEYWORDS = [
+    "chicken", "beef", "lamb", "pork", "mince", "steak", "roast", "chop",
+    "sausage", "bacon", "thigh", "breast", "wing", "drumstick", "fillet",
+    "cutlet", "rump", "scotch", "salmon", "prawn", "fish", "barramundi",
+    "tuna", "snapper", "calamari", "seafood", "meat"
+]
+
+# Exclusion keywords for processed foods
+FRESH_EXCLUSIONS = [
+    "frozen", "oven bake", "microwave", "heat & eat", "ready to cook",
+    "schnitzel", "nugget", "crumbed", "battered", "coated", "breaded",
+    "sauce", "paste", "powder", "seasoning", "stock", "marinade",
+    "canned", "tinned", "preserved", "pickled", "jarred",
+    "juice", "cordial", "soft drink", "wine", "beer", "cider",
+    "yoghurt", "yogurt", "cheese", "milk", "cream", "butter", "ice cream",
+    "chip", "crisp", "biscuit", "chocolate", "candy", "confectionery"
+]
+
+
+def is_fresh_produce(name: str) -> bool:
+    """Check if a product name matches fresh produce keywords."""
+    name_lower = name.lower()
+    # Check exclusions first
+    if any(excl in name_lower for excl in FRESH_EXCLUSIONS):
+        return False
+    return any(kw in name_lower for kw in PRODUCE_KEYWORDS)
+
+
+def is_fresh_meat(name: str) -> bool:
+    """Check if a product name matches fresh meat/seafood keywords."""
+    name_lower = name.lower()
+    # Check exclusions first
+    if any(excl in name_lower for excl in FRESH_EXCLUSIONS):
+        return False
+    return any(kw in name_lower for kw in MEAT_KEYWORDS)
@@ -7,24 +7,61 @@ Benefits:
 - Reduced external dependencies
 - Images persist even if CDN URLs change
 - Ability to resize/optimize images
+
+Pipeline (cache_batch):
+1. Already-cached stockcodes come from one index query, in a worker
+   thread, instead of a stat per image on the event loop.
+2. Downloads share one keep-alive client per CDN host (HTTP/2 when the h2
+   package is installed), so a batch pays one TLS handshake per host.
+   Stockcodes with the same URL are downloaded once.
+3. Decode/resize/encode runs in a process pool, off the event loop and
+   outside the GIL, along with the responsive variants (services/
+   image_variants).
+4. Files are content-addressed: the optimized image is written once to
+   blobs/<sha256 of the download>.jpg (temp file + atomic rename) and each
+   store/<stockcode>.jpg is a hard link to it, so an image shared by many
+   stockcodes is stored and resized once. Disk work runs in a thread.
+5. Every write is recorded in the image store index (services/
+   image_store), which answers cached-stockcode and stats queries and
+   evicts least recently used images beyond the disk budget.
+
+Public paths (/images/<store>/<stockcode>.jpg) are unchanged.
+
+fetch_batch() also revalidates: requests carrying the ETag / Last-Modified /
+content hash from the last fetch are sent as conditional GETs, and only
+images that actually changed are processed and rewritten. Each fetch
+reports a perceptual hash (dHash) for placeholder detection; the metadata
+itself is kept by services/image_metadata.
 """
 import os
 import asyncio
+import hashlib
+import importlib.util
+import shutil
+import tempfile
 import httpx
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
 from pathlib import Path
 from typing import Optional
+from urllib.parse import urlsplit
 import logging
 from PIL import Image
 from io import BytesIO
 
-logger = logging.getLogger(__name__)
+from app.services.image_store import BLOBS_DIRNAME, IMAGES_DIR, image_store
+from app.services.image_variants import generate_variants, variant_dir
 
-# Base directory for cached images
-IMAGES_DIR = Path(__file__).parent.parent.parent / "static" / "images"
+logger = logging.getLogger(__name__)
 
 # Image optimization settings
 MAX_IMAGE_WIDTH = 400  # Max width for product images
 JPEG_QUALITY = 85
+PHASH_SIZE = 8  # dHash grid (PHASH_SIZE^2 bits)
+
+# Pipeline settings
+IMAGE_WORKERS = min(4, os.cpu_count() or 1)  # Processes for decode/resize/encode
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
 
 # Browser-like headers to avoid CDN blocks
 BROWSER_HEADERS = {
@@ -36,11 +73,132 @@ BROWSER_HEADERS = {
 }
 
 
+# ============== Image processing (runs in worker processes) ==============
+
+def _optimize_image(img: Image.Image) -> Optional[bytes]:
+    """Resize and compress image for web delivery."""
+    try:
+        # Convert to RGB if necessary (for JPEG)
+        if img.mode in ("RGBA", "P"):
+            img = img.convert("RGB")
+
+        # Resize if too large
+        if img.width > MAX_IMAGE_WIDTH:
+            ratio = MAX_IMAGE_WIDTH / img.width
+            new_height = int(img.height * ratio)
+            img = img.resize((MAX_IMAGE_WIDTH, new_height), Image.Resampling.LANCZOS)
+
+        # Save as optimized JPEG
+        output = BytesIO()
+        img.save(output, format="JPEG", quality=JPEG_QUALITY, optimize=True)
+        return output.getvalue()
+
+    except Exception as e:
+        logger.error(f"Error optimizing image: {e}")
+        return None
+
+
+def _perceptual_hash(img: Image.Image) -> int:
+    """64-bit difference hash (dHash), signed so it fits a BIGINT column."""
+    small = img.convert("L").resize((PHASH_SIZE + 1, PHASH_SIZE), Image.Resampling.LANCZOS)
+    pixels = list(small.getdata())
+    bits = 0
+    for row in range(PHASH_SIZE):
+        for col in range(PHASH_SIZE):
+            offset = row * (PHASH_SIZE + 1) + col
+            bits = (bits << 1) | (pixels[offset] > pixels[offset + 1])
+    return bits - (1 << 64) if bits >= 1 << 63 else bits
+
+
+def _open_image(content: bytes) -> Optional[Image.Image]:
+    try:
+        img = Image.open(BytesIO(content))
+        img.load()
+        return img
+    except Exception:
+        return None
+
+
+def _process_image(content: bytes, optimize: bool) -> Optional[tuple[bytes, int]]:
+    """(file content, perceptual hash), or None if the download isn't a usable image."""
+    img = _open_image(content)
+    if img is None:
+        return None
+    phash = _perceptual_hash(img)
+    processed = _optimize_image(img) if optimize else content
+    if processed is None:
+        return None
+    return processed, phash
+
+
+def _hash_image(content: bytes) -> Optional[int]:
+    """Perceptual hash only (the processed file already exists)."""
+    img = _open_image(content)
+    return _perceptual_hash(img) if img is not None else None
+
+
+# ============== Fetch requests and results ==============
+
+@dataclass
+class ImageRequest:
+    """A URL to fetch, the store paths that show it, and what was last seen there."""
+    url: str
+    targets: list[tuple[str, str]] = field(default_factory=list)  # (store_slug, stockcode)
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    content_hash: Optional[str] = None
+
+
+@dataclass
+class ImageFetch:
+    """Outcome of fetching one URL."""
+    url: str
+    status: str  # "new", "changed", "unchanged" or "failed"
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    content_hash: Optional[str] = None  # sha256 of the downloaded bytes
+    phash: Optional[int] = None  # Unset when unchanged (the stored one still applies)
+    variants: bool = False  # Responsive variants were written for content_hash
+
+
+# ============== HTTP clients ==============
+
+class _HostClients:
+    """One keep-alive AsyncClient per CDN host, for the lifetime of a batch."""
+
+    def __init__(self, max_connections: int):
+        self._limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_connections,
+        )
+        self._clients: dict[str, httpx.AsyncClient] = {}
+
+    def for_url(self, url: str) -> httpx.AsyncClient:
+        host = urlsplit(url).netloc
+        client = self._clients.get(host)
+        if client is None:
+            client = httpx.AsyncClient(
+                timeout=30.0,
+                headers=BROWSER_HEADERS,
+                limits=self._limits,
+                http2=HTTP2_AVAILABLE,
+                follow_redirects=True,
+            )
+            self._clients[host] = client
+        return client
+
+    async def aclose(self):
+        await asyncio.gather(*(client.aclose() for client in self._clients.values()))
+        self._clients.clear()
+
+
 class ImageCacheService:
     """Service for downloading and caching product images."""
 
     def __init__(self):
         self.images_dir = IMAGES_DIR
+        self.blobs_dir = IMAGES_DIR / BLOBS_DIRNAME
+        self._pool: Optional[ProcessPoolExecutor] = None
         self._ensure_directories()
 
     def _ensure_directories(self):
@@ -49,6 +207,18 @@ class ImageCacheService:
         for store in stores:
             store_dir = self.images_dir / store
             store_dir.mkdir(parents=True, exist_ok=True)
+        self.blobs_dir.mkdir(parents=True, exist_ok=True)
+
+    def _process_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=IMAGE_WORKERS)
+        return self._pool
+
+    def shutdown(self):
+        """Stop the image worker processes (app shutdown)."""
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
 
     def get_local_path(self, store_slug: str, stockcode: str) -> str:
         """Get the local path for a product image."""
@@ -62,6 +232,144 @@ class ImageCacheService:
         """Check if image is already cached."""
         return self.get_full_path(store_slug, stockcode).exists()
 
+    def cached_stockcodes(self, store_slugs: set[str]) -> set[tuple[str, str]]:
+        """(store_slug, stockcode) of every cached image, from the image store index."""
+        return image_store.stockcodes(store_slugs)
+
+    # ============== Disk ==============
+
+    def _blob_path(self, digest: str, optimize: bool) -> Path:
+        suffix = "" if optimize else "-raw"
+        return self.blobs_dir / digest[:2] / f"{digest}{suffix}.jpg"
+
+    def _write_atomic(self, path: Path, content: bytes):
+        """Write via a temp file in the same directory, then rename over the target."""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(content)
+            os.replace(temp_path, path)
+        except BaseException:
+            Path(temp_path).unlink(missing_ok=True)
+            raise
+
+    def _link(self, blob: Path, targets: list[tuple[str, str]]):
+        """Point each store/stockcode path at the blob (hard link, or a copy where links aren't supported)."""
+        for store_slug, stockcode in targets:
+            target = self.get_full_path(store_slug, stockcode)
+            target.parent.mkdir(parents=True, exist_ok=True)
+            temp_path = target.with_name(f".{target.name}.{os.urandom(4).hex()}.tmp")
+            try:
+                os.link(blob, temp_path)
+            except OSError:
+                shutil.copyfile(blob, temp_path)
+            os.replace(temp_path, target)
+
+    async def _touch(self, digest: str):
+        """Note an access; the periodic index write runs in a thread."""
+        if image_store.touch(digest):
+            await asyncio.to_thread(image_store.flush_access)
+
+    def _record(self, digest: str, targets: list[tuple[str, str]]):
+        """Index the content (blob and variants, as sized on disk) and the paths linking to it."""
+        image_store.record(digest, image_store.content_size(digest), targets)
+
+    # ============== Downloading ==============
+
+    async def _cache_url(self, clients: _HostClients, request: ImageRequest, optimize: bool) -> ImageFetch:
+        """
+        Fetch one URL and link it into every (store_slug, stockcode) that uses it.
+
+        Sends If-None-Match / If-Modified-Since when the request carries the
+        validators from the last fetch; a 304, or a 200 with the same content
+        hash, leaves the files on disk alone.
+        """
+        url = request.url
+        headers = {}
+        if request.etag:
+            headers["If-None-Match"] = request.etag
+        if request.last_modified:
+            headers["If-Modified-Since"] = request.last_modified
+
+        try:
+            response = await clients.for_url(url).get(url, headers=headers)
+            if response.status_code == 304:
+                if request.content_hash:
+                    await self._touch(request.content_hash)
+                return ImageFetch(url, "unchanged", request.etag, request.last_modified, request.content_hash)
+            if response.status_code != 200:
+                logger.warning(f"Failed to download image {url}: {response.status_code}")
+                return ImageFetch(url, "failed")
+
+            content = response.content
+            etag = response.headers.get("etag")
+            last_modified = response.headers.get("last-modified")
+            digest = hashlib.sha256(content).hexdigest()
+            if digest == request.content_hash:
+                await self._touch(digest)
+                return ImageFetch(url, "unchanged", etag, last_modified, digest)
+
+            loop = asyncio.get_running_loop()
+            blob = self._blob_path(digest, optimize)
+
+            # Identical downloads (across stockcodes, stores or URLs) skip the resize
+            if await asyncio.to_thread(blob.exists):
+                phash = await loop.run_in_executor(self._process_pool(), _hash_image, content)
+                processed = None
+            else:
+                result = await loop.run_in_executor(self._process_pool(), _process_image, content, optimize)
+                processed, phash = result if result is not None else (None, None)
+            if phash is None:
+                logger.warning(f"Invalid image content from {url}")
+                return ImageFetch(url, "failed")
+
+            if request.targets:
+                if processed is not None:
+                    await asyncio.to_thread(self._write_atomic, blob, processed)
+                await asyncio.to_thread(self._link, blob, request.targets)
+                for store_slug, stockcode in request.targets:
+                    logger.info(f"Cached image: {store_slug}/{stockcode}")
+
+            # Variants are keyed by content too; identical downloads reuse them
+            variants_path = variant_dir(self.images_dir, digest)
+            variants = await asyncio.to_thread(variants_path.is_dir)
+            if not variants:
+                variants = await loop.run_in_executor(
+                    self._process_pool(), generate_variants, content, str(variants_path)
+                )
+            await asyncio.to_thread(self._record, digest, request.targets)
+
+            status = "new" if request.content_hash is None else "changed"
+            return ImageFetch(url, status, etag, last_modified, digest, phash, variants)
+
+        except Exception as e:
+            logger.error(f"Error downloading image {url}: {e}")
+            return ImageFetch(url, "failed")
+
+    async def fetch_batch(
+        self,
+        requests: list[ImageRequest],
+        max_concurrent: int = 10,
+        optimize: bool = True,
+    ) -> list[ImageFetch]:
+        """
+        Fetch (or conditionally revalidate) many URLs over shared per-host clients.
+
+        Requests without targets are only hashed, nothing is written.
+        """
+        semaphore = asyncio.Semaphore(max_concurrent)
+        clients = _HostClients(max_connections=max_concurrent)
+
+        async def fetch_with_semaphore(request: ImageRequest) -> ImageFetch:
+            async with semaphore:
+                return await self._cache_url(clients, request, optimize)
+
+        try:
+            return await asyncio.gather(*(fetch_with_semaphore(r) for r in requests))
+        finally:
+            await clients.aclose()
+
     async def download_image(
         self,
         url: str,
@@ -85,73 +393,15 @@ class ImageCacheService:
             return None
 
         # Skip if already cached
-        if self.image_exists(store_slug, stockcode):
+        if await asyncio.to_thread(self.image_exists, store_slug, stockcode):
             return self.get_local_path(store_slug, stockcode)
 
-        try:
-            async with httpx.AsyncClient(timeout=30.0, headers=BROWSER_HEADERS) as client:
-                response = await client.get(url, follow_redirects=True)
-
-                if response.status_code != 200:
-                    logger.warning(f"Failed to download image {url}: {response.status_code}")
-                    return None
-
-                content = response.content
-                content_type = response.headers.get("content-type", "")
-
-                # Verify it's an image
-                if "image" not in content_type and not self._is_valid_image(content):
-                    logger.warning(f"Invalid image content from {url}")
-                    return None
-
-                # Optimize if requested
-                if optimize:
-                    content = self._optimize_image(content)
-                    if content is None:
-                        return None
-
-                # Save to disk
-                output_path = self.get_full_path(store_slug, stockcode)
-                output_path.write_bytes(content)
-
-                logger.info(f"Cached image: {store_slug}/{stockcode}")
-                return self.get_local_path(store_slug, stockcode)
-
-        except Exception as e:
-            logger.error(f"Error downloading image {url}: {e}")
-            return None
-
-    def _is_valid_image(self, content: bytes) -> bool:
-        """Check if content is a valid image."""
-        try:
-            Image.open(BytesIO(content))
-            return True
-        except Exception:
-            return False
-
-    def _optimize_image(self, content: bytes) -> Optional[bytes]:
-        """Resize and compress image for web delivery."""
-        try:
-            img = Image.open(BytesIO(content))
-
-            # Convert to RGB if necessary (for JPEG)
-            if img.mode in ("RGBA", "P"):
-                img = img.convert("RGB")
-
-            # Resize if too large
-            if img.width > MAX_IMAGE_WIDTH:
-                ratio = MAX_IMAGE_WIDTH / img.width
-                new_height = int(img.height * ratio)
-                img = img.resize((MAX_IMAGE_WIDTH, new_height), Image.Resampling.LANCZOS)
-
-            # Save as optimized JPEG
-            output = BytesIO()
-            img.save(output, format="JPEG", quality=JPEG_QUALITY, optimize=True)
-            return output.getvalue()
-
-        except Exception as e:
-            logger.error(f"Error optimizing image: {e}")
+        fetched = await self.fetch_batch(
+            [ImageRequest(url=url, targets=[(store_slug, stockcode)])], optimize=optimize
+        )
+        if fetched[0].status == "failed":
             return None
+        return self.get_local_path(store_slug, stockcode)
 
     async def cache_batch(
         self,
@@ -163,33 +413,31 @@ class ImageCacheService:
 
         Args:
             images: List of dicts with keys: url, store_slug, stockcode
-            max_concurrent: Maximum concurrent downloads
+            max_concurrent: Maximum concurrent downloads (also per-host connections)
 
         Returns:
             Dict with counts: success, failed, skipped (already cached)
         """
-        semaphore = asyncio.Semaphore(max_concurrent)
         results = {"success": 0, "failed": 0, "skipped": 0}
 
-        async def download_with_semaphore(img_info):
-            async with semaphore:
-                if self.image_exists(img_info["store_slug"], img_info["stockcode"]):
-                    results["skipped"] += 1
-                    return
-
-                result = await self.download_image(
-                    img_info["url"],
-                    img_info["store_slug"],
-                    img_info["stockcode"]
-                )
-
-                if result:
-                    results["success"] += 1
-                else:
-                    results["failed"] += 1
+        cached = await asyncio.to_thread(
+            self.cached_stockcodes, {img["store_slug"] for img in images}
+        )
 
-        tasks = [download_with_semaphore(img) for img in images]
-        await asyncio.gather(*tasks)
+        # Group stockcodes by URL so each URL is fetched once
+        by_url: dict[str, list[tuple[str, str]]] = {}
+        for img in images:
+            target = (img["store_slug"], img["stockcode"])
+            if target in cached:
+                results["skipped"] += 1
+            elif not img["url"]:
+                results["failed"] += 1
+            else:
+                by_url.setdefault(img["url"], []).append(target)
+
+        requests = [ImageRequest(url=url, targets=targets) for url, targets in by_url.items()]
+        for request, fetched in zip(requests, await self.fetch_batch(requests, max_concurrent)):
+            results["failed" if fetched.status == "failed" else "success"] += len(request.targets)
 
         logger.info(
             f"Image cache batch complete: {results['success']} success, "
@@ -199,32 +447,17 @@ class ImageCacheService:
         return results
 
     def get_cache_stats(self) -> dict:
-        """Get statistics about cached images."""
-        stats = {"total": 0, "by_store": {}}
-
-        for store_dir in self.images_dir.iterdir():
-            if store_dir.is_dir():
-                count = len(list(store_dir.glob("*.jpg")))
-                stats["by_store"][store_dir.name] = count
-                stats["total"] += count
-
-        return stats
+        """Get statistics about cached images (running totals kept by the index)."""
+        return image_store.stats()
 
     def clear_cache(self, store_slug: Optional[str] = None):
         """Clear cached images for a store or all stores."""
+        image_store.clear(store_slug)
         if store_slug:
-            store_dir = self.images_dir / store_slug
-            if store_dir.exists():
-                for img in store_dir.glob("*.jpg"):
-                    img.unlink()
-                logger.info(f"Cleared image cache for {store_slug}")
+            logger.info(f"Cleared image cache for {store_slug}")
         else:
-            for store_dir in self.images_dir.iterdir():
-                if store_dir.is_dir():
-                    for img in store_dir.glob("*.jpg"):
-                        img.unlink()
+            self._ensure_directories()
             logger.info("Cleared all image caches")
 
-
 # Singleton instance
 image_cache = ImageCacheService()
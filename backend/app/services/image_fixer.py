@@ -3,7 +3,8 @@ Image fixer service for correcting placeholder image URLs after SaleFinder scrap
 
 SaleFinder uses its own item IDs for images which often don't resolve correctly.
 This service fixes images by:
-1. Identifying products with placeholder/broken image URLs
+1. Identifying products with missing or placeholder images (placeholders are
+   flagged by perceptual hash in the image metadata index)
 2. Constructing correct CDN URLs from product URLs or searching store websites
 """
 import re
@@ -15,6 +16,9 @@ from sqlalchemy.orm import Session
 
 from app.database import SessionLocal
 from app.models import Store, Special
+from app.services.cache import invalidate_store_sync
+from app.services.current_specials import refresh_current_specials
+from app.services.image_metadata import index_images, placeholder_urls
 
 logger = logging.getLogger(__name__)
 
@@ -22,12 +26,6 @@ logger = logging.getLogger(__name__)
 class ImageFixer:
     """Service to fix broken/placeholder image URLs for specials."""
 
-    # Patterns that indicate a placeholder or broken image
-    PLACEHOLDER_PATTERNS = [
-        r'dduhxx0oznf63\.cloudfront\.net',  # SaleFinder placeholder CDN
-        r'/thumbs/',  # Thumbnail URLs that should be replaced
-    ]
-
     # Store-specific CDN URL patterns
     CDN_PATTERNS = {
         "woolworths": "https://cdn0.woolworths.media/content/wowproductimages/large/{product_id}.jpg",
@@ -40,14 +38,9 @@ class ImageFixer:
         "coles": r'-(\d{6,})$',  # Coles URLs end with -productid
     }
 
-    def is_placeholder_image(self, url: str) -> bool:
-        """Check if an image URL is a placeholder that needs fixing."""
-        if not url:
-            return True
-        for pattern in self.PLACEHOLDER_PATTERNS:
-            if re.search(pattern, url):
-                return True
-        return False
+    def is_placeholder_image(self, url: Optional[str], placeholders: set[str]) -> bool:
+        """Check if an image is missing or flagged as a placeholder by the metadata index."""
+        return not url or url in placeholders
 
     def extract_product_id_from_url(self, product_url: str, store_slug: str) -> Optional[str]:
         """Extract the real product ID from a product URL."""
@@ -91,6 +84,11 @@ class ImageFixer:
             Special.valid_to >= datetime.now().date()
         ).all()
 
+        # Hash images the index hasn't seen yet, then look up placeholder flags
+        urls = {special.image_url for special in specials if special.image_url}
+        indexed = index_images(db, urls)
+        placeholders = placeholder_urls(db, urls)
+
         fixed_count = 0
         checked_count = 0
 
@@ -98,7 +96,7 @@ class ImageFixer:
             checked_count += 1
 
             # Skip if image looks valid
-            if not self.is_placeholder_image(special.image_url):
+            if not self.is_placeholder_image(special.image_url, placeholders):
                 continue
 
             # Try to extract product ID from product_url
@@ -117,8 +115,13 @@ class ImageFixer:
                     special.image_url = new_url
                     fixed_count += 1
 
+        refreshed = bool(fixed_count or indexed["new"] or indexed["changed"])
+        if refreshed:
+            refresh_current_specials(db, store.id)
+        db.commit()
+        if refreshed:
+            invalidate_store_sync(store_slug)
         if fixed_count > 0:
-            db.commit()
             logger.info(f"Fixed {fixed_count} images for {store_slug}")
 
         return {
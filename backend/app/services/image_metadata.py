@@ -0,0 +1,291 @@
+"""
+Image Metadata Index
+
+Keeps image_metadata (ImageMetadata) current so image maintenance only
+transfers images that changed:
+- index_images(): first fetch of URLs the index hasn't seen (hashes them,
+  and caches them for any master products that use them)
+- revalidate_images(): conditional GETs (If-None-Match / If-Modified-Since)
+  for the longest-unchecked URLs, up to a per-run budget. Unchanged images
+  cost a 304 and no disk writes.
+- placeholder flags: an image is a placeholder when its perceptual hash is
+  blank (a uniform image) or shared by PLACEHOLDER_MIN_URLS or more URLs,
+  like the "image coming soon" tile CDNs serve under many product URLs
+
+The daily revalidation run is budgeted so the whole index is rechecked
+about once every REVALIDATE_AFTER_DAYS.
+
+run_image_eviction() applies the local cache's disk policy (services/
+image_store) weekly and points the affected products back at their CDN
+URLs.
+"""
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Iterable, Optional
+
+from sqlalchemy import case, func, or_, select, tuple_, update
+from sqlalchemy.orm import Session
+
+from app.config import get_settings
+from app.database import SessionLocal
+from app.models import ImageMetadata, MasterProduct
+from app.services.cache import invalidate_specials_sync
+from app.services.current_specials import refresh_current_specials
+from app.services.image_cache import ImageFetch, ImageRequest, image_cache
+from app.services.image_store import image_store
+from app.services.store_registry import store_registry
+
+logger = logging.getLogger(__name__)
+
+REVALIDATE_BUDGET = 2000  # URLs requested per run
+REVALIDATE_AFTER_DAYS = 7  # Don't recheck a URL more often than this
+PLACEHOLDER_MIN_URLS = 5  # URLs sharing one perceptual hash before it counts as a placeholder
+BLANK_HASHES = (0, -1)  # dHash of a uniform image
+MAX_CONCURRENT = 10
+CHUNK_SIZE = 500
+
+
+def _chunks(items: list, size: int = CHUNK_SIZE):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+# ============== Recording ==============
+
+def record_fetches(db: Session, fetches: list[ImageFetch]):
+    """Write fetch outcomes into the index (in the caller's transaction)."""
+    now = datetime.now(timezone.utc)
+    existing: dict[str, ImageMetadata] = {}
+    for chunk in _chunks([f.url for f in fetches]):
+        for entry in db.query(ImageMetadata).filter(ImageMetadata.url.in_(chunk)):
+            existing[entry.url] = entry
+
+    for fetched in fetches:
+        entry = existing.get(fetched.url)
+        if entry is None:
+            entry = ImageMetadata(url=fetched.url, failures=0, is_placeholder=False, variants_ready=False)
+            db.add(entry)
+            existing[fetched.url] = entry
+
+        entry.checked_at = now
+        if fetched.status == "failed":
+            entry.failures = (entry.failures or 0) + 1
+            continue
+
+        entry.failures = 0
+        entry.etag = fetched.etag
+        entry.last_modified = fetched.last_modified
+        if fetched.status in ("new", "changed"):
+            entry.content_hash = fetched.content_hash
+            entry.phash = fetched.phash
+            entry.variants_ready = fetched.variants
+            entry.changed_at = now
+    db.flush()
+
+
+def refresh_placeholder_flags(db: Session):
+    """Recompute is_placeholder from the perceptual hashes across the whole index."""
+    shared = (
+        select(ImageMetadata.phash)
+        .where(ImageMetadata.phash.isnot(None))
+        .group_by(ImageMetadata.phash)
+        .having(func.count() >= PLACEHOLDER_MIN_URLS)
+    )
+    placeholder = or_(ImageMetadata.phash.in_(BLANK_HASHES), ImageMetadata.phash.in_(shared))
+    db.execute(
+        update(ImageMetadata).values(is_placeholder=case((placeholder, True), else_=False))
+    )
+
+
+def placeholder_urls(db: Session, urls: Iterable[str]) -> set[str]:
+    """The given URLs the index flags as placeholders."""
+    flagged = set()
+    for chunk in _chunks(list(urls)):
+        flagged.update(db.scalars(
+            select(ImageMetadata.url).where(
+                ImageMetadata.url.in_(chunk),
+                ImageMetadata.is_placeholder.is_(True),
+            )
+        ))
+    return flagged
+
+
+# ============== Fetching ==============
+
+def _targets_by_url(db: Session, urls: list[str]) -> dict[str, list[tuple[str, str]]]:
+    """(store_slug, stockcode) of the master products showing each URL."""
+    targets: dict[str, list[tuple[str, str]]] = {}
+    for chunk in _chunks(urls):
+        rows = db.execute(
+            select(MasterProduct.original_image_url, MasterProduct.store_id, MasterProduct.stockcode)
+            .where(MasterProduct.original_image_url.in_(chunk))
+        )
+        for url, store_id, stockcode in rows:
+            store = store_registry.get(store_id)
+            if store is not None:
+                targets.setdefault(url, []).append((store.slug, stockcode))
+    return targets
+
+
+def _fetch_and_record(db: Session, requests: list[ImageRequest]) -> dict:
+    """Run the requests, record the outcomes and refresh the placeholder flags."""
+    counts = {"checked": len(requests), "new": 0, "changed": 0, "unchanged": 0, "failed": 0}
+    if not requests:
+        return counts
+
+    # Validators only help when every store path already has the file
+    cached = image_cache.cached_stockcodes({slug for r in requests for slug, _ in r.targets})
+    for request in requests:
+        if any(target not in cached for target in request.targets):
+            request.etag = request.last_modified = request.content_hash = None
+
+    fetches = asyncio.run(image_cache.fetch_batch(requests, max_concurrent=MAX_CONCURRENT))
+    for fetched in fetches:
+        counts[fetched.status] += 1
+
+    record_fetches(db, fetches)
+    refresh_placeholder_flags(db)
+    return counts
+
+
+def index_images(db: Session, urls: Iterable[str], budget: int = REVALIDATE_BUDGET) -> dict:
+    """Fetch and index up to `budget` of the URLs not in the index yet."""
+    urls = list(dict.fromkeys(u for u in urls if u))
+    known = set()
+    for chunk in _chunks(urls):
+        known.update(db.scalars(select(ImageMetadata.url).where(ImageMetadata.url.in_(chunk))))
+    new_urls = [u for u in urls if u not in known][:budget]
+
+    targets = _targets_by_url(db, new_urls)
+    return _fetch_and_record(db, [ImageRequest(url=u, targets=targets.get(u, [])) for u in new_urls])
+
+
+def revalidate_images(db: Session, budget: int = REVALIDATE_BUDGET) -> dict:
+    """
+    Recheck the master product images due for revalidation, oldest first.
+
+    URLs never indexed go first (a plain GET), then indexed URLs not checked
+    in REVALIDATE_AFTER_DAYS (conditional GETs). At most `budget` requests.
+    """
+    unindexed = db.scalars(
+        select(MasterProduct.original_image_url)
+        .outerjoin(ImageMetadata, ImageMetadata.url == MasterProduct.original_image_url)
+        .where(MasterProduct.original_image_url.isnot(None), ImageMetadata.id.is_(None))
+        .distinct()
+        .limit(budget)
+    ).all()
+
+    due = []
+    remaining = budget - len(unindexed)
+    if remaining > 0:
+        cutoff = datetime.now(timezone.utc) - timedelta(days=REVALIDATE_AFTER_DAYS)
+        due = db.query(ImageMetadata).filter(
+            or_(ImageMetadata.checked_at.is_(None), ImageMetadata.checked_at < cutoff)
+        ).order_by(ImageMetadata.checked_at.asc().nulls_first()).limit(remaining).all()
+
+    targets = _targets_by_url(db, [*unindexed, *(entry.url for entry in due)])
+    requests = [ImageRequest(url=url, targets=targets.get(url, [])) for url in unindexed]
+    for entry in due:
+        request = ImageRequest(url=entry.url, targets=targets.get(entry.url, []))
+        # Entries without variants are refetched in full so they get them
+        if entry.variants_ready:
+            request.etag = entry.etag
+            request.last_modified = entry.last_modified
+            request.content_hash = entry.content_hash
+        requests.append(request)
+    return _fetch_and_record(db, requests)
+
+
+def run_image_revalidation(budget: Optional[int] = None) -> dict:
+    """Run one budgeted revalidation pass. Called by the scheduler."""
+    db = SessionLocal()
+    try:
+        counts = revalidate_images(db, budget or REVALIDATE_BUDGET)
+        refreshed = bool(counts["new"] or counts["changed"])
+        if refreshed:
+            # Listings pick up the new image hashes (responsive variant URLs)
+            refresh_current_specials(db)
+        db.commit()
+        if refreshed:
+            invalidate_specials_sync()
+        logger.info(
+            f"Image revalidation: {counts['checked']} checked, {counts['changed']} changed, "
+            f"{counts['new']} new, {counts['unchanged']} unchanged, {counts['failed']} failed"
+        )
+        return counts
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Image revalidation failed: {e}")
+        raise
+    finally:
+        db.close()
+
+
+# ============== Eviction ==============
+
+def _forget_evicted(db: Session, paths: list[tuple[str, str]], digests: list[str]):
+    """Stop pointing products and the index at files the image store removed."""
+    keys = [
+        (store_registry.id_for(slug), stockcode)
+        for slug, stockcode in paths
+        if store_registry.id_for(slug) is not None
+    ]
+    for chunk in _chunks(keys):
+        db.execute(
+            update(MasterProduct)
+            .where(tuple_(MasterProduct.store_id, MasterProduct.stockcode).in_(chunk))
+            .values(image_cached=False)
+        )
+    # Refetched in full (no validators) the next time they are revalidated
+    for chunk in _chunks(digests):
+        db.execute(
+            update(ImageMetadata)
+            .where(ImageMetadata.content_hash.in_(chunk))
+            .values(variants_ready=False)
+        )
+
+
+def run_image_eviction() -> dict:
+    """
+    Evict images of products not seen in image_cache_evict_after_weeks,
+    then least recently used images beyond image_cache_budget_mb.
+    Called by the scheduler.
+    """
+    settings = get_settings()
+    cutoff = datetime.now(timezone.utc) - timedelta(weeks=settings.image_cache_evict_after_weeks)
+
+    db = SessionLocal()
+    try:
+        stale = []
+        rows = db.execute(
+            select(MasterProduct.store_id, MasterProduct.stockcode)
+            .where(MasterProduct.image_cached.is_(True), MasterProduct.last_seen_at < cutoff)
+        )
+        for store_id, stockcode in rows:
+            store = store_registry.get(store_id)
+            if store is not None:
+                stale.append((store.slug, stockcode))
+
+        evicted = image_store.evict(stale, cutoff.timestamp(), settings.image_cache_budget_mb * 1024 * 1024)
+        _forget_evicted(db, evicted["paths"], evicted["digests"])
+        if evicted["digests"]:
+            # Listings stop using the removed variants
+            refresh_current_specials(db)
+        db.commit()
+        if evicted["digests"]:
+            # Cached pages would otherwise keep srcsets pointing at deleted variants
+            invalidate_specials_sync()
+
+        results = {"paths": len(evicted["paths"]), "contents": len(evicted["digests"]), **image_store.stats()}
+        logger.info(
+            f"Image eviction: {results['paths']} paths and {results['contents']} images removed, "
+            f"{results['bytes'] // (1024 * 1024)} MB cached"
+        )
+        return results
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Image eviction failed: {e}")
+        raise
+    finally:
+        db.close()
@@ -0,0 +1,379 @@
+"""
+Image Store Index
+
+A SQLite index (data/image_index.sqlite3, or image_cache_index_dir; never
+under static/, which is served publicly) of everything the image cache
+keeps on disk:
+- contents: one row per content hash (the blob plus its responsive
+  variants), with total bytes and last access time
+- entries: which store/stockcode paths link to which content
+- totals: running file/byte counters, so stats are one small read instead
+  of a directory walk
+
+The image cache records every write here; variant requests and image
+revalidations update last access. touch() only notes the access in
+memory; callers on the event loop flush it from a worker thread when
+ACCESS_FLUSH_INTERVAL has passed. Cached stockcodes, stats and clearing
+read the index instead of listing directories.
+
+Eviction (evict(), run weekly by services/image_metadata):
+1. Images of products that are no longer listed are removed, then content
+   no path links to that hasn't been accessed since the cutoff.
+2. If the store is still over its byte budget, the least recently
+   accessed content is removed until it fits.
+
+The index is opened at app startup (open()); one that doesn't exist yet
+is rebuilt from disk then (hard links are matched to their blob by inode).
+"""
+import logging
+import os
+import shutil
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Iterable, Optional
+
+from app.config import get_settings
+
+logger = logging.getLogger(__name__)
+
+# Base directory for cached images
+IMAGES_DIR = Path(__file__).parent.parent.parent / "static" / "images"
+DATA_DIR = Path(__file__).parent.parent.parent / "data"
+INDEX_FILENAME = "image_index.sqlite3"
+LEGACY_INDEX_FILENAME = "index.sqlite3"  # Formerly kept in IMAGES_DIR, where it was served
+BLOBS_DIRNAME = "blobs"
+VARIANTS_DIRNAME = "variants"
+ACCESS_FLUSH_INTERVAL = 60.0  # Seconds between last-access writes
+EVICTION_BATCH = 200
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS contents (
+    digest TEXT PRIMARY KEY,
+    bytes INTEGER NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_contents_last_access ON contents (last_access);
+CREATE TABLE IF NOT EXISTS entries (
+    store_slug TEXT NOT NULL,
+    stockcode TEXT NOT NULL,
+    digest TEXT NOT NULL,
+    PRIMARY KEY (store_slug, stockcode)
+);
+CREATE INDEX IF NOT EXISTS ix_entries_digest ON entries (digest);
+CREATE TABLE IF NOT EXISTS totals (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+
+def _tree_size(path: Path) -> int:
+    if path.is_file():
+        return path.stat().st_size
+    if not path.is_dir():
+        return 0
+    return sum(f.stat().st_size for f in path.rglob("*") if f.is_file())
+
+
+class ImageStore:
+    """SQLite-indexed view of the image cache directory."""
+
+    def __init__(self, images_dir: Path = IMAGES_DIR, index_dir: Optional[Path] = None):
+        self.images_dir = images_dir
+        self.path = (index_dir or DATA_DIR) / INDEX_FILENAME
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.RLock()
+        self._pending_access: dict[str, float] = {}
+        self._last_flush = time.monotonic()
+
+    # ============== Connection ==============
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            fresh = not self.path.exists()
+            self.images_dir.mkdir(parents=True, exist_ok=True)
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            for legacy in self.images_dir.glob(f"{LEGACY_INDEX_FILENAME}*"):
+                legacy.unlink(missing_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(SCHEMA)
+            self._conn = conn
+            if fresh:
+                self._rebuild_from_disk()
+        return self._conn
+
+    def open(self):
+        """Open (and if needed rebuild) the index; called at app startup."""
+        with self._lock:
+            self._db()
+
+    def close(self):
+        """Write pending access times and close the index (app shutdown)."""
+        with self._lock:
+            if self._conn is not None:
+                self.flush_access()
+                self._conn.close()
+                self._conn = None
+
+    def _adjust(self, conn: sqlite3.Connection, key: str, delta: int):
+        if delta:
+            conn.execute(
+                "INSERT INTO totals (key, value) VALUES (?, ?) "
+                "ON CONFLICT (key) DO UPDATE SET value = value + excluded.value",
+                (key, delta),
+            )
+
+    def _blob_paths(self, digest: str) -> list[Path]:
+        return list((self.images_dir / BLOBS_DIRNAME / digest[:2]).glob(f"{digest}*.jpg"))
+
+    def _variants_path(self, digest: str) -> Path:
+        return self.images_dir / VARIANTS_DIRNAME / digest[:2] / digest
+
+    def content_size(self, digest: str) -> int:
+        """Bytes on disk for a content hash (blob files plus variants)."""
+        return sum(p.stat().st_size for p in self._blob_paths(digest)) + _tree_size(self._variants_path(digest))
+
+    # ============== Recording ==============
+
+    def record(self, digest: str, size: int, targets: Iterable[tuple[str, str]] = ()):
+        """Register content (and the store paths linking to it) after a write."""
+        now = time.time()
+        with self._lock:
+            conn = self._db()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute("SELECT bytes FROM contents WHERE digest = ?", (digest,)).fetchone()
+                conn.execute(
+                    "INSERT INTO contents (digest, bytes, last_access) VALUES (?, ?, ?) "
+                    "ON CONFLICT (digest) DO UPDATE SET bytes = excluded.bytes, last_access = excluded.last_access",
+                    (digest, size, now),
+                )
+                self._adjust(conn, "bytes", size - (row[0] if row else 0))
+                self._adjust(conn, "contents", 0 if row else 1)
+
+                for store_slug, stockcode in targets:
+                    existing = conn.execute(
+                        "SELECT 1 FROM entries WHERE store_slug = ? AND stockcode = ?", (store_slug, stockcode)
+                    ).fetchone()
+                    conn.execute(
+                        "INSERT OR REPLACE INTO entries (store_slug, stockcode, digest) VALUES (?, ?, ?)",
+                        (store_slug, stockcode, digest),
+                    )
+                    if not existing:
+                        self._adjust(conn, f"entries:{store_slug}", 1)
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+
+    def touch(self, digest: str) -> bool:
+        """
+        Note an access in memory (no I/O, safe on the event loop).
+
+        Returns True when ACCESS_FLUSH_INTERVAL has passed; the caller then
+        runs flush_access() in a worker thread.
+        """
+        with self._lock:
+            self._pending_access[digest] = time.time()
+            return time.monotonic() - self._last_flush >= ACCESS_FLUSH_INTERVAL
+
+    def flush_access(self):
+        """Write pending last-access times."""
+        with self._lock:
+            pending, self._pending_access = self._pending_access, {}
+            self._last_flush = time.monotonic()
+            if pending:
+                self._db().executemany(
+                    "UPDATE contents SET last_access = MAX(last_access, ?) WHERE digest = ?",
+                    [(accessed, digest) for digest, accessed in pending.items()],
+                )
+
+    # ============== Reading ==============
+
+    def stockcodes(self, store_slugs: Iterable[str]) -> set[tuple[str, str]]:
+        """(store_slug, stockcode) of every cached image for these stores."""
+        slugs = list(store_slugs)
+        if not slugs:
+            return set()
+        with self._lock:
+            rows = self._db().execute(
+                f"SELECT store_slug, stockcode FROM entries WHERE store_slug IN ({','.join('?' * len(slugs))})",
+                slugs,
+            ).fetchall()
+        return set(rows)
+
+    def stats(self) -> dict:
+        """Counts and bytes from the running totals."""
+        with self._lock:
+            totals = dict(self._db().execute("SELECT key, value FROM totals").fetchall())
+        by_store = {key.split(":", 1)[1]: value for key, value in totals.items() if key.startswith("entries:")}
+        return {
+            "total": sum(by_store.values()),
+            "by_store": by_store,
+            "unique_files": totals.get("contents", 0),
+            "bytes": totals.get("bytes", 0),
+        }
+
+    # ============== Removing ==============
+
+    def _remove_entries(self, conn: sqlite3.Connection, targets: list[tuple[str, str]]) -> list[tuple[str, str]]:
+        removed = []
+        for store_slug, stockcode in targets:
+            deleted = conn.execute(
+                "DELETE FROM entries WHERE store_slug = ? AND stockcode = ?", (store_slug, stockcode)
+            ).rowcount
+            if deleted:
+                self._adjust(conn, f"entries:{store_slug}", -1)
+                (self.images_dir / store_slug / f"{stockcode}.jpg").unlink(missing_ok=True)
+                removed.append((store_slug, stockcode))
+        return removed
+
+    def _remove_contents(self, conn: sqlite3.Connection, digests: list[str]) -> list[tuple[str, str]]:
+        removed = []
+        for digest in digests:
+            linked = conn.execute("SELECT store_slug, stockcode FROM entries WHERE digest = ?", (digest,)).fetchall()
+            removed.extend(self._remove_entries(conn, linked))
+            row = conn.execute("SELECT bytes FROM contents WHERE digest = ?", (digest,)).fetchone()
+            if row:
+                conn.execute("DELETE FROM contents WHERE digest = ?", (digest,))
+                self._adjust(conn, "bytes", -row[0])
+                self._adjust(conn, "contents", -1)
+            for blob in self._blob_paths(digest):
+                blob.unlink(missing_ok=True)
+            shutil.rmtree(self._variants_path(digest), ignore_errors=True)
+        return removed
+
+    def remove(self, targets: Iterable[tuple[str, str]] = (), digests: Iterable[str] = ()) -> list[tuple[str, str]]:
+        """
+        Remove store paths and/or whole contents, files and index rows
+        together. Returns the store paths that were removed.
+        """
+        with self._lock:
+            conn = self._db()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                removed = self._remove_entries(conn, list(targets))
+                removed.extend(self._remove_contents(conn, list(digests)))
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        return removed
+
+    def clear(self, store_slug: Optional[str] = None):
+        """Remove a store's images (and content left unused), or everything."""
+        with self._lock:
+            if store_slug is None:
+                if self._conn is not None:
+                    self._conn.close()
+                    self._conn = None
+                for path in self.images_dir.iterdir():
+                    if path.is_dir():
+                        shutil.rmtree(path, ignore_errors=True)
+                for path in self.path.parent.glob(f"{INDEX_FILENAME}*"):
+                    path.unlink(missing_ok=True)
+                self._pending_access.clear()
+                return
+
+            conn = self._db()
+            targets = conn.execute("SELECT store_slug, stockcode FROM entries WHERE store_slug = ?", (store_slug,)).fetchall()
+            self.remove(targets=targets)
+            orphans = [row[0] for row in conn.execute(
+                "SELECT digest FROM contents WHERE digest NOT IN (SELECT digest FROM entries)"
+            )]
+            self.remove(digests=orphans)
+
+    def evict(self, stale: list[tuple[str, str]], idle_before: float, budget_bytes: int) -> dict:
+        """
+        Drop stale store paths, then unused content last accessed before
+        `idle_before` (a timestamp), then least recently used content until
+        the store is within `budget_bytes`.
+
+        Returns the removed store paths and content hashes, so callers can
+        stop pointing at them.
+        """
+        self.flush_access()
+        with self._lock:
+            conn = self._db()
+            removed = self.remove(targets=stale)
+
+            digests = [row[0] for row in conn.execute(
+                "SELECT digest FROM contents WHERE last_access < ? AND digest NOT IN (SELECT digest FROM entries)",
+                (idle_before,),
+            )]
+            removed.extend(self.remove(digests=digests))
+
+            excess = self.stats()["bytes"] - budget_bytes
+            oldest = []
+            for digest, size in conn.execute("SELECT digest, bytes FROM contents ORDER BY last_access"):
+                if excess <= 0:
+                    break
+                oldest.append(digest)
+                excess -= size
+            for i in range(0, len(oldest), EVICTION_BATCH):
+                removed.extend(self.remove(digests=oldest[i:i + EVICTION_BATCH]))
+            digests.extend(oldest)
+
+        return {"paths": removed, "digests": digests}
+
+    # ============== Rebuild ==============
+
+    def _rebuild_from_disk(self):
+        """Index existing files once (the store predates the index)."""
+        conn = self._conn
+        digests_by_inode: dict[int, str] = {}
+        sizes: dict[str, int] = {}
+
+        blobs_dir = self.images_dir / BLOBS_DIRNAME
+        if blobs_dir.is_dir():
+            for blob in blobs_dir.glob("*/*.jpg"):
+                digest = blob.name[:-4].removesuffix("-raw")
+                stat = blob.stat()
+                digests_by_inode[stat.st_ino] = digest
+                sizes[digest] = sizes.get(digest, 0) + stat.st_size
+
+        variants_dir = self.images_dir / VARIANTS_DIRNAME
+        if variants_dir.is_dir():
+            for directory in variants_dir.glob("*/*"):
+                if directory.is_dir() and not directory.name.startswith("."):
+                    sizes[directory.name] = sizes.get(directory.name, 0) + _tree_size(directory)
+
+        entries = []
+        for store_dir in self.images_dir.iterdir():
+            if not store_dir.is_dir() or store_dir.name in (BLOBS_DIRNAME, VARIANTS_DIRNAME):
+                continue
+            with os.scandir(store_dir) as files:
+                for entry in files:
+                    if not entry.name.endswith(".jpg"):
+                        continue
+                    stat = entry.stat()
+                    digest = digests_by_inode.get(stat.st_ino)
+                    if digest is None:
+                        # Written before content addressing: its own content
+                        digest = f"legacy-{store_dir.name}-{entry.name[:-4]}"
+                        sizes[digest] = stat.st_size
+                    entries.append((store_dir.name, entry.name[:-4], digest))
+
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        conn.executemany(
+            "INSERT OR REPLACE INTO contents (digest, bytes, last_access) VALUES (?, ?, ?)",
+            [(digest, size, now) for digest, size in sizes.items()],
+        )
+        conn.executemany("INSERT OR REPLACE INTO entries (store_slug, stockcode, digest) VALUES (?, ?, ?)", entries)
+        conn.execute("DELETE FROM totals")
+        self._adjust(conn, "bytes", sum(sizes.values()))
+        self._adjust(conn, "contents", len(sizes))
+        for store_slug in {e[0] for e in entries}:
+            self._adjust(conn, f"entries:{store_slug}", sum(1 for e in entries if e[0] == store_slug))
+        conn.execute("COMMIT")
+        logger.info(f"Image store index rebuilt: {len(entries)} paths, {len(sizes)} contents")
+
+
+_index_dir = get_settings().image_cache_index_dir
+image_store = ImageStore(index_dir=Path(_index_dir) if _index_dir else None)
+
@@ -0,0 +1,145 @@
+"""
+Responsive Image Variants
+
+Each cached image (by content hash) gets a set of widths in JPEG and WebP,
+plus AVIF when Pillow has an AVIF encoder:
+
+    static/images/variants/<hash[:2]>/<hash>/<width>.jpg|.webp|.avif
+
+Variants are generated in the image cache's worker processes whenever a
+new or changed image is downloaded. Paths are content-addressed, so they
+never change meaning and are served with immutable cache headers.
+
+Clients always request the .jpg URL; VariantStaticFiles negotiates on the
+Accept header and serves the AVIF or WebP file instead when the client
+takes it (Vary: Accept), and notes the access in the image store index so
+popular images survive eviction. image_srcset() builds the src/srcset that
+ProductV2 exposes, so listings load the smallest width that fits.
+"""
+import os
+import shutil
+import tempfile
+from io import BytesIO
+from pathlib import Path
+from typing import Optional
+
+from PIL import Image, features
+from starlette.concurrency import run_in_threadpool
+from starlette.exceptions import HTTPException
+from starlette.datastructures import Headers
+from starlette.responses import Response
+from starlette.staticfiles import StaticFiles
+from starlette.types import Scope
+
+from app.services.image_store import VARIANTS_DIRNAME, image_store
+
+try:
+    import pillow_avif  # noqa: F401  Registers the AVIF plugin on older Pillow
+except ImportError:  # Optional: AVIF variants are skipped without an encoder
+    pillow_avif = None
+
+VARIANTS_URL = "/static/images/variants"
+VARIANT_WIDTHS = (160, 320, 480)  # Grid thumbnail, 2x thumbnail, detail view
+DEFAULT_WIDTH = 320  # src for clients that ignore srcset (a listing grid at 2x)
+WEBP_QUALITY = 80
+AVIF_QUALITY = 60
+JPEG_QUALITY = 85
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+def _encoders() -> list[tuple[str, str, dict]]:
+    """(extension, Pillow format, save options), fallback JPEG first."""
+    encoders = [("jpg", "JPEG", {"quality": JPEG_QUALITY, "optimize": True})]
+    if features.check("webp"):
+        encoders.append(("webp", "WEBP", {"quality": WEBP_QUALITY, "method": 4}))
+    if "AVIF" in Image.registered_extensions().values():
+        encoders.append(("avif", "AVIF", {"quality": AVIF_QUALITY}))
+    return encoders
+
+
+# Negotiated formats, best first: (extension, media type)
+NEGOTIATED_FORMATS = [
+    (ext, f"image/{ext}") for ext, _, _ in reversed(_encoders()) if ext != "jpg"
+]
+
+
+def variant_dir(images_dir: Path, content_hash: str) -> Path:
+    return images_dir / VARIANTS_DIRNAME / content_hash[:2] / content_hash
+
+
+def generate_variants(content: bytes, directory: str) -> bool:
+    """
+    Write every width and format of an image into `directory`.
+
+    Runs in a worker process. Files are written to a temporary sibling
+    directory that is renamed into place, so a variants directory is
+    either complete or absent. Widths above the source width are written
+    at the source size (never upscaled), so every srcset entry exists.
+    """
+    target = Path(directory)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    staging = Path(tempfile.mkdtemp(dir=target.parent, prefix=f".{target.name}."))
+    try:
+        img = Image.open(BytesIO(content))
+        img.load()
+        if img.mode not in ("RGB", "L"):
+            img = img.convert("RGB")
+
+        encoders = _encoders()
+        for width in VARIANT_WIDTHS:
+            if img.width > width:
+                resized = img.resize((width, int(img.height * width / img.width)), Image.Resampling.LANCZOS)
+            else:
+                resized = img
+            for ext, image_format, options in encoders:
+                resized.save(staging / f"{width}.{ext}", format=image_format, **options)
+
+        try:
+            os.rename(staging, target)
+        except OSError:
+            # Another worker finished the same content first
+            if not target.is_dir():
+                raise
+        return True
+    except Exception:
+        return False
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+
+
+def image_srcset(content_hash: Optional[str]) -> tuple[Optional[str], Optional[str]]:
+    """(src, srcset) of an image's variants, or (None, None) without a hash."""
+    if not content_hash:
+        return None, None
+    base = f"{VARIANTS_URL}/{content_hash[:2]}/{content_hash}"
+    srcset = ", ".join(f"{base}/{width}.jpg {width}w" for width in VARIANT_WIDTHS)
+    return f"{base}/{DEFAULT_WIDTH}.jpg", srcset
+
+
+class VariantStaticFiles(StaticFiles):
+    """StaticFiles for the variants tree: Accept negotiation and immutable caching."""
+
+    async def get_response(self, path: str, scope: Scope) -> Response:
+        response = None
+        base, ext = os.path.splitext(path)
+        if ext == ".jpg":
+            accept = Headers(scope=scope).get("accept", "")
+            for negotiated_ext, media_type in NEGOTIATED_FORMATS:
+                if media_type not in accept:
+                    continue
+                try:
+                    response = await super().get_response(f"{base}.{negotiated_ext}", scope)
+                    break
+                except HTTPException:
+                    continue
+        if response is None:
+            response = await super().get_response(path, scope)
+
+        parts = path.split("/")
+        if len(parts) == 3 and image_store.touch(parts[1]):
+            # The periodic index write is SQLite I/O: keep it off the event loop
+            await run_in_threadpool(image_store.flush_access)
+
+        response.headers["Cache-Control"] = IMMUTABLE_CACHE_CONTROL
+        response.headers["Vary"] = "Accept"
+        return response
@@ -3,18 +3,27 @@ Playwright-based scraper for supermarket specials.
 
 Scrapes weekly specials from Woolworths, Coles, ALDI, and IGA
 using browser automation for accurate data extraction.
+
+All stores share one Chromium process through a BrowserPool. Each store gets
+its own browser context with a few pages that work through the category list
+in parallel, and images, fonts and analytics requests are blocked at the
+network layer.
 """
 import asyncio
 import logging
 import re
-from datetime import date, timedelta
+from abc import ABC, abstractmethod
+from contextlib import AsyncExitStack, asynccontextmanager
 from decimal import Decimal, InvalidOperation
 from typing import Optional
-from dataclasses import dataclass, field
-from playwright.async_api import async_playwright, Page, Browser, TimeoutError as PlaywrightTimeout
+from dataclasses import asdict, dataclass, field
+from playwright.async_api import async_playwright, Page, Browser, Route, TimeoutError as PlaywrightTimeout
 
+from app.config import get_settings
 from app.database import SessionLocal
-from app.models import Store, Category, Special
+from app.models import Store
+from app.services.cache import invalidate_store_sync
+from app.services.special_ingest import ingest_specials
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -225,47 +234,181 @@ ALDI_CATEGORIES = [
 ]
 
 
-class PlaywrightScraper:
-    """Base class for Playwright-based scraping."""
+# ============== SHARED BROWSER POOL ==============
+
+# Resource types that never carry product data
+BLOCKED_RESOURCE_TYPES = {"image", "media", "font"}
+
+# Analytics, tag managers and ad trackers
+BLOCKED_URL_PATTERN = re.compile(
+    r"google-analytics|googletagmanager|doubleclick|facebook\.(?:net|com)|hotjar|"
+    r"newrelic|nr-data|segment\.(?:io|com)|optimizely|adobedtm|demdex|omtrdc|"
+    r"quantummetric|tiktok|bat\.bing",
+    re.IGNORECASE,
+)
+
+# JavaScript predicate: true once the number of elements matching a selector
+# has been non-zero and unchanged for quiet_ms milliseconds
+STABLE_COUNT_JS = """
+([selector, quietMs]) => {
+    const state = (window.__stableCounts = window.__stableCounts || {});
+    const count = document.querySelectorAll(selector).length;
+    const now = performance.now();
+    const last = state[selector];
+    if (!last || last.count !== count) {
+        state[selector] = {count, since: now};
+        return false;
+    }
+    return count > 0 && now - last.since >= quietMs;
+}
+"""
+
+
+class BrowserPool:
+    """
+    One Chromium process shared by every store scraper.
 
-    def __init__(self):
+    Each store borrows an isolated browser context (cookies, cache) holding
+    a few pages, so stores can be scraped side by side without paying for
+    a separate browser each.
+    """
+
+    def __init__(self, pages_per_store: Optional[int] = None, headless: bool = True):
+        self.pages_per_store = pages_per_store or get_settings().scrape_browser_pages_per_store
+        self.headless = headless
+        self._playwright = None
         self.browser: Optional[Browser] = None
+
+    async def start(self):
+        if self.browser is None:
+            self._playwright = await async_playwright().start()
+            self.browser = await self._playwright.chromium.launch(headless=self.headless)
+        return self
+
+    async def close(self):
+        if self.browser:
+            await self.browser.close()
+            self.browser = None
+        if self._playwright:
+            await self._playwright.stop()
+            self._playwright = None
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+    @staticmethod
+    async def _filter_request(route: Route):
+        request = route.request
+        if request.resource_type in BLOCKED_RESOURCE_TYPES or BLOCKED_URL_PATTERN.search(request.url):
+            await route.abort()
+        else:
+            await route.continue_()
+
+    @asynccontextmanager
+    async def store_pages(self, count: Optional[int] = None):
+        """Open a fresh context with `count` pages; closed on exit."""
+        await self.start()
+        context = await self.browser.new_context(viewport={"width": 1920, "height": 1080})
+        try:
+            await context.route("**/*", self._filter_request)
+            pages = [await context.new_page() for _ in range(count or self.pages_per_store)]
+            yield pages
+        finally:
+            await context.close()
+
+
+class PlaywrightScraper(ABC):
+    """Base class for Playwright-based scraping."""
+
+    STORE_SLUG = ""
+    CATEGORIES: list[CategoryConfig] = []
+    # Product tiles counted to decide when a page has finished rendering
+    PRODUCT_SELECTOR = ""
+
+    def __init__(self, pool: Optional[BrowserPool] = None):
+        self.pool = pool
+        self.pages: list[Page] = []
         self.page: Optional[Page] = None
+        self._stack: Optional[AsyncExitStack] = None
 
     async def __aenter__(self):
-        playwright = await async_playwright().start()
-        self.browser = await playwright.chromium.launch(headless=True)
-        self.page = await self.browser.new_page()
-        # Set a reasonable viewport
-        await self.page.set_viewport_size({"width": 1920, "height": 1080})
+        self._stack = AsyncExitStack()
+        if self.pool is None:
+            # Standalone use: own a private pool for the lifetime of the scraper
+            self.pool = await self._stack.enter_async_context(BrowserPool())
+        self.pages = await self._stack.enter_async_context(self.pool.store_pages())
+        self.page = self.pages[0]
         return self
 
     async def __aexit__(self, exc_type, exc_val, exc_tb):
-        if self.browser:
-            await self.browser.close()
+        if self._stack:
+            await self._stack.aclose()
+            self._stack = None
 
-    async def wait_for_content(self, timeout: int = 10000):
-        """Wait for main content to load."""
+    async def wait_for_content(self, page: Page, timeout: int = 10000):
+        """Wait for network idle, then for the product tile count to settle."""
         try:
-            await self.page.wait_for_load_state("networkidle", timeout=timeout)
+            await page.wait_for_load_state("networkidle", timeout=timeout)
         except PlaywrightTimeout:
             logger.warning("Timeout waiting for network idle, continuing...")
 
-    async def scroll_to_load_all(self, max_scrolls: int = 20):
-        """Scroll down to load lazy-loaded content."""
+        if self.PRODUCT_SELECTOR:
+            try:
+                await page.wait_for_function(
+                    STABLE_COUNT_JS, arg=[self.PRODUCT_SELECTOR, 500], polling=100, timeout=timeout
+                )
+            except PlaywrightTimeout:
+                logger.debug(f"Product count did not settle on {page.url}, continuing...")
+
+    async def scroll_to_load_all(self, page: Page, max_scrolls: int = 20, timeout: int = 2000):
+        """Scroll down until the page stops growing."""
         for _ in range(max_scrolls):
-            prev_height = await self.page.evaluate("document.body.scrollHeight")
-            await self.page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
-            await asyncio.sleep(0.5)
-            new_height = await self.page.evaluate("document.body.scrollHeight")
-            if new_height == prev_height:
+            prev_height = await page.evaluate("document.body.scrollHeight")
+            await page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
+            try:
+                await page.wait_for_function(
+                    "height => document.body.scrollHeight > height", arg=prev_height, polling=100, timeout=timeout
+                )
+            except PlaywrightTimeout:
                 break
 
+    @abstractmethod
+    async def scrape_category(self, category: CategoryConfig, page: Page) -> list[ScrapedProduct]:
+        """Scrape one category on a pooled page. Override in subclass."""
+        pass
+
+    async def scrape_all_categories(self) -> dict[str, list[ScrapedProduct]]:
+        """Scrape every category, one worker per pooled page."""
+        pending = asyncio.Queue()
+        for category in self.CATEGORIES:
+            pending.put_nowait(category)
+        results = {}
+
+        async def worker(page: Page):
+            while True:
+                try:
+                    category = pending.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                products = await self.scrape_category(category, page)
+                results[category.name] = products
+                logger.info(f"Scraped {len(products)} products from {self.STORE_SLUG} {category.name}")
+
+        await asyncio.gather(*(worker(page) for page in self.pages))
+
+        # Keep the configured category order
+        return {category.name: results[category.name] for category in self.CATEGORIES if category.name in results}
+
 
 class WoolworthsScraper(PlaywrightScraper):
     """Scraper for Woolworths specials."""
 
     STORE_SLUG = "woolworths"
+    CATEGORIES = WOOLWORTHS_CATEGORIES
+    PRODUCT_SELECTOR = '[class*="product-tile"], [data-testid="product-tile"]'
 
     def _parse_price(self, price_text: str) -> Optional[Decimal]:
         """Parse price from text like '$3.70' or '$12.00 / 1KG'."""
@@ -318,36 +461,35 @@ class WoolworthsScraper(PlaywrightScraper):
                 return first_word
         return None
 
-    async def scrape_category(self, category: CategoryConfig) -> list[ScrapedProduct]:
+    async def scrape_category(self, category: CategoryConfig, page: Page) -> list[ScrapedProduct]:
         """Scrape all products from a category page."""
         products = []
 
         logger.info(f"Scraping Woolworths category: {category.name}")
 
         try:
-            await self.page.goto(category.url, timeout=30000)
-            await self.wait_for_content()
-            await asyncio.sleep(2)  # Extra wait for dynamic content
+            await page.goto(category.url, timeout=30000)
+            await self.wait_for_content(page)
 
             # Scroll to load all products
-            await self.scroll_to_load_all(max_scrolls=10)
+            await self.scroll_to_load_all(page, max_scrolls=10)
 
             # Get all product cards
-            product_cards = await self.page.query_selector_all('[class*="product-tile"]')
+            product_cards = await page.query_selector_all('[class*="product-tile"]')
 
             if not product_cards:
                 # Try alternative selector
-                product_cards = await self.page.query_selector_all('[data-testid="product-tile"]')
+                product_cards = await page.query_selector_all('[data-testid="product-tile"]')
 
             if not product_cards:
                 # Try getting products from the grid
-                product_cards = await self.page.query_selector_all('section[class*="product-grid"] > div')
+                product_cards = await page.query_selector_all('section[class*="product-grid"] > div')
 
             logger.info(f"Found {len(product_cards)} product cards")
 
             # If we can't find cards, use JavaScript to extract data
             if len(product_cards) == 0:
-                products = await self._scrape_via_javascript(category)
+                products = await self._scrape_via_javascript(category, page)
             else:
                 for card in product_cards:
                     try:
@@ -363,12 +505,12 @@ class WoolworthsScraper(PlaywrightScraper):
 
         return products
 
-    async def _scrape_via_javascript(self, category: CategoryConfig) -> list[ScrapedProduct]:
+    async def _scrape_via_javascript(self, category: CategoryConfig, page: Page) -> list[ScrapedProduct]:
         """Extract product data using JavaScript when DOM parsing fails."""
         products = []
 
         # Use page.evaluate to extract all product data
-        product_data = await self.page.evaluate("""
+        product_data = await page.evaluate("""
             () => {
                 const products = [];
 
@@ -538,25 +680,13 @@ class WoolworthsScraper(PlaywrightScraper):
             logger.warning(f"Error parsing product card: {e}")
             return None
 
-    async def scrape_all_categories(self) -> dict[str, list[ScrapedProduct]]:
-        """Scrape all Woolworths categories."""
-        results = {}
-
-        for category in WOOLWORTHS_CATEGORIES:
-            products = await self.scrape_category(category)
-            results[category.name] = products
-            logger.info(f"Scraped {len(products)} products from {category.name}")
-
-            # Small delay between categories to be polite
-            await asyncio.sleep(2)
-
-        return results
-
 
 class ColesScraper(PlaywrightScraper):
     """Scraper for Coles specials."""
 
     STORE_SLUG = "coles"
+    CATEGORIES = COLES_CATEGORIES
+    PRODUCT_SELECTOR = '[data-testid="product-tile"], .product-tile, [class*="ProductTile"]'
 
     def _parse_price(self, price_text: str) -> Optional[Decimal]:
         """Parse price from Coles format."""
@@ -570,22 +700,21 @@ class ColesScraper(PlaywrightScraper):
                 return None
         return None
 
-    async def scrape_category(self, category: CategoryConfig) -> list[ScrapedProduct]:
+    async def scrape_category(self, category: CategoryConfig, page: Page) -> list[ScrapedProduct]:
         """Scrape products from a Coles category page."""
         products = []
 
         logger.info(f"Scraping Coles category: {category.name}")
 
         try:
-            await self.page.goto(category.url, timeout=30000)
-            await self.wait_for_content()
-            await asyncio.sleep(3)
+            await page.goto(category.url, timeout=30000)
+            await self.wait_for_content(page)
 
             # Scroll to load all products
-            await self.scroll_to_load_all(max_scrolls=15)
+            await self.scroll_to_load_all(page, max_scrolls=15)
 
             # Extract via JavaScript
-            product_data = await self.page.evaluate("""
+            product_data = await page.evaluate("""
                 () => {
                     const products = [];
 
@@ -669,37 +798,26 @@ class ColesScraper(PlaywrightScraper):
 
         return products
 
-    async def scrape_all_categories(self) -> dict[str, list[ScrapedProduct]]:
-        """Scrape all Coles categories."""
-        results = {}
-
-        for category in COLES_CATEGORIES:
-            products = await self.scrape_category(category)
-            results[category.name] = products
-            logger.info(f"Scraped {len(products)} products from {category.name}")
-            await asyncio.sleep(2)
-
-        return results
-
 
 class ALDIScraper(PlaywrightScraper):
     """Scraper for ALDI specials."""
 
     STORE_SLUG = "aldi"
+    CATEGORIES = ALDI_CATEGORIES
+    PRODUCT_SELECTOR = '.box--product, [class*="product-box"], .product'
 
-    async def scrape_category(self, category: CategoryConfig) -> list[ScrapedProduct]:
+    async def scrape_category(self, category: CategoryConfig, page: Page) -> list[ScrapedProduct]:
         """Scrape products from an ALDI page."""
         products = []
 
         logger.info(f"Scraping ALDI: {category.name}")
 
         try:
-            await self.page.goto(category.url, timeout=30000)
-            await self.wait_for_content()
-            await asyncio.sleep(3)
+            await page.goto(category.url, timeout=30000)
+            await self.wait_for_content(page)
 
             # ALDI uses a different structure
-            product_data = await self.page.evaluate("""
+            product_data = await page.evaluate("""
                 () => {
                     const products = [];
 
@@ -757,23 +875,11 @@ class ALDIScraper(PlaywrightScraper):
 
         return products
 
-    async def scrape_all_categories(self) -> dict[str, list[ScrapedProduct]]:
-        """Scrape all ALDI categories."""
-        results = {}
-
-        for category in ALDI_CATEGORIES:
-            products = await self.scrape_category(category)
-            results[category.name] = products
-            logger.info(f"Scraped {len(products)} products from ALDI {category.name}")
-            await asyncio.sleep(2)
-
-        return results
-
 
 # ============== DATABASE SAVE FUNCTIONS ==============
 
 def save_products_to_db(products: list[ScrapedProduct], store_slug: str) -> dict:
-    """Save scraped products to the database."""
+    """Save scraped products to the database via the bulk ingestion stage."""
     db = SessionLocal()
 
     try:
@@ -783,80 +889,15 @@ def save_products_to_db(products: list[ScrapedProduct], store_slug: str) -> dict
             logger.error(f"Store not found: {store_slug}")
             return {"error": f"Store not found: {store_slug}"}
 
-        # Get or create categories
-        category_map = {}
-        for cat in db.query(Category).all():
-            category_map[cat.slug] = cat.id
-            category_map[cat.name.lower()] = cat.id
-
-        saved = 0
-        updated = 0
-        errors = 0
-
-        # Set validity dates
-        valid_from = date.today()
-        valid_to = valid_from + timedelta(days=7)  # Specials typically valid for a week
-
-        for product in products:
-            try:
-                # Find category
-                category_id = None
-                if product.category_name:
-                    cat_lower = product.category_name.lower()
-                    # Try exact match first
-                    for key, cat_id in category_map.items():
-                        if cat_lower in key or key in cat_lower:
-                            category_id = cat_id
-                            break
-
-                # Check if special already exists (by name and store)
-                existing = db.query(Special).filter(
-                    Special.store_id == store.id,
-                    Special.name == product.name
-                ).first()
-
-                if existing:
-                    # Update existing
-                    existing.price = product.price
-                    existing.was_price = product.was_price
-                    existing.discount_percent = product.discount_percent
-                    existing.image_url = product.image_url
-                    existing.product_url = product.product_url
-                    existing.valid_from = valid_from
-                    existing.valid_to = valid_to
-                    updated += 1
-                else:
-                    # Create new special
-                    special = Special(
-                        store_id=store.id,
-                        category_id=category_id,
-                        name=product.name,
-                        brand=product.brand,
-                        size=product.size,
-                        price=product.price,
-                        was_price=product.was_price,
-                        discount_percent=product.discount_percent,
-                        unit_price=product.unit_price,
-                        image_url=product.image_url,
-                        product_url=product.product_url,
-                        valid_from=valid_from,
-                        valid_to=valid_to,
-                        source="playwright"
-                    )
-                    db.add(special)
-                    saved += 1
-
-            except Exception as e:
-                logger.error(f"Error saving product {product.name}: {e}")
-                errors += 1
-
+        result = ingest_specials(db, store, [asdict(product) for product in products])
         db.commit()
+        invalidate_store_sync(store_slug)
 
         return {
             "store": store_slug,
-            "saved": saved,
-            "updated": updated,
-            "errors": errors,
+            "saved": result.inserted,
+            "updated": result.updated,
+            "errors": result.skipped,
             "total": len(products)
         }
 
@@ -871,17 +912,17 @@ def save_products_to_db(products: list[ScrapedProduct], store_slug: str) -> dict
 
 # ============== MAIN SCRAPING FUNCTIONS ==============
 
-async def scrape_woolworths() -> dict:
-    """Scrape all Woolworths specials."""
-    async with WoolworthsScraper() as scraper:
+async def _scrape_store(scraper_class: type[PlaywrightScraper], pool: Optional[BrowserPool] = None) -> dict:
+    """Scrape every category for one store and save the results."""
+    async with scraper_class(pool) as scraper:
         results = await scraper.scrape_all_categories()
 
-    # Save to database
     all_products = []
     for category_name, products in results.items():
         all_products.extend(products)
 
-    save_result = save_products_to_db(all_products, "woolworths")
+    # Save off the event loop so other stores keep scraping
+    save_result = await asyncio.to_thread(save_products_to_db, all_products, scraper_class.STORE_SLUG)
 
     return {
         "categories_scraped": len(results),
@@ -890,55 +931,42 @@ async def scrape_woolworths() -> dict:
     }
 
 
-async def scrape_coles() -> dict:
-    """Scrape all Coles specials."""
-    async with ColesScraper() as scraper:
-        results = await scraper.scrape_all_categories()
-
-    all_products = []
-    for category_name, products in results.items():
-        all_products.extend(products)
+async def scrape_woolworths(pool: Optional[BrowserPool] = None) -> dict:
+    """Scrape all Woolworths specials."""
+    return await _scrape_store(WoolworthsScraper, pool)
 
-    save_result = save_products_to_db(all_products, "coles")
 
-    return {
-        "categories_scraped": len(results),
-        "total_products": len(all_products),
-        "db_result": save_result
-    }
+async def scrape_coles(pool: Optional[BrowserPool] = None) -> dict:
+    """Scrape all Coles specials."""
+    return await _scrape_store(ColesScraper, pool)
 
 
-async def scrape_aldi() -> dict:
+async def scrape_aldi(pool: Optional[BrowserPool] = None) -> dict:
     """Scrape all ALDI specials."""
-    async with ALDIScraper() as scraper:
-        results = await scraper.scrape_all_categories()
-
-    all_products = []
-    for category_name, products in results.items():
-        all_products.extend(products)
+    return await _scrape_store(ALDIScraper, pool)
 
-    save_result = save_products_to_db(all_products, "aldi")
 
-    return {
-        "categories_scraped": len(results),
-        "total_products": len(all_products),
-        "db_result": save_result
+async def scrape_all_stores() -> dict:
+    """Scrape specials from all stores in parallel on one shared browser."""
+    stores = {
+        "woolworths": scrape_woolworths,
+        "coles": scrape_coles,
+        "aldi": scrape_aldi,
     }
 
+    async with BrowserPool() as pool:
+        logger.info(f"Starting {', '.join(stores)} scrapes ({pool.pages_per_store} pages each)...")
+        outcomes = await asyncio.gather(
+            *(scrape(pool) for scrape in stores.values()), return_exceptions=True
+        )
 
-async def scrape_all_stores() -> dict:
-    """Scrape specials from all stores."""
     results = {}
-
-    logger.info("Starting Woolworths scrape...")
-    results["woolworths"] = await scrape_woolworths()
-
-    logger.info("Starting Coles scrape...")
-    results["coles"] = await scrape_coles()
-
-    logger.info("Starting ALDI scrape...")
-    results["aldi"] = await scrape_aldi()
-
+    for store_slug, outcome in zip(stores, outcomes):
+        if isinstance(outcome, Exception):
+            logger.error(f"Error scraping {store_slug}: {outcome}")
+            results[store_slug] = {"error": str(outcome)}
+        else:
+            results[store_slug] = outcome
     return results
 
 
@@ -0,0 +1,233 @@
+"""
+Price Rollups
+
+Maintains two read models of the prices table, so the history endpoints
+don't load a product's whole price history per request:
+- latest_prices (LatestPrice): the most recent price per product and store
+- price_rollups (PriceRollup): per product, store and day / week / month,
+  the min, max, sum and count of prices, how many were specials, and the
+  closing (last recorded) price
+
+Both are updated from the prices each flush writes (a Session after_flush
+listener, registered when app.models is imported), in the same transaction
+as the prices themselves. New prices are merged in with upserts that keep
+whichever latest/closing price is newer and widen the aggregates, so a
+flush costs a few statements no matter how long the products' histories
+are. Prices edited or deleted through the ORM
+make their product/store be recomputed from its rows.
+
+Bulk Core deletes bypass the listener; clear the read models alongside them.
+backfill_price_rollups() (startup) folds in prices written before the
+listener existed: store products with prices past the newest folded price
+id are recomputed.
+"""
+import logging
+from datetime import date, timedelta
+from decimal import Decimal
+
+from sqlalchemy import and_, case, delete, event, func, or_, select, tuple_
+from sqlalchemy.orm import Session
+
+from app.database import SessionLocal
+from app.models import LatestPrice, Price, PriceRollup, StoreProduct
+
+logger = logging.getLogger(__name__)
+
+PERIODS = ("day", "week", "month")
+PERIOD_DAYS = {"day": 1, "week": 7, "month": 30}
+CHART_MAX_POINTS = 60  # Per store; longer ranges use a coarser period
+UPSERT_CHUNK_SIZE = 1000
+BACKFILL_CHUNK_SIZE = 5000
+
+LATEST_FIELDS = ("store_product_id", "price_id", "price", "unit_price", "was_price", "is_special", "recorded_at")
+CLOSE_FIELDS = ("close_price", "close_special", "close_at", "close_price_id")
+
+
+def period_start(period: str, day: date) -> date:
+    """First day of the period containing `day` (weeks start on Monday)."""
+    if period == "week":
+        return day - timedelta(days=day.weekday())
+    if period == "month":
+        return day.replace(day=1)
+    return day
+
+
+def chart_period(days: int) -> str:
+    """Finest period that keeps a `days`-long chart within CHART_MAX_POINTS per store."""
+    for period in PERIODS:
+        if days <= CHART_MAX_POINTS * PERIOD_DAYS[period]:
+            return period
+    return PERIODS[-1]
+
+
+def _chunks(items: list, size: int = UPSERT_CHUNK_SIZE):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def _dialect_insert(db: Session):
+    """The dialect's insert(), which supports ON CONFLICT."""
+    if db.get_bind().dialect.name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    else:
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    return dialect_insert
+
+
+# ============== Merging prices ==============
+
+def _price_rows(db: Session, condition) -> list:
+    """Prices matching `condition` with their product and store, oldest first."""
+    return db.execute(
+        select(
+            Price.id, Price.price, Price.unit_price, Price.was_price, Price.is_special, Price.recorded_at,
+            Price.store_product_id, StoreProduct.product_id, StoreProduct.store_id,
+        )
+        .join(StoreProduct, Price.store_product_id == StoreProduct.id)
+        .where(condition, Price.recorded_at.isnot(None))
+        .order_by(Price.recorded_at, Price.id)
+    ).all()
+
+
+def _merge(db: Session, rows: list):
+    """Fold price rows (oldest first) into latest_prices and price_rollups."""
+    if not rows:
+        return
+
+    latest: dict[tuple, dict] = {}
+    rollups: dict[tuple, dict] = {}
+    for row in rows:
+        # Later rows win: rows are ordered by (recorded_at, id)
+        latest[(row.product_id, row.store_id)] = {
+            "product_id": row.product_id,
+            "store_id": row.store_id,
+            "store_product_id": row.store_product_id,
+            "price_id": row.id,
+            "price": row.price,
+            "unit_price": row.unit_price,
+            "was_price": row.was_price,
+            "is_special": bool(row.is_special),
+            "recorded_at": row.recorded_at,
+        }
+        for period in PERIODS:
+            start = period_start(period, row.recorded_at.date())
+            rollup = rollups.get((row.product_id, row.store_id, period, start))
+            if rollup is None:
+                rollup = rollups[(row.product_id, row.store_id, period, start)] = {
+                    "product_id": row.product_id,
+                    "store_id": row.store_id,
+                    "period": period,
+                    "period_start": start,
+                    "min_price": row.price,
+                    "max_price": row.price,
+                    "price_sum": Decimal(0),
+                    "price_count": 0,
+                    "special_count": 0,
+                }
+            rollup["min_price"] = min(rollup["min_price"], row.price)
+            rollup["max_price"] = max(rollup["max_price"], row.price)
+            rollup["price_sum"] += row.price
+            rollup["price_count"] += 1
+            rollup["special_count"] += 1 if row.is_special else 0
+            rollup["close_price"] = row.price
+            rollup["close_special"] = bool(row.is_special)
+            rollup["close_at"] = row.recorded_at
+            rollup["close_price_id"] = row.id
+
+    dialect_insert = _dialect_insert(db)
+
+    table = LatestPrice.__table__
+    stmt = dialect_insert(table)
+    newer = or_(
+        stmt.excluded.recorded_at > table.c.recorded_at,
+        and_(stmt.excluded.recorded_at == table.c.recorded_at, stmt.excluded.price_id > table.c.price_id),
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["product_id", "store_id"],
+        set_={name: stmt.excluded[name] for name in LATEST_FIELDS},
+        where=newer,
+    )
+    for chunk in _chunks(list(latest.values())):
+        db.execute(stmt, chunk)
+
+    table = PriceRollup.__table__
+    stmt = dialect_insert(table)
+    excluded = stmt.excluded
+    newer = or_(
+        excluded.close_at > table.c.close_at,
+        and_(excluded.close_at == table.c.close_at, excluded.close_price_id > table.c.close_price_id),
+    )
+    set_ = {
+        "min_price": case((excluded.min_price < table.c.min_price, excluded.min_price), else_=table.c.min_price),
+        "max_price": case((excluded.max_price > table.c.max_price, excluded.max_price), else_=table.c.max_price),
+        "price_sum": table.c.price_sum + excluded.price_sum,
+        "price_count": table.c.price_count + excluded.price_count,
+        "special_count": table.c.special_count + excluded.special_count,
+    }
+    for name in CLOSE_FIELDS:
+        set_[name] = case((newer, excluded[name]), else_=table.c[name])
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["product_id", "store_id", "period", "period_start"], set_=set_
+    )
+    for chunk in _chunks(list(rollups.values())):
+        db.execute(stmt, chunk)
+
+
+def apply_new_prices(db: Session, price_ids: list[int]):
+    """Merge newly inserted prices into the read models (caller's transaction)."""
+    for chunk in _chunks(price_ids):
+        _merge(db, _price_rows(db, Price.id.in_(chunk)))
+
+
+def recompute_store_products(db: Session, store_product_ids: list[int]):
+    """Rebuild the read models of these store products from all their prices."""
+    for chunk in _chunks(store_product_ids):
+        keys = db.execute(
+            select(StoreProduct.product_id, StoreProduct.store_id).where(StoreProduct.id.in_(chunk))
+        ).all()
+        if not keys:
+            continue
+        db.execute(delete(LatestPrice).where(tuple_(LatestPrice.product_id, LatestPrice.store_id).in_(keys)))
+        db.execute(delete(PriceRollup).where(tuple_(PriceRollup.product_id, PriceRollup.store_id).in_(keys)))
+        _merge(db, _price_rows(db, Price.store_product_id.in_(chunk)))
+
+
+def backfill_price_rollups():
+    """Recompute store products with prices newer than any folded in (startup)."""
+    db = SessionLocal()
+    try:
+        folded = db.scalar(select(func.max(LatestPrice.price_id))) or 0
+        store_product_ids = db.scalars(
+            select(Price.store_product_id).where(Price.id > folded).distinct()
+        ).all()
+        if not store_product_ids:
+            return
+        for chunk in _chunks(store_product_ids, BACKFILL_CHUNK_SIZE):
+            recompute_store_products(db, chunk)
+        db.commit()
+        logger.info(f"Backfilled price rollups for {len(store_product_ids)} store products")
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Failed to backfill price rollups: {e}")
+    finally:
+        db.close()
+
+
+# ============== Change events ==============
+
+@event.listens_for(Session, "after_flush")
+def _roll_up_flushed_prices(session, flush_context):
+    changed = {
+        obj.store_product_id
+        for obj in (*session.dirty, *session.deleted)
+        if isinstance(obj, Price) and obj.store_product_id is not None
+        and (obj in session.deleted or session.is_modified(obj, include_collections=False))
+    }
+    new_ids = [
+        obj.id for obj in session.new
+        if isinstance(obj, Price) and obj.store_product_id not in changed
+    ]
+    if changed:
+        recompute_store_products(session, list(changed))
+    if new_ids:
+        apply_new_prices(session, new_ids)
@@ -0,0 +1,177 @@
+"""
+Product Equivalence Index
+
+Precomputes, for every current special, what the cross-store "similar type"
+comparison used to work out pairwise per request: the words of its brandless
+product type as postings in current_special_type_words, one row per word
+form, keyed with the special's category and size.
+
+Each word is posted as written, plural-normalized and without a trailing
+"s" ("apples" -> apples, appl, apple), filler words included, because
+is_similar_type also matches one type contained in the other and
+normalizes plurals over the whole string. Two types it accepts therefore
+always share a posting, except where one is a substring inside a word of
+the other ("milk" in "buttermilk"). Candidates are still confirmed with
+is_similar_type; the index only narrows the search.
+
+Rows are written by current_specials.refresh_current_specials, per store,
+in the same transaction as the projection, so each scrape re-indexes just
+the store it touched.
+"""
+import re
+from typing import Optional
+
+from sqlalchemy import select
+from sqlalchemy.sql import Select
+
+from app.models import CurrentSpecialTypeWord
+
+WORD_MAX_LENGTH = 100  # current_special_type_words.word
+
+# Words that don't tell product types apart
+FILLER_WORDS = frozenset({
+    'the', 'a', 'an', 'and', 'or', 'of', 'with', 'in', 'on',
+    'fresh', 'australian', 'coles', 'woolworths', 'aldi', 'iga',
+})
+
+_SIZE_SUFFIX = re.compile(r'\s*\d+\s*(g|kg|ml|l|pk|pack|each)\s*$', re.IGNORECASE)
+
+
+# ============== Product types ==============
+
+def normalize_plural(s: str) -> str:
+    """Strip common plural endings ("mangoes" -> "mango", "cherries" -> "cherry")."""
+    if s.endswith('oes'):  # mangoes -> mango, tomatoes -> tomato
+        return s[:-2]
+    if s.endswith('ies'):  # cherries -> cherry
+        return s[:-3] + 'y'
+    if s.endswith('es'):   # peaches -> peach
+        return s[:-2]
+    if s.endswith('s'):    # apples -> apple
+        return s[:-1]
+    return s
+
+
+def extract_special_type(name: str, brand: Optional[str]) -> str:
+    """Extract the product type from a special name (removing brand)."""
+    product_type = name
+
+    if brand:
+        # Remove brand from the beginning of the name
+        brand_pattern = re.compile(re.escape(brand), re.IGNORECASE)
+        product_type = brand_pattern.sub("", product_type).strip()
+
+        # If removing brand leaves empty string, use original name
+        if not product_type:
+            product_type = name
+
+    # Remove size info from the end (e.g., "180g", "2L", "500ml")
+    product_type = _SIZE_SUFFIX.sub('', product_type)
+
+    # Clean up extra whitespace and punctuation
+    product_type = re.sub(r'\s+', ' ', product_type).strip()
+    product_type = product_type.strip('| -')
+
+    return product_type
+
+
+def is_similar_type(type1: str, type2: str) -> bool:
+    """Check if two product types are similar enough to compare."""
+    t1 = type1.lower().strip()
+    t2 = type2.lower().strip()
+
+    # Skip empty types
+    if not t1 or not t2:
+        return False
+
+    # Exact match
+    if t1 == t2:
+        return True
+
+    t1_norm = normalize_plural(t1)
+    t2_norm = normalize_plural(t2)
+
+    # Check normalized exact match
+    if t1_norm == t2_norm:
+        return True
+
+    # Containment check - but only for meaningful lengths (>3 chars)
+    # This prevents "s" or "es" from matching everything
+    if len(t1) > 3 and len(t2) > 3:
+        if t1 in t2 or t2 in t1:
+            return True
+        if t1_norm in t2_norm or t2_norm in t1_norm:
+            return True
+
+    # Word overlap check, ignoring filler words
+    words1 = set(t1.split()) - FILLER_WORDS
+    words2 = set(t2.split()) - FILLER_WORDS
+
+    if not words1 or not words2:
+        return False
+
+    words1_norm = {normalize_plural(w) for w in words1}
+    words2_norm = {normalize_plural(w) for w in words2}
+
+    # Check for overlap in normalized words
+    overlap = len(words1_norm & words2_norm)
+
+    # For produce (typically 1-2 significant words), require actual word match
+    min_words = min(len(words1_norm), len(words2_norm))
+
+    if min_words <= 2:
+        # Must have at least 1 word in common
+        return overlap >= 1
+    else:
+        # For longer product names, 50% overlap is ok
+        return overlap >= min_words / 2
+
+
+# ============== Index rows and probes ==============
+
+def _word_forms(word: str) -> set[str]:
+    forms = {word, normalize_plural(word)}
+    if word.endswith('s'):
+        forms.add(word[:-1])
+    return forms
+
+
+def posting_words(product_type: str) -> list[str]:
+    """Word forms a product type is posted (and probed) under."""
+    return sorted({
+        form[:WORD_MAX_LENGTH]
+        for word in product_type.lower().split()
+        for form in _word_forms(word)
+        if form
+    })
+
+
+def type_word_rows(special_id: int, store_id: int, category_id: Optional[int], size: Optional[str], product_type: str) -> list[dict]:
+    """current_special_type_words rows for one special."""
+    return [
+        {
+            "word": word,
+            "special_id": special_id,
+            "store_id": store_id,
+            "category_id": category_id,
+            "size": size,
+        }
+        for word in posting_words(product_type)
+    ]
+
+
+def similar_type_candidates(product_type: str, category_id: Optional[int], size: Optional[str]) -> Select:
+    """
+    Ids of current specials sharing a type word with this product type,
+    restricted to its category and size where those are known.
+    """
+    query = (
+        select(CurrentSpecialTypeWord.special_id)
+        .where(CurrentSpecialTypeWord.word.in_(posting_words(product_type)))
+        .distinct()
+    )
+    if category_id:
+        query = query.where(CurrentSpecialTypeWord.category_id == category_id)
+    if size:
+        query = query.where(CurrentSpecialTypeWord.size == size)
+    return query
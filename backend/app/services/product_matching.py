@@ -7,9 +7,10 @@ This enables comparing all brands of the same product type (e.g., "Full Cream Mi
 import re
 from typing import Optional
 from sqlalchemy.orm import Session
-from sqlalchemy import func, or_
+from sqlalchemy import func
 
 from app.models import Product
+from app.services.search_index import search_condition, search_rank
 
 
 def extract_product_type(name: str, brand: Optional[str]) -> str:
@@ -178,17 +179,16 @@ def get_product_type_suggestions(
     if not search_query or len(search_query) < 2:
         return []
 
-    # Search products by name or brand
-    query = db.query(Product).filter(
-        or_(
-            Product.name.ilike(f"%{search_query}%"),
-            Product.brand.ilike(f"%{search_query}%")
-        )
-    )
+    # Search products by name or brand, best matches first
+    query = db.query(Product).filter(search_condition(Product, search_query))
 
     if category_id:
         query = query.filter(Product.category_id == category_id)
 
+    rank = search_rank(Product, search_query)
+    if rank is not None:
+        query = query.order_by(rank.desc())
+
     products = query.limit(200).all()
 
     # Group by product type + size
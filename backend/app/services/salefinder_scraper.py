@@ -5,20 +5,23 @@ Uses the SaleFinder embed API to fetch catalogue data from Australian supermarke
 import re
 import json
 import logging
-from datetime import date, datetime, timedelta
-from decimal import Decimal
+from datetime import datetime
 from typing import Optional
-import time
 
 import httpx
 from bs4 import BeautifulSoup
 from sqlalchemy.orm import Session
 
 from app.database import SessionLocal
-from app.models import Store, Special, ScrapeLog, MasterProduct, ProductPrice, Category
+from app.models import Store, ScrapeLog, MasterProduct, ProductPrice
 from app.config import get_settings
-from app.services.auto_categorizer import categorize_product
-from app.services.brand_extractor import extract_brand_from_name, extract_size_from_name
+from app.services.cache import invalidate_store_sync
+from app.services.special_ingest import ingest_specials
+from app.services.scrape_orchestrator import (
+    TokenBucket,
+    collect_salefinder_products,
+    run_concurrent_salefinder_scrape,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -27,6 +30,10 @@ class SaleFinderScraper:
     """Scraper service for extracting weekly specials from SaleFinder."""
 
     BASE_URL = "https://embed.salefinder.com.au"
+    SITE_URL = "https://salefinder.com.au"
+
+    # Shared across instances so parallel callers stay polite (~2 requests/sec)
+    rate_limiter = TokenBucket(rate=2.0)
     WEBSERVICE_URL = "https://webservice.salefinder.com.au"
 
     # Store configuration from SaleFinder
@@ -87,23 +94,46 @@ class SaleFinderScraper:
             logger.error(f"Failed to parse response: {e}")
             return {}
 
-    def discover_catalogues(self, store_slug: str) -> list[dict]:
-        """Discover available catalogues for a store."""
+    def _catalogue_index_url(self, store_slug: str) -> Optional[str]:
+        """URL of the SaleFinder page listing a store's current catalogues."""
         config = self.STORE_CONFIG.get(store_slug)
         if not config:
-            logger.error(f"Store not configured: {store_slug}")
-            return []
+            return None
+        salefinder_url = config.get("salefinder_url", f"{store_slug}-catalogue")
+        return f"{self.SITE_URL}/{salefinder_url}"
 
-        catalogues = []
+    def _list_page_url(self, catalogue_path: str, page: int) -> str:
+        """URL of one page of a catalogue's product list."""
+        base_url = f"{self.SITE_URL}/{catalogue_path}/list"
+        if page == 1:
+            return base_url
+        return f"{base_url}?qs={page},,,,"
 
-        # Use the salefinder_url from config
-        salefinder_url = config.get("salefinder_url", f"{store_slug}-catalogue")
+    def discover_catalogues(self, store_slug: str) -> list[dict]:
+        """Discover available catalogues for a store."""
+        url = self._catalogue_index_url(store_slug)
+        if not url:
+            logger.error(f"Store not configured: {store_slug}")
+            return []
 
+        html = ""
         try:
-            url = f"https://salefinder.com.au/{salefinder_url}"
             response = self.client.get(url)
             if response.status_code == 200:
-                soup = BeautifulSoup(response.text, 'lxml')
+                html = response.text
+        except Exception as e:
+            logger.error(f"Failed to discover {store_slug} catalogues: {e}")
+
+        return self._parse_catalogues(store_slug, html)
+
+    def _parse_catalogues(self, store_slug: str, html: str) -> list[dict]:
+        """Parse catalogue links from a store's SaleFinder catalogue page."""
+        catalogues = []
+        salefinder_url = self.STORE_CONFIG[store_slug].get("salefinder_url", f"{store_slug}-catalogue")
+
+        try:
+            if html:
+                soup = BeautifulSoup(html, 'lxml')
 
                 # Look for catalogue links with pattern /{store}-catalogue/.../XXXXX/
                 pattern = rf'/{re.escape(salefinder_url)}/[^/]+/(\d+)/'
@@ -182,30 +212,38 @@ class SaleFinderScraper:
 
         return []
 
-    def get_products(self, catalogue_path: str, catalogue_id: int = None, max_pages: int = 50) -> list[dict]:
+    def get_products(
+        self,
+        catalogue_path: str,
+        catalogue_id: int = None,
+        max_pages: int = 50,
+        concurrent: bool = False,
+    ) -> list[dict]:
         """Get products from a catalogue by scraping the SaleFinder list page with pagination.
 
         Args:
             catalogue_path: Full path like "coles-catalogue/coles-catalogue-nsw-metro/63026"
             catalogue_id: Optional catalogue ID (for backwards compatibility)
             max_pages: Maximum number of pages to fetch (default 50, roughly 600 products)
+            concurrent: Detect the page count from page 1, then fetch the
+                remaining pages in parallel (products come back in page
+                completion order)
         """
+        if concurrent:
+            return collect_salefinder_products(catalogue_path, max_pages)
+
         all_products = []
 
         try:
             # Start with page 1
-            base_url = f"https://salefinder.com.au/{catalogue_path}/list"
             current_page = 1
             total_pages = 1
 
             while current_page <= min(total_pages, max_pages):
-                # Build URL with pagination
-                if current_page == 1:
-                    url = base_url
-                else:
-                    url = f"{base_url}?qs={current_page},,,,"
+                url = self._list_page_url(catalogue_path, current_page)
 
                 logger.debug(f"Fetching page {current_page}: {url}")
+                self.rate_limiter.acquire()
                 response = self.client.get(url)
 
                 if response.status_code != 200:
@@ -229,10 +267,6 @@ class SaleFinderScraper:
                 logger.debug(f"Found {len(page_products)} products on page {current_page}")
                 current_page += 1
 
-                # Rate limiting - be respectful
-                if current_page <= total_pages:
-                    time.sleep(0.5)
-
             logger.info(f"Total products collected: {len(all_products)} from {current_page - 1} pages")
 
         except Exception as e:
@@ -594,9 +628,6 @@ class SaleFinderScraper:
 
                 logger.info(f"Found {len(products)} products in catalogue {catalogue_id}")
 
-                # Rate limiting
-                time.sleep(1)
-
             # Save products to database
             saved_count = self._save_specials(db, store, all_products)
 
@@ -605,6 +636,7 @@ class SaleFinderScraper:
             scrape_log.items_found = saved_count
             scrape_log.status = "success"
             db.commit()
+            invalidate_store_sync(store_slug)
 
             logger.info(f"Saved {saved_count} specials for {store_slug} from SaleFinder")
             return saved_count
@@ -622,134 +654,39 @@ class SaleFinderScraper:
                 db.close()
 
     def scrape_all_stores(self, db: Optional[Session] = None) -> dict:
-        """Scrape specials from all configured stores."""
-        close_db = False
+        """
+        Scrape specials from all configured stores.
+
+        Without a session the stores are scraped in parallel by the
+        ScrapeOrchestrator (one session per store). A caller-supplied
+        session can't be shared across concurrent scrapes, so in that case
+        stores are processed one after another.
+        """
         if db is None:
-            db = SessionLocal()
-            close_db = True
+            return run_concurrent_salefinder_scrape(list(self.STORE_CONFIG))
 
         results = {}
-        try:
-            for store_slug in self.STORE_CONFIG.keys():
-                try:
-                    count = self.scrape_store(store_slug, db)
-                    results[store_slug] = {"status": "success", "items": count}
-                except Exception as e:
-                    logger.error(f"Failed to scrape {store_slug}: {e}")
-                    results[store_slug] = {"status": "failed", "error": str(e)}
-        finally:
-            if close_db:
-                db.close()
+        for store_slug in self.STORE_CONFIG.keys():
+            try:
+                count = self.scrape_store(store_slug, db)
+                results[store_slug] = {"status": "success", "items": count}
+            except Exception as e:
+                logger.error(f"Failed to scrape {store_slug}: {e}")
+                results[store_slug] = {"status": "failed", "error": str(e)}
 
         return results
 
     def _save_specials(self, db: Session, store: Store, specials: list[dict]) -> int:
-        """Save scraped specials to database (both old and new schema)."""
-        today = date.today()
-        valid_to = today + timedelta(days=7)
-
-        saved_count = 0
-        seen_product_ids = set()
-
-        # Build category slug -> id mapping
-        category_map = {}
-        all_categories = db.query(Category).all()
-        for cat in all_categories:
-            category_map[cat.slug] = cat.id
-
-        for item in specials:
-            try:
-                # Skip if missing required fields
-                if not item.get("name") or not item.get("price"):
-                    continue
-
-                # Calculate discount percentage
-                discount_percent = None
-                if item.get("was_price") and item.get("price"):
-                    was_price = float(item["was_price"])
-                    price = float(item["price"])
-                    if was_price > price and was_price > 0:
-                        discount_percent = int(((was_price - price) / was_price) * 100)
-
-                # Skip duplicates
-                store_product_id = item.get("store_product_id")
-                if store_product_id and store_product_id in seen_product_ids:
-                    continue
-                if store_product_id:
-                    seen_product_ids.add(store_product_id)
-
-                # Extract brand and size
-                brand = extract_brand_from_name(item["name"])
-                size = extract_size_from_name(item["name"])
-
-                # Auto-categorize
-                category_slug = categorize_product(item["name"], brand)
-                category_id = category_map.get(category_slug) if category_slug else None
-
-                # Construct image URL if needed
-                image_url = item.get("image_url")
-                if not image_url and store_product_id:
-                    if store.slug == "woolworths":
-                        image_url = f"https://cdn0.woolworths.media/content/wowproductimages/large/{store_product_id}.jpg"
-                    elif store.slug == "coles":
-                        first_digit = store_product_id[0] if store_product_id else '0'
-                        image_url = f"https://productimages.coles.com.au/productimages/{first_digit}/{store_product_id}.jpg"
-
-                # Check for existing special
-                existing = None
-                if store_product_id:
-                    existing = db.query(Special).filter(
-                        Special.store_id == store.id,
-                        Special.store_product_id == store_product_id,
-                        Special.valid_from == today
-                    ).first()
-
-                if existing:
-                    # Update existing
-                    existing.price = Decimal(str(item["price"]))
-                    existing.was_price = Decimal(str(item["was_price"])) if item.get("was_price") else None
-                    existing.discount_percent = discount_percent
-                    existing.image_url = image_url or existing.image_url
-                    existing.scraped_at = datetime.utcnow()
-                    if not existing.category_id and category_id:
-                        existing.category_id = category_id
-                    if not existing.brand and brand:
-                        existing.brand = brand
-                    if not existing.size and size:
-                        existing.size = size
-                else:
-                    # Create new
-                    special = Special(
-                        store_id=store.id,
-                        name=item["name"],
-                        brand=brand,
-                        size=size,
-                        category_id=category_id,
-                        price=Decimal(str(item["price"])),
-                        was_price=Decimal(str(item["was_price"])) if item.get("was_price") else None,
-                        discount_percent=discount_percent,
-                        store_product_id=store_product_id,
-                        product_url=item.get("product_url"),
-                        image_url=image_url,
-                        valid_from=today,
-                        valid_to=valid_to,
-                    )
-                    db.add(special)
-
-                saved_count += 1
-
-            except Exception as e:
-                logger.warning(f"Failed to save special {item.get('name')}: {e}")
-                continue
-
+        """Save scraped specials to database via the bulk ingestion stage."""
         try:
+            result = ingest_specials(db, store, specials)
             db.commit()
         except Exception as e:
             logger.error(f"Failed to commit specials: {e}")
             db.rollback()
             raise
 
-        return saved_count
+        return result.saved
 
 
 # Convenience function for scheduled jobs
@@ -758,9 +695,9 @@ def run_salefinder_scrape():
     logger.info("Starting SaleFinder specials scrape...")
     scraper = SaleFinderScraper()
 
-    db = SessionLocal()
     try:
-        results = scraper.scrape_all_stores(db)
+        # Stores are scraped concurrently, each with its own session
+        results = scraper.scrape_all_stores()
 
         for store, result in results.items():
             if result["status"] == "success":
@@ -771,8 +708,6 @@ def run_salefinder_scrape():
     except Exception as e:
         logger.error(f"SaleFinder scrape failed: {e}")
         raise
-    finally:
-        db.close()
 
     logger.info("SaleFinder scrape completed")
     return results
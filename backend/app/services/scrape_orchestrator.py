@@ -0,0 +1,421 @@
+"""
+Concurrent multi-store scrape orchestrator.
+
+Scrapes every store at the same time instead of one after another, so a full
+weekly refresh takes roughly as long as the slowest store:
+
+- SaleFinder stores (Woolworths, Coles, IGA) are fetched with one shared
+  httpx.AsyncClient.
+- Firecrawl stores (Woolworths, Coles, ALDI) use the blocking Firecrawl SDK,
+  so each store runs in its own worker thread.
+- Politeness is enforced per host: a concurrency cap plus a token bucket
+  replace the fixed time.sleep() calls between pages.
+- A catalogue's page count is read from page 1 and the remaining pages are
+  fetched concurrently. HTML parsing runs in a thread pool so it never
+  blocks the event loop, and parsed pages stream into the bulk ingestion
+  stage in batches instead of building one large list. A store's batches
+  share one session and transaction: the projection and counts are rebuilt
+  and committed once the whole catalogue is written, so a failed scrape
+  leaves the previous week in place.
+
+The SaleFinder base URL and HTTP transport can be overridden, which lets the
+orchestrator run against a local fake server.
+"""
+import asyncio
+import logging
+import threading
+import time
+from concurrent.futures import Executor, ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from datetime import datetime
+from typing import Optional
+from urllib.parse import urlsplit
+
+import httpx
+from sqlalchemy.orm import Session
+
+from app.config import get_settings
+from app.database import SessionLocal
+from app.models import ScrapeLog, Store
+from app.services.cache import invalidate_store_sync
+from app.services.current_specials import refresh_current_specials
+from app.services.special_ingest import ingest_specials
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """
+    Token bucket rate limiter, usable from threads and from asyncio.
+
+    Each acquire reserves the next free slot under a lock and then sleeps
+    until that slot, so concurrent callers are spaced out fairly instead of
+    racing for tokens.
+    """
+
+    def __init__(self, rate: float, capacity: float = 1.0):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _reserve(self) -> float:
+        """Take one token and return how long to wait before using it."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+    def acquire(self):
+        """Block the current thread until a token is available."""
+        delay = self._reserve()
+        if delay:
+            time.sleep(delay)
+
+    async def acquire_async(self):
+        """Wait (without blocking the event loop) until a token is available."""
+        delay = self._reserve()
+        if delay:
+            await asyncio.sleep(delay)
+
+
+class HostLimiter:
+    """Per-host concurrency cap and request rate for async fetches."""
+
+    def __init__(self, max_concurrent: int = 4, requests_per_second: float = 2.0, burst: float = 2.0):
+        self.max_concurrent = max_concurrent
+        self.requests_per_second = requests_per_second
+        self.burst = burst
+        self._semaphores: dict[str, asyncio.Semaphore] = {}
+        self._buckets: dict[str, TokenBucket] = {}
+
+    @asynccontextmanager
+    async def limit(self, url: str):
+        host = urlsplit(url).netloc
+        if host not in self._semaphores:
+            self._semaphores[host] = asyncio.Semaphore(self.max_concurrent)
+            self._buckets[host] = TokenBucket(self.requests_per_second, self.burst)
+        async with self._semaphores[host]:
+            await self._buckets[host].acquire_async()
+            yield
+
+
+class ScrapeOrchestrator:
+    """Runs store scrapes concurrently with per-host politeness limits."""
+
+    # Products written per ingestion call while streaming a catalogue
+    save_batch_size = 500
+
+    def __init__(
+        self,
+        max_per_host: Optional[int] = None,
+        requests_per_second: Optional[float] = None,
+        parse_workers: int = 4,
+        salefinder_url: Optional[str] = None,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+        parse_executor: Optional[Executor] = None,
+    ):
+        from app.services.salefinder_scraper import SaleFinderScraper
+
+        settings = get_settings()
+        self.limiter = HostLimiter(
+            max_concurrent=max_per_host or settings.scrape_max_concurrent_per_host,
+            requests_per_second=requests_per_second or settings.scrape_requests_per_second,
+        )
+        self.salefinder = SaleFinderScraper()
+        if salefinder_url:
+            self.salefinder.SITE_URL = salefinder_url.rstrip("/")
+        self._transport = transport
+        self._parse_executor = parse_executor or ThreadPoolExecutor(
+            max_workers=parse_workers, thread_name_prefix="scrape-parse"
+        )
+        self._owns_executor = parse_executor is None
+
+    def close(self):
+        self.salefinder.client.close()
+        if self._owns_executor:
+            self._parse_executor.shutdown(wait=False)
+
+    def _client(self) -> httpx.AsyncClient:
+        return httpx.AsyncClient(
+            timeout=30.0,
+            follow_redirects=True,
+            headers=dict(self.salefinder.client.headers),
+            transport=self._transport,
+        )
+
+    async def fetch(self, client: httpx.AsyncClient, url: str) -> Optional[str]:
+        """GET a page within the host's limits. Returns None on non-200."""
+        async with self.limiter.limit(url):
+            response = await client.get(url)
+        if response.status_code != 200:
+            logger.warning(f"{url} returned {response.status_code}")
+            return None
+        return response.text
+
+    async def parse(self, func, *args):
+        """Run a CPU-bound parser off the event loop."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._parse_executor, func, *args)
+
+    # ============== Database steps (run in worker threads) ==============
+
+    @staticmethod
+    def _start_scrape_log(store_slug: str) -> int:
+        db = SessionLocal()
+        try:
+            store = db.query(Store).filter(Store.slug == store_slug).first()
+            if not store:
+                raise ValueError(f"Store not found in database: {store_slug}")
+            scrape_log = ScrapeLog(store_id=store.id, started_at=datetime.utcnow(), status="running")
+            db.add(scrape_log)
+            db.commit()
+            return scrape_log.id
+        finally:
+            db.close()
+
+    @staticmethod
+    def _finish_scrape_log(scrape_log_id: int, status: str, items: int = 0, error: Optional[str] = None):
+        db = SessionLocal()
+        try:
+            scrape_log = db.get(ScrapeLog, scrape_log_id)
+            scrape_log.completed_at = datetime.utcnow()
+            scrape_log.status = status
+            scrape_log.items_found = items
+            scrape_log.error_message = error
+            db.commit()
+        finally:
+            db.close()
+
+    @staticmethod
+    def _get_store(db: Session, store_slug: str) -> Store:
+        return db.query(Store).filter(Store.slug == store_slug).first()
+
+    @staticmethod
+    def _save_salefinder_products(db: Session, store: Store, products: list[dict]) -> int:
+        """Write one batch into the store's open transaction (no projection refresh, no commit)."""
+        return ingest_specials(db, store, products, refresh_projection=False).saved
+
+    @staticmethod
+    def _publish_salefinder_products(db: Session, store: Store):
+        """Rebuild the store's projection and counts, then commit the whole catalogue."""
+        try:
+            refresh_current_specials(db, store.id)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+
+    # ============== SaleFinder ==============
+
+    def _parse_first_page(self, html: str) -> tuple[list[dict], int]:
+        """Parse page 1 and detect the catalogue's page count in one executor hop."""
+        return (
+            self.salefinder._parse_salefinder_list(html),
+            self.salefinder._detect_total_pages(html),
+        )
+
+    async def iter_salefinder_pages(self, client: httpx.AsyncClient, catalogue_path: str, max_pages: int = 50):
+        """
+        Yield parsed products one list page at a time.
+
+        Page 1 is fetched first to learn the page count; the remaining pages
+        are then fetched concurrently by a small worker pool (bounded by the
+        host limiter) and yielded in completion order. The hand-off queue is
+        bounded, so fetching pauses when the consumer (the save stage) falls
+        behind and memory stays flat regardless of catalogue size.
+        """
+        scraper = self.salefinder
+        html = await self.fetch(client, scraper._list_page_url(catalogue_path, 1))
+        if html is None:
+            return
+
+        first_products, total_pages = await self.parse(self._parse_first_page, html)
+        logger.info(f"Detected {total_pages} pages for {catalogue_path}")
+        yield first_products
+        if not first_products:
+            return
+
+        remaining = list(range(2, min(total_pages, max_pages) + 1))
+        if not remaining:
+            return
+
+        pending = asyncio.Queue()
+        for page in remaining:
+            pending.put_nowait(page)
+        parsed = asyncio.Queue(maxsize=self.limiter.max_concurrent)
+
+        async def worker():
+            while True:
+                try:
+                    page = pending.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                products = []
+                try:
+                    page_html = await self.fetch(client, scraper._list_page_url(catalogue_path, page))
+                    if page_html is not None:
+                        products = await self.parse(scraper._parse_salefinder_list, page_html)
+                except Exception as e:
+                    logger.warning(f"Failed to fetch page {page} of {catalogue_path}: {e}")
+                await parsed.put(products)
+
+        workers = [
+            asyncio.create_task(worker())
+            for _ in range(min(self.limiter.max_concurrent, len(remaining)))
+        ]
+        try:
+            for _ in remaining:
+                yield await parsed.get()
+        finally:
+            for task in workers:
+                task.cancel()
+
+    async def get_salefinder_products(self, client: httpx.AsyncClient, catalogue_path: str, max_pages: int = 50) -> list[dict]:
+        """Collect every product from a catalogue (pages fetched concurrently)."""
+        all_products = []
+        async for page_products in self.iter_salefinder_pages(client, catalogue_path, max_pages):
+            all_products.extend(page_products)
+        logger.info(f"Total products collected: {len(all_products)} from {catalogue_path}")
+        return all_products
+
+    async def scrape_salefinder_store(self, client: httpx.AsyncClient, store_slug: str) -> int:
+        """Scrape one store's current SaleFinder catalogue and save it."""
+        scraper = self.salefinder
+        if store_slug not in scraper.STORE_CONFIG:
+            raise ValueError(f"Store not configured in SaleFinder: {store_slug}")
+
+        scrape_log_id = await asyncio.to_thread(self._start_scrape_log, store_slug)
+        try:
+            index_html = await self.fetch(client, scraper._catalogue_index_url(store_slug))
+            catalogues = await self.parse(scraper._parse_catalogues, store_slug, index_html or "")
+
+            # Stream parsed pages straight into the save stage in batches, all
+            # in one transaction that is only committed once the catalogue is in
+            saved_count = 0
+            batch = []
+            seen_names = set()
+            db = SessionLocal()
+            try:
+                store = await asyncio.to_thread(self._get_store, db, store_slug)
+                for catalogue in catalogues[:1]:  # Only process first (most recent) catalogue
+                    catalogue_path = catalogue.get("path")
+                    if not catalogue.get("id") or not catalogue_path:
+                        logger.warning(f"Catalogue missing id or path: {catalogue}")
+                        continue
+
+                    async for page_products in self.iter_salefinder_pages(client, catalogue_path):
+                        for p in page_products:
+                            name_key = f"{p.get('name', '')}-{p.get('price', '')}"
+                            if name_key not in seen_names:
+                                seen_names.add(name_key)
+                                batch.append(p)
+                        if len(batch) >= self.save_batch_size:
+                            saved_count += await asyncio.to_thread(self._save_salefinder_products, db, store, batch)
+                            batch = []
+
+                if batch:
+                    saved_count += await asyncio.to_thread(self._save_salefinder_products, db, store, batch)
+                await asyncio.to_thread(self._publish_salefinder_products, db, store)
+            finally:
+                # Closing without a commit rolls back a partially written catalogue
+                await asyncio.to_thread(db.close)
+
+            await asyncio.to_thread(self._finish_scrape_log, scrape_log_id, "success", saved_count)
+            await asyncio.to_thread(invalidate_store_sync, store_slug)
+            logger.info(f"Saved {saved_count} specials for {store_slug} from SaleFinder")
+            return saved_count
+
+        except Exception as e:
+            logger.error(f"SaleFinder scrape failed for {store_slug}: {e}")
+            await asyncio.to_thread(self._finish_scrape_log, scrape_log_id, "failed", 0, str(e))
+            raise
+
+    async def scrape_salefinder_stores(self, store_slugs: Optional[list[str]] = None) -> dict:
+        """Scrape several SaleFinder stores in parallel."""
+        store_slugs = store_slugs or list(self.salefinder.STORE_CONFIG)
+        async with self._client() as client:
+            outcomes = await asyncio.gather(
+                *(self.scrape_salefinder_store(client, slug) for slug in store_slugs),
+                return_exceptions=True,
+            )
+        return _collect_results(store_slugs, outcomes)
+
+    # ============== Firecrawl ==============
+
+    @staticmethod
+    def _scrape_firecrawl_store(store_slug: str) -> int:
+        from app.services.firecrawl_scraper import FirecrawlScraper
+
+        # Separate scraper (and session) per thread
+        return FirecrawlScraper().scrape_store(store_slug)
+
+    async def scrape_firecrawl_stores(self, store_slugs: Optional[list[str]] = None) -> dict:
+        """Scrape several stores through Firecrawl in parallel worker threads."""
+        from app.services.firecrawl_scraper import FirecrawlScraper
+
+        store_slugs = store_slugs or list(FirecrawlScraper.STORE_URLS)
+        outcomes = await asyncio.gather(
+            *(asyncio.to_thread(self._scrape_firecrawl_store, slug) for slug in store_slugs),
+            return_exceptions=True,
+        )
+        return _collect_results(store_slugs, outcomes)
+
+    async def scrape_all(self, salefinder: bool = True, firecrawl: bool = False) -> dict:
+        """Run every enabled source at once. Results are keyed by source, then store."""
+        jobs = {}
+        if salefinder:
+            jobs["salefinder"] = self.scrape_salefinder_stores()
+        if firecrawl:
+            jobs["firecrawl"] = self.scrape_firecrawl_stores()
+        outcomes = await asyncio.gather(*jobs.values())
+        return dict(zip(jobs, outcomes))
+
+
+def _collect_results(store_slugs: list[str], outcomes: list) -> dict:
+    """Shape gather() outcomes like the sequential scrape_all_stores results."""
+    results = {}
+    for store_slug, outcome in zip(store_slugs, outcomes):
+        if isinstance(outcome, BaseException):
+            logger.error(f"Failed to scrape {store_slug}: {outcome}")
+            results[store_slug] = {"status": "failed", "error": str(outcome)}
+        else:
+            results[store_slug] = {"status": "success", "items": outcome}
+    return results
+
+
+def run_concurrent_salefinder_scrape(store_slugs: Optional[list[str]] = None) -> dict:
+    """Scrape SaleFinder stores in parallel from synchronous code (scheduler jobs)."""
+    orchestrator = ScrapeOrchestrator()
+    try:
+        return asyncio.run(orchestrator.scrape_salefinder_stores(store_slugs))
+    finally:
+        orchestrator.close()
+
+
+def run_concurrent_firecrawl_scrape(store_slugs: Optional[list[str]] = None) -> dict:
+    """Scrape Firecrawl stores in parallel from synchronous code (scheduler jobs)."""
+    orchestrator = ScrapeOrchestrator()
+    try:
+        return asyncio.run(orchestrator.scrape_firecrawl_stores(store_slugs))
+    finally:
+        orchestrator.close()
+
+
+def collect_salefinder_products(catalogue_path: str, max_pages: int = 50) -> list[dict]:
+    """Fetch a catalogue's pages concurrently from synchronous code."""
+    orchestrator = ScrapeOrchestrator()
+
+    async def collect():
+        async with orchestrator._client() as client:
+            return await orchestrator.get_salefinder_products(client, catalogue_path, max_pages)
+
+    try:
+        return asyncio.run(collect())
+    finally:
+        orchestrator.close()
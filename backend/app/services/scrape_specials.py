@@ -14,6 +14,7 @@ from typing import Optional
 
 from app.database import SessionLocal
 from app.models import Store, Category, Special
+from app.services.current_specials import refresh_current_specials
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -291,6 +292,7 @@ def save_products_to_database(
                 logger.error(f"Error saving product {product.name}: {e}")
                 errors += 1
 
+        refresh_current_specials(db, store.id)
         db.commit()
 
         return {
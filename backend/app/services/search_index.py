@@ -0,0 +1,350 @@
+"""
+Product Search Index
+
+Indexed, ranked name/brand search for the specials and products tables,
+replacing `name ILIKE '%term%' OR brand ILIKE '%term%'` scans.
+
+PostgreSQL:
+- a generated `search_vector` tsvector column with a GIN index, queried
+  with prefix matching ("choc" finds "chocolate")
+- pg_trgm GIN indexes on name and brand, which serve the substring ILIKE
+  and the `%` similarity operator for typos ("chesse" finds "cheese")
+
+SQLite:
+- two external-content FTS5 tables per searched table, kept in sync by
+  triggers so the bulk statements in special_ingest (and every other write
+  path, including expiry cleanup) update them without extra round trips
+- `<table>_fts` (unicode61 words) serves prefix matching and the bm25 rank
+- `<table>_trigram` (trigram tokenizer, SQLite 3.34+) serves the substring
+  match PostgreSQL gets from ILIKE ("water" still finds "Springwater").
+  Trigrams need 3 characters, so shorter searches match word prefixes only.
+  Without trigram support the substring ILIKE is OR-ed in (a table scan).
+
+Search terms are expanded at query time with SEARCH_SYNONYMS, groups of
+words for the same thing ("crisps" also finds "chips", "yogurt" finds
+"yoghurt").
+"""
+import logging
+import re
+import sqlite3
+from typing import Optional
+
+from sqlalchemy import column, func, literal_column, or_, select, table, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.sql.elements import ColumnElement
+
+from app.database import engine
+
+logger = logging.getLogger(__name__)
+
+# Tables with a search index; each needs `id`, `name` and `brand` columns
+SEARCH_TABLES = ("specials", "products")
+
+TEXT_SEARCH_CONFIG = "simple"  # No stemming: product names aren't prose
+
+# SQLite FTS5 tables per searched table: suffix -> table options
+SQLITE_FTS_TABLES = {
+    "fts": "tokenize='unicode61 remove_diacritics 2', prefix='2 3'",
+    "trigram": "tokenize='trigram'",
+}
+SQLITE_TRIGRAM_AVAILABLE = sqlite3.sqlite_version_info >= (3, 34, 0)
+TRIGRAM_MIN_LENGTH = 3
+
+# search_rank() of a row matched without a full-text hit; below any real score
+NO_MATCH_RANK = -1.0
+
+# Search term to category slug mapping for smart search
+# When user searches for these terms, filter to the matching category instead of text search
+SEARCH_CATEGORY_MAP = {
+    # Sauces & Condiments
+    "sauce": "sauces-condiments",
+    "sauces": "sauces-condiments",
+    "ketchup": "sauces-condiments",
+    "mayonnaise": "sauces-condiments",
+    "mustard": "sauces-condiments",
+    "condiment": "sauces-condiments",
+    "condiments": "sauces-condiments",
+    # Chips & Crisps
+    "chips": "chips-crisps",
+    "crisps": "chips-crisps",
+    # Chocolate
+    "chocolate": "chocolate",
+    # Biscuits
+    "biscuit": "biscuits",
+    "biscuits": "biscuits",
+    "cookie": "biscuits",
+    "cookies": "biscuits",
+    # Drinks subcategories
+    "soft drink": "soft-drinks",
+    "soft drinks": "soft-drinks",
+    "juice": "juice",
+    "water": "water",
+    "coffee": "coffee-tea",
+    "tea": "coffee-tea",
+    "energy drink": "energy-drinks",
+    "energy drinks": "energy-drinks",
+    # Dairy
+    "milk": "milk",
+    "cheese": "cheese",
+    "yoghurt": "yoghurt",
+    "yogurt": "yoghurt",
+    "butter": "butter-cream",
+    "eggs": "eggs",
+    # Meat
+    "chicken": "chicken",
+    "beef": "beef-veal",
+    "pork": "pork",
+    "lamb": "lamb",
+    "seafood": "seafood",
+    "sausage": "sausages-bbq",
+    "sausages": "sausages-bbq",
+    # Pantry
+    "pasta": "pasta-noodles",
+    "noodles": "pasta-noodles",
+    "rice": "rice-grains",
+    "cereal": "breakfast-cereals",
+    "cereals": "breakfast-cereals",
+    # Cleaning
+    "laundry": "laundry",
+    "cleaning": "cleaning-products",
+    "dishwashing": "dishwashing",
+    # Pet
+    "dog food": "dog-food",
+    "cat food": "cat-food",
+    "pet food": "pet",
+    # Baby
+    "nappies": "nappies-wipes",
+    "baby food": "baby-food",
+    "baby formula": "baby-formula",
+    # Personal care
+    "shampoo": "hair-care",
+    "deodorant": "deodorant",
+    "toothpaste": "oral-care",
+    # Frozen
+    "ice cream": "ice-cream-frozen-desserts",
+    "frozen pizza": "frozen-pizza",
+    "frozen meals": "frozen-meals",
+}
+
+
+# Interchangeable search terms: each matches the others in its group.
+# Only true equivalents (spellings, regional names), not category siblings
+SYNONYM_GROUPS = [
+    ("yoghurt", "yogurt"),
+    ("chips", "crisps"),
+    ("biscuit", "cookie"),
+    ("biscuits", "cookies"),
+    ("ketchup", "tomato sauce"),
+    ("mayonnaise", "mayo"),
+    ("nappies", "diapers"),
+    ("soft drink", "soda"),
+    ("soft drinks", "sodas"),
+]
+
+
+def _build_synonyms(groups: list[tuple[str, ...]]) -> dict[str, tuple[str, ...]]:
+    """Map every term of a synonym group to the whole group."""
+    return {term: group for group in groups for term in group}
+
+
+SEARCH_SYNONYMS = _build_synonyms(SYNONYM_GROUPS)
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+
+# ============== Index maintenance ==============
+
+def _postgres_ddl(table_name: str) -> list[str]:
+    return [
+        f"""
+        ALTER TABLE {table_name} ADD COLUMN IF NOT EXISTS search_vector tsvector
+        GENERATED ALWAYS AS (
+            to_tsvector('{TEXT_SEARCH_CONFIG}', coalesce(name, '') || ' ' || coalesce(brand, ''))
+        ) STORED
+        """,
+        f"CREATE INDEX IF NOT EXISTS ix_{table_name}_search_vector ON {table_name} USING gin (search_vector)",
+        f"CREATE INDEX IF NOT EXISTS ix_{table_name}_name_trgm ON {table_name} USING gin (name gin_trgm_ops)",
+        f"CREATE INDEX IF NOT EXISTS ix_{table_name}_brand_trgm ON {table_name} USING gin (brand gin_trgm_ops)",
+    ]
+
+
+def _sqlite_ddl(table_name: str, suffix: str) -> list[str]:
+    fts = f"{table_name}_{suffix}"
+    return [
+        f"""
+        CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5(
+            name, brand,
+            content='{table_name}', content_rowid='id',
+            {SQLITE_FTS_TABLES[suffix]}
+        )
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table_name} BEGIN
+            INSERT INTO {fts}(rowid, name, brand) VALUES (new.id, new.name, new.brand);
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table_name} BEGIN
+            INSERT INTO {fts}({fts}, rowid, name, brand) VALUES ('delete', old.id, old.name, old.brand);
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF name, brand ON {table_name} BEGIN
+            INSERT INTO {fts}({fts}, rowid, name, brand) VALUES ('delete', old.id, old.name, old.brand);
+            INSERT INTO {fts}(rowid, name, brand) VALUES (new.id, new.name, new.brand);
+        END
+        """,
+    ]
+
+
+def ensure_search_index(bind: Engine = engine):
+    """Create the search columns, indexes and FTS tables if missing (idempotent)."""
+    dialect = bind.dialect.name
+    with bind.begin() as conn:
+        if dialect == "postgresql":
+            conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+            for table_name in SEARCH_TABLES:
+                for statement in _postgres_ddl(table_name):
+                    conn.execute(text(statement))
+        elif dialect == "sqlite":
+            suffixes = [suffix for suffix in SQLITE_FTS_TABLES if suffix != "trigram" or SQLITE_TRIGRAM_AVAILABLE]
+            if not SQLITE_TRIGRAM_AVAILABLE:
+                logger.warning(
+                    f"SQLite {sqlite3.sqlite_version} has no trigram tokenizer; substring search falls back to ILIKE scans"
+                )
+            for table_name in SEARCH_TABLES:
+                for suffix in suffixes:
+                    fts = f"{table_name}_{suffix}"
+                    existed = conn.execute(
+                        text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+                        {"name": fts},
+                    ).first()
+                    for statement in _sqlite_ddl(table_name, suffix):
+                        conn.execute(text(statement))
+                    if not existed:
+                        # Index the rows that were there before the FTS table
+                        conn.execute(text(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')"))
+                        logger.info(f"Built full-text index {fts}")
+        else:
+            logger.warning(f"No search index for {dialect}; search falls back to ILIKE scans")
+
+
+# ============== Query building ==============
+
+def expand_search_terms(search: str) -> list[list[str]]:
+    """
+    Split a search into AND-ed groups of OR-ed alternatives, adding synonyms.
+
+    "salt crisps" -> [["salt"], ["crisps", "chips"]]
+    A whole-phrase synonym ("soft drink") is kept together as one group.
+    """
+    phrase = " ".join(_WORD_RE.findall(search.lower()))
+    if not phrase:
+        return []
+    if phrase in SEARCH_SYNONYMS:
+        return [list(SEARCH_SYNONYMS[phrase])]
+    return [list(SEARCH_SYNONYMS.get(word, (word,))) for word in phrase.split()]
+
+
+def _tsquery_string(groups: list[list[str]]) -> str:
+    """to_tsquery() syntax with prefix matching on the last word of each alternative."""
+    def alternative(phrase: str) -> str:
+        return " <-> ".join(phrase.split()) + ":*"
+
+    return " & ".join(
+        "(" + " | ".join(alternative(phrase) for phrase in group) + ")"
+        for group in groups
+    )
+
+
+def _fts5_query_string(groups: list[list[str]]) -> str:
+    """FTS5 MATCH syntax with prefix matching on each alternative."""
+    return " AND ".join(
+        "(" + " OR ".join(f'"{phrase}"*' for phrase in group) + ")"
+        for group in groups
+    )
+
+
+def _fts5_phrase(search: str) -> str:
+    """FTS5 MATCH string for the search as one quoted phrase (a substring on the trigram table)."""
+    return '"' + search.replace('"', '""') + '"'
+
+
+def _fts_table(model, suffix: str = "fts"):
+    return table(f"{model.__tablename__}_{suffix}", column("rowid"), column("rank"))
+
+
+def _ilike_condition(model, search: str) -> ColumnElement:
+    return or_(model.name.ilike(f"%{search}%"), model.brand.ilike(f"%{search}%"))
+
+
+def search_condition(model, search: str) -> ColumnElement:
+    """
+    WHERE clause matching `search` against a model's name and brand.
+
+    Args:
+        model: Special or Product (any model whose table is in SEARCH_TABLES)
+        search: Raw user search string
+    """
+    groups = expand_search_terms(search)
+    dialect = engine.dialect.name
+    if not groups or dialect not in ("postgresql", "sqlite"):
+        return _ilike_condition(model, search)
+
+    if dialect == "postgresql":
+        search_vector = literal_column(f"{model.__tablename__}.search_vector")
+        tsquery = func.to_tsquery(TEXT_SEARCH_CONFIG, _tsquery_string(groups))
+        # All three branches are served by the GIN indexes (bitmap OR)
+        return or_(
+            search_vector.op("@@")(tsquery),
+            _ilike_condition(model, search),
+            model.name.op("%")(search),
+        )
+
+    fts = _fts_table(model)
+    matches = select(fts.c.rowid).where(
+        literal_column(fts.name).op("MATCH")(_fts5_query_string(groups))
+    )
+    if not SQLITE_TRIGRAM_AVAILABLE:
+        return or_(model.id.in_(matches), _ilike_condition(model, search))
+    if len(search) < TRIGRAM_MIN_LENGTH:
+        return model.id.in_(matches)
+    trigram = _fts_table(model, "trigram")
+    substrings = select(trigram.c.rowid).where(
+        literal_column(trigram.name).op("MATCH")(_fts5_phrase(search))
+    )
+    return or_(model.id.in_(matches), model.id.in_(substrings))
+
+
+def search_rank(model, search: str) -> Optional[ColumnElement]:
+    """
+    Relevance score for `search` (higher is better), for ORDER BY ... DESC.
+
+    Never NULL, so it can be used as a keyset cursor key: rows matched only
+    by substring score NO_MATCH_RANK. Returns None where the database has no
+    ranking function.
+    """
+    groups = expand_search_terms(search)
+    dialect = engine.dialect.name
+    if not groups:
+        return None
+
+    if dialect == "postgresql":
+        search_vector = literal_column(f"{model.__tablename__}.search_vector")
+        tsquery = func.to_tsquery(TEXT_SEARCH_CONFIG, _tsquery_string(groups))
+        return func.ts_rank(search_vector, tsquery) + func.similarity(model.name, search)
+
+    if dialect == "sqlite":
+        # FTS5 rank is bm25, where lower is better; NULL without a token match
+        fts = _fts_table(model)
+        rank = (
+            select(fts.c.rank)
+            .where(
+                fts.c.rowid == model.id,
+                literal_column(fts.name).op("MATCH")(_fts5_query_string(groups)),
+            )
+            .scalar_subquery()
+        )
+        return func.coalesce(-rank, NO_MATCH_RANK)
+
+    return None
@@ -0,0 +1,224 @@
+"""
+Listing Totals
+
+Serves the `total` of the specials listings without a COUNT(*) over the
+specials table on every page.
+
+- Store / category / min-discount filters are answered exactly from the
+  special_counts summary (SpecialCount), which the ingestion pipeline
+  refreshes per store after each scrape. Summing a handful of summary rows
+  costs the same no matter how many specials match.
+- Ad-hoc text searches can't be pre-aggregated. They are counted once and
+  memoized per filter combination for ADHOC_COUNT_TTL, so later pages of the
+  same search never recount. With estimate=True the PostgreSQL planner's row
+  estimate is used instead (SQLite has none and falls back to the count).
+"""
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import date
+from typing import Optional
+
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import Select
+
+from app.models import Special, SpecialCount
+from app.services.store_registry import store_registry
+
+logger = logging.getLogger(__name__)
+
+ADHOC_COUNT_TTL = 300.0  # Seconds a search total is reused across pages
+ADHOC_COUNT_MAX_ENTRIES = 1024
+
+
+@dataclass(frozen=True)
+class CountFilters:
+    """The filters of a listing request that affect its total."""
+    store: Optional[str] = None  # Store slug
+    category: Optional[str] = None  # Original scraped category string
+    category_ids: Optional[tuple[int, ...]] = None  # Unified category (with subcategories)
+    min_discount: int = 0
+    search: Optional[str] = None  # Free-text search, not answerable from the summary
+
+
+class _AdhocCounts:
+    """Small thread-safe TTL memo of search totals (sync handlers run in a threadpool)."""
+
+    def __init__(self, max_entries: int = ADHOC_COUNT_MAX_ENTRIES):
+        self._entries: OrderedDict[tuple, tuple[int, bool, float]] = OrderedDict()
+        self._max_entries = max_entries
+        self._lock = threading.Lock()
+
+    def get(self, key: tuple) -> Optional[tuple[int, bool]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            total, estimated, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return total, estimated
+
+    def set(self, key: tuple, total: int, estimated: bool):
+        with self._lock:
+            self._entries[key] = (total, estimated, time.monotonic() + ADHOC_COUNT_TTL)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+_adhoc_counts = _AdhocCounts()
+
+
+# ============== Summary maintenance ==============
+
+def refresh_special_counts(db: Session, store_id: Optional[int] = None):
+    """
+    Rebuild the summary rows for one store (or all stores) from specials.
+
+    Runs inside the caller's transaction; the caller commits.
+    """
+    today = date.today()
+    discount = func.coalesce(Special.discount_percent, 0)
+    grouped = (
+        select(
+            Special.store_id,
+            Special.category,
+            Special.category_id,
+            discount,
+            Special.valid_to,
+            func.count(Special.id),
+        )
+        .where(Special.valid_to >= today)
+        .group_by(Special.store_id, Special.category, Special.category_id, discount, Special.valid_to)
+    )
+    clear = delete(SpecialCount)
+    if store_id is not None:
+        grouped = grouped.where(Special.store_id == store_id)
+        clear = clear.where(SpecialCount.store_id == store_id)
+
+    db.execute(clear)
+    db.execute(
+        insert(SpecialCount).from_select(
+            ["store_id", "category", "category_id", "discount_percent", "valid_to", "count"],
+            grouped,
+        )
+    )
+    # Search totals may include rows that just changed
+    _adhoc_counts.clear()
+
+
+# ============== Serving totals ==============
+
+def _summary_statement(filters: CountFilters) -> Select:
+    stmt = select(func.coalesce(func.sum(SpecialCount.count), 0)).where(
+        SpecialCount.valid_to >= date.today()
+    )
+    if filters.store:
+        # Unknown slugs match nothing, like the listing query
+        stmt = stmt.where(SpecialCount.store_id == store_registry.id_for(filters.store))
+    if filters.category:
+        stmt = stmt.where(SpecialCount.category == filters.category)
+    if filters.category_ids:
+        stmt = stmt.where(SpecialCount.category_id.in_(filters.category_ids))
+    if filters.min_discount > 0:
+        stmt = stmt.where(SpecialCount.discount_percent >= filters.min_discount)
+    return stmt
+
+
+def _count_statement(listing: Select) -> Select:
+    return select(func.count()).select_from(listing.order_by(None).subquery())
+
+
+def _explain_sql(listing: Select, dialect) -> tuple[str, object]:
+    """EXPLAIN for the listing, with bind parameters in the driver's paramstyle."""
+    compiled = listing.order_by(None).compile(dialect=dialect)
+    params = compiled.params
+    if compiled.positional:
+        params = tuple(params[name] for name in compiled.positiontup)
+    return f"EXPLAIN (FORMAT JSON) {compiled.string}", params
+
+
+def _plan_rows(plan) -> int:
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+def _memo_key(filters: CountFilters, estimate: bool) -> tuple:
+    return (filters, estimate, date.today())
+
+
+def count_specials(
+    db: Session,
+    filters: CountFilters,
+    listing: Select,
+    estimate: bool = False,
+) -> tuple[int, bool]:
+    """
+    Total for a listing request.
+
+    Args:
+        db: Database session
+        filters: The request's filters
+        listing: The filtered (unpaginated) listing statement, used for searches
+        estimate: Accept a planner estimate for searches
+
+    Returns:
+        (total, whether it is an estimate)
+    """
+    if not filters.search:
+        return db.scalar(_summary_statement(filters)), False
+
+    key = _memo_key(filters, estimate)
+    cached = _adhoc_counts.get(key)
+    if cached is not None:
+        return cached
+
+    dialect = db.get_bind().dialect
+    if estimate and dialect.name == "postgresql":
+        sql, params = _explain_sql(listing, dialect)
+        total, estimated = _plan_rows(db.connection().exec_driver_sql(sql, params).scalar()), True
+    else:
+        total, estimated = db.scalar(_count_statement(listing)), False
+
+    _adhoc_counts.set(key, total, estimated)
+    return total, estimated
+
+
+async def count_specials_async(
+    db: AsyncSession,
+    filters: CountFilters,
+    listing: Select,
+    estimate: bool = False,
+) -> tuple[int, bool]:
+    """Async version of count_specials for AsyncSession handlers."""
+    if not filters.search:
+        return await db.scalar(_summary_statement(filters)), False
+
+    key = _memo_key(filters, estimate)
+    cached = _adhoc_counts.get(key)
+    if cached is not None:
+        return cached
+
+    dialect = db.bind.dialect
+    if estimate and dialect.name == "postgresql":
+        sql, params = _explain_sql(listing, dialect)
+        conn = await db.connection()
+        total, estimated = _plan_rows((await conn.exec_driver_sql(sql, params)).scalar()), True
+    else:
+        total, estimated = await db.scalar(_count_statement(listing)), False
+
+    _adhoc_counts.set(key, total, estimated)
+    return total, estimated
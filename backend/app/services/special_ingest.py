@@ -0,0 +1,467 @@
+"""
+Bulk ingestion of scraped specials.
+
+Shared write stage for the SaleFinder, Firecrawl and Playwright scrapers.
+A scraped batch is normalized and de-duplicated in Python, then written in a
+handful of statements instead of a SELECT plus an ORM add/update per item:
+
+- Items with a stockcode are upserted with INSERT ... ON CONFLICT DO UPDATE
+  against uq_special_store_product_week (PostgreSQL, with the SQLite dialect
+  as fallback). SQLAlchemy pages the executemany into multi-row VALUES
+  statements, so a 3,000 item catalogue is a few round trips.
+- Items without a stockcode can never hit that constraint (NULLs don't
+  conflict), so they are matched by name within the week using one lookup
+  query per chunk and written with bulk UPDATE/INSERT.
+"""
+import logging
+from dataclasses import dataclass, field
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal, InvalidOperation
+from typing import Iterable, Optional
+
+from sqlalchemy import func, insert, select, update
+from sqlalchemy.orm import Session
+
+from app.models import Category, MasterProduct, ProductPrice, Special, Store
+from app.services.auto_categorizer import categorize_many
+from app.services.brand_extractor import extract_brands, extract_size_from_name
+from app.services.current_specials import refresh_current_specials
+
+logger = logging.getLogger(__name__)
+
+# Keep IN (...) lists well under SQLite's bound parameter limit
+LOOKUP_CHUNK_SIZE = 500
+
+@dataclass
+class IngestResult:
+    """Outcome of writing one batch of specials."""
+    inserted: int = 0
+    updated: int = 0
+    skipped: int = 0
+    images_to_cache: list[dict] = field(default_factory=list)
+
+    @property
+    def saved(self) -> int:
+        return self.inserted + self.updated
+
+
+def _chunks(values: list, size: int = LOOKUP_CHUNK_SIZE) -> Iterable[list]:
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def _to_decimal(value) -> Optional[Decimal]:
+    if value is None or value == "":
+        return None
+    return Decimal(str(value))
+
+
+def _default_image_url(store_slug: str, stockcode: Optional[str]) -> Optional[str]:
+    """Construct a CDN image URL from the stockcode when the scrape had none."""
+    if not stockcode:
+        return None
+    if store_slug == "woolworths":
+        return f"https://cdn0.woolworths.media/content/wowproductimages/large/{stockcode}.jpg"
+    if store_slug == "coles":
+        return f"https://productimages.coles.com.au/productimages/{stockcode[0]}/{stockcode}.jpg"
+    return None
+
+
+def _dedupe_key(row: dict) -> tuple:
+    if row["store_product_id"]:
+        return ("id", row["store_product_id"])
+    return ("name", row["name"])
+
+
+def normalize_specials(
+    db: Session,
+    store: Store,
+    items: list[dict],
+    valid_from: Optional[date] = None,
+    valid_to: Optional[date] = None,
+) -> tuple[list[dict], int]:
+    """
+    Turn raw scraper dicts into rows ready for the specials table.
+
+    Brand, size and category are derived for the whole batch in one pass,
+    the discount is computed from was_price, and duplicates within the
+    batch (same stockcode, or same name when there is no stockcode) are
+    dropped, keeping the first occurrence.
+
+    Args:
+        db: Database session (used to resolve category slugs)
+        store: Store the items belong to
+        items: Scraped items with at least 'name' and 'price'
+        valid_from: Start of the special week (defaults to today)
+        valid_to: End of the special week (defaults to valid_from + 7 days)
+
+    Returns:
+        Tuple of (normalized rows, number of items skipped)
+    """
+    valid_from = valid_from or date.today()
+    valid_to = valid_to or valid_from + timedelta(days=7)
+    now = datetime.utcnow()
+
+    category_map = {slug: cat_id for cat_id, slug in db.query(Category.id, Category.slug)}
+
+    names = [item.get("name") or "" for item in items]
+    brands = [
+        item.get("brand") or extracted
+        for item, extracted in zip(items, extract_brands(names))
+    ]
+    category_slugs = categorize_many(names, brands)
+
+    rows = []
+    seen = set()
+    skipped = 0
+    for item, name, brand, category_slug in zip(items, names, brands, category_slugs):
+        try:
+            price = _to_decimal(item.get("price"))
+            if not name or not price:
+                skipped += 1
+                continue
+            was_price = _to_decimal(item.get("was_price"))
+
+            discount_percent = item.get("discount_percent")
+            if was_price and was_price > price and was_price > 0:
+                discount_percent = int(((was_price - price) / was_price) * 100)
+
+            store_product_id = item.get("store_product_id") or None
+            row = {
+                "store_id": store.id,
+                "name": name,
+                "brand": brand,
+                "size": item.get("size") or extract_size_from_name(name),
+                "category": item.get("category") or item.get("category_name"),
+                "category_id": category_map.get(category_slug) if category_slug else None,
+                "price": price,
+                "was_price": was_price,
+                "discount_percent": discount_percent,
+                "unit_price": item.get("unit_price"),
+                "store_product_id": store_product_id,
+                "product_url": item.get("product_url") or None,
+                "image_url": item.get("image_url") or _default_image_url(store.slug, store_product_id),
+                "valid_from": valid_from,
+                "valid_to": valid_to,
+                "scraped_at": now,
+            }
+        except (InvalidOperation, TypeError, ValueError) as e:
+            logger.warning(f"Failed to normalize special {item.get('name')}: {e}")
+            skipped += 1
+            continue
+
+        key = _dedupe_key(row)
+        if key in seen:
+            logger.debug(f"Skipping duplicate special in batch: {key}")
+            skipped += 1
+            continue
+        seen.add(key)
+        rows.append(row)
+
+    return rows, skipped
+
+
+def _dialect_insert(db: Session):
+    """Return the dialect-specific insert() that supports ON CONFLICT."""
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    else:
+        raise NotImplementedError(f"Bulk upsert is not supported for {dialect}")
+    return dialect_insert, dialect
+
+
+def _upsert_keyed(db: Session, rows: list[dict]) -> int:
+    """
+    Upsert rows that carry a stockcode. Returns how many already existed.
+
+    On conflict the price fields are refreshed, the image only replaced when
+    the new scrape has one, and brand/size/category only filled if missing.
+    """
+    if not rows:
+        return 0
+
+    store_id = rows[0]["store_id"]
+    valid_from = rows[0]["valid_from"]
+    existing = 0
+    for chunk in _chunks([row["store_product_id"] for row in rows]):
+        existing += db.execute(
+            select(func.count(Special.id)).where(
+                Special.store_id == store_id,
+                Special.valid_from == valid_from,
+                Special.store_product_id.in_(chunk),
+            )
+        ).scalar_one()
+
+    dialect_insert, dialect = _dialect_insert(db)
+    table = Special.__table__
+    stmt = dialect_insert(table)
+    set_ = {
+        "price": stmt.excluded.price,
+        "was_price": stmt.excluded.was_price,
+        "discount_percent": stmt.excluded.discount_percent,
+        "scraped_at": stmt.excluded.scraped_at,
+        "image_url": func.coalesce(stmt.excluded.image_url, table.c.image_url),
+        "category_id": func.coalesce(table.c.category_id, stmt.excluded.category_id),
+        "brand": func.coalesce(table.c.brand, stmt.excluded.brand),
+        "size": func.coalesce(table.c.size, stmt.excluded.size),
+    }
+    if dialect == "postgresql":
+        stmt = stmt.on_conflict_do_update(constraint="uq_special_store_product_week", set_=set_)
+    else:
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["store_id", "store_product_id", "valid_from"], set_=set_
+        )
+
+    db.execute(stmt, rows)
+    return existing
+
+
+def _upsert_by_name(db: Session, rows: list[dict]) -> int:
+    """
+    Write rows without a stockcode, matching existing specials by name
+    within the same store and week. Returns how many already existed.
+    """
+    if not rows:
+        return 0
+
+    store_id = rows[0]["store_id"]
+    valid_from = rows[0]["valid_from"]
+    existing_by_name = {}
+    for chunk in _chunks([row["name"] for row in rows]):
+        result = db.execute(
+            select(
+                Special.id, Special.name, Special.brand, Special.size,
+                Special.category_id, Special.image_url,
+            ).where(
+                Special.store_id == store_id,
+                Special.valid_from == valid_from,
+                Special.name.in_(chunk),
+            )
+        )
+        for existing in result:
+            existing_by_name.setdefault(existing.name, existing)
+
+    updates = []
+    inserts = []
+    for row in rows:
+        existing = existing_by_name.get(row["name"])
+        if existing is None:
+            inserts.append(row)
+            continue
+        updates.append({
+            "id": existing.id,
+            "price": row["price"],
+            "was_price": row["was_price"],
+            "discount_percent": row["discount_percent"],
+            "scraped_at": row["scraped_at"],
+            "image_url": row["image_url"] or existing.image_url,
+            "category_id": existing.category_id or row["category_id"],
+            "brand": existing.brand or row["brand"],
+            "size": existing.size or row["size"],
+        })
+
+    if updates:
+        db.execute(update(Special), updates)
+    if inserts:
+        db.execute(insert(Special), inserts)
+    return len(updates)
+
+
+def _price_string(value: Optional[Decimal]) -> Optional[str]:
+    return f"${value:.2f}" if value is not None else None
+
+
+def _price_cents(value: Optional[Decimal]) -> Optional[int]:
+    return int(value * 100) if value is not None else None
+
+
+def _write_master_products(db: Session, store: Store, rows: list[dict]) -> list[dict]:
+    """
+    Bulk-write normalized rows into the MasterProduct + ProductPrice schema.
+
+    Products are matched by (store, stockcode). Each product gets one price
+    row per special week; a new week's price becomes the current one.
+
+    Returns:
+        Image cache jobs for newly created products that have an image
+    """
+    if not rows:
+        return []
+
+    now = datetime.utcnow()
+    # ProductPrice validity columns are timestamps
+    valid_from = datetime.combine(rows[0]["valid_from"], time.min)
+    valid_to = datetime.combine(rows[0]["valid_to"], time.min)
+    for row in rows:
+        row["stockcode"] = row["store_product_id"] or f"unknown_{hash(row['name'])}"
+
+    # Collapse rows that map to the same stockcode (first wins)
+    by_stockcode = {}
+    for row in rows:
+        by_stockcode.setdefault(row["stockcode"], row)
+
+    existing = {}
+    for chunk in _chunks(list(by_stockcode)):
+        result = db.execute(
+            select(MasterProduct.id, MasterProduct.stockcode, MasterProduct.image_cached).where(
+                MasterProduct.store_id == store.id,
+                MasterProduct.stockcode.in_(chunk),
+            )
+        )
+        for product in result:
+            existing[product.stockcode] = product
+
+    product_updates = []
+    product_inserts = []
+    for stockcode, row in by_stockcode.items():
+        product = existing.get(stockcode)
+        if product is None:
+            product_inserts.append({
+                "store_id": store.id,
+                "stockcode": stockcode,
+                "name": row["name"],
+                "brand": row["brand"],
+                "size": row["size"],
+                "category": row["category"],
+                "product_url": row["product_url"],
+                "original_image_url": row["image_url"],
+                "image_cached": False,
+                "created_at": now,
+                "last_seen_at": now,
+            })
+            continue
+
+        values = {"id": product.id, "last_seen_at": now, "name": row["name"]}
+        for column in ("brand", "size", "product_url"):
+            if row[column]:
+                values[column] = row[column]
+        if row["image_url"] and not product.image_cached:
+            values["original_image_url"] = row["image_url"]
+        product_updates.append(values)
+
+    if product_updates:
+        db.execute(update(MasterProduct), product_updates)
+
+    images_to_cache = []
+    product_ids = {stockcode: product.id for stockcode, product in existing.items()}
+    if product_inserts:
+        created = db.execute(
+            insert(MasterProduct).returning(MasterProduct.id, MasterProduct.stockcode),
+            product_inserts,
+        )
+        for product_id, stockcode in created:
+            product_ids[stockcode] = product_id
+            image_url = by_stockcode[stockcode]["image_url"]
+            if image_url:
+                images_to_cache.append({
+                    "url": image_url,
+                    "store_slug": store.slug,
+                    "stockcode": stockcode,
+                    "product_id": product_id,
+                })
+
+    # Prices: refresh this week's row if it exists, otherwise retire the
+    # previous current price and add a new one
+    existing_prices = {}
+    for chunk in _chunks(list(product_ids.values())):
+        for price_id, product_id in db.execute(
+            select(ProductPrice.id, ProductPrice.product_id).where(
+                ProductPrice.product_id.in_(chunk),
+                ProductPrice.valid_from == valid_from,
+            )
+        ):
+            existing_prices[product_id] = price_id
+
+    price_updates = []
+    price_inserts = []
+    for stockcode, row in by_stockcode.items():
+        product_id = product_ids[stockcode]
+        values = {
+            "price": _price_string(row["price"]),
+            "price_numeric": _price_cents(row["price"]),
+            "was_price": _price_string(row["was_price"]),
+            "was_price_numeric": _price_cents(row["was_price"]),
+            "discount_percent": row["discount_percent"] or 0,
+            "unit_price": row["unit_price"],
+            "scraped_at": now,
+        }
+        if product_id in existing_prices:
+            values["id"] = existing_prices[product_id]
+            price_updates.append(values)
+        else:
+            values.update(
+                product_id=product_id,
+                valid_from=valid_from,
+                valid_to=valid_to,
+                is_current=True,
+            )
+            price_inserts.append(values)
+
+    if price_updates:
+        db.execute(update(ProductPrice), price_updates)
+    if price_inserts:
+        for chunk in _chunks([values["product_id"] for values in price_inserts]):
+            db.execute(
+                update(ProductPrice)
+                .where(ProductPrice.product_id.in_(chunk), ProductPrice.is_current == True)
+                .values(is_current=False)
+                .execution_options(synchronize_session=False)
+            )
+        db.execute(insert(ProductPrice), price_inserts)
+
+    return images_to_cache
+
+
+def ingest_specials(
+    db: Session,
+    store: Store,
+    items: list[dict],
+    valid_from: Optional[date] = None,
+    valid_to: Optional[date] = None,
+    master_products: bool = False,
+    refresh_projection: bool = True,
+) -> IngestResult:
+    """
+    Normalize and bulk-write a batch of scraped specials for one store.
+
+    The caller owns the transaction and is expected to commit.
+
+    Args:
+        db: Database session
+        store: Store the items belong to
+        items: Scraped items (dicts with name, price, was_price,
+            store_product_id, image_url, ...)
+        valid_from: Start of the special week (defaults to today)
+        valid_to: End of the special week (defaults to valid_from + 7 days)
+        master_products: Also write the normalized MasterProduct +
+            ProductPrice schema
+        refresh_projection: Rebuild the store's current_specials projection
+            (and counts). Callers writing a catalogue in several batches
+            pass False and refresh once before their commit
+
+    Returns:
+        IngestResult with inserted/updated/skipped counts for specials and
+        image cache jobs for newly created master products
+    """
+    rows, skipped = normalize_specials(db, store, items, valid_from, valid_to)
+
+    keyed = [row for row in rows if row["store_product_id"]]
+    unkeyed = [row for row in rows if not row["store_product_id"]]
+    updated = _upsert_keyed(db, keyed) + _upsert_by_name(db, unkeyed)
+
+    result = IngestResult(inserted=len(rows) - updated, updated=updated, skipped=skipped)
+    if master_products:
+        result.images_to_cache = _write_master_products(db, store, rows)
+
+    # Listings and totals are served from the projection, so refresh it in the same transaction
+    if refresh_projection:
+        refresh_current_specials(db, store.id)
+
+    logger.info(
+        f"Ingested {len(rows)} specials for {store.slug} "
+        f"({result.inserted} new, {result.updated} updated, {result.skipped} skipped)"
+    )
+    return result
@@ -0,0 +1,157 @@
+"""
+Process-wide registry of stores.
+
+There are only a handful of stores and they almost never change, so routers
+resolve store_id -> name/slug/logo (and slug -> id) from memory instead of
+querying the stores table for every row.
+
+The registry is loaded in the app lifespan and reloaded:
+- after any commit that inserted, updated or deleted a Store in this process
+- on a lookup miss (e.g. a store added by another worker), at most once
+  per MISS_RELOAD_INTERVAL so bogus ids cannot turn into a query per request
+"""
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.database import SessionLocal
+from app.models import Store
+
+logger = logging.getLogger(__name__)
+
+MISS_RELOAD_INTERVAL = 60.0  # Seconds between reloads triggered by unknown ids/slugs
+
+
+@dataclass(frozen=True)
+class StoreInfo:
+    """Detached, read-only copy of a Store row."""
+    id: int
+    name: str
+    slug: str
+    logo_url: Optional[str] = None
+    website_url: Optional[str] = None
+    specials_day: Optional[str] = None
+
+    @classmethod
+    def from_model(cls, store: Store) -> "StoreInfo":
+        return cls(
+            id=store.id,
+            name=store.name,
+            slug=store.slug,
+            logo_url=store.logo_url,
+            website_url=store.website_url,
+            specials_day=store.specials_day,
+        )
+
+
+class StoreRegistry:
+    """In-memory id/slug index over the stores table."""
+
+    def __init__(self):
+        self._by_id: dict[int, StoreInfo] = {}
+        self._by_slug: dict[str, StoreInfo] = {}
+        self._loaded = False
+        self._last_miss_reload = 0.0
+        self._lock = threading.Lock()
+
+    def load(self, db: Optional[Session] = None):
+        """(Re)load all stores, using a short-lived session if none is given."""
+        own_session = db is None
+        db = db or SessionLocal()
+        try:
+            stores = [StoreInfo.from_model(s) for s in db.query(Store).all()]
+        finally:
+            if own_session:
+                db.close()
+
+        # Swap both indexes at once so readers never see a half-built registry
+        with self._lock:
+            self._by_id = {s.id: s for s in stores}
+            self._by_slug = {s.slug: s for s in stores}
+            self._loaded = True
+        logger.info(f"Store registry loaded {len(stores)} stores")
+
+    def invalidate(self):
+        """Drop the loaded stores; the next lookup reloads them."""
+        with self._lock:
+            self._loaded = False
+
+    def _ensure_loaded(self):
+        if not self._loaded:
+            self.load()
+
+    def _reload_on_miss(self) -> bool:
+        now = time.monotonic()
+        if now - self._last_miss_reload < MISS_RELOAD_INTERVAL:
+            return False
+        self._last_miss_reload = now
+        self.load()
+        return True
+
+    def get(self, store_id: Optional[int]) -> Optional[StoreInfo]:
+        """Look up a store by id."""
+        if store_id is None:
+            return None
+        self._ensure_loaded()
+        store = self._by_id.get(store_id)
+        if store is None and self._reload_on_miss():
+            store = self._by_id.get(store_id)
+        return store
+
+    def by_slug(self, slug: Optional[str]) -> Optional[StoreInfo]:
+        """Look up a store by slug."""
+        if not slug:
+            return None
+        self._ensure_loaded()
+        store = self._by_slug.get(slug)
+        if store is None and self._reload_on_miss():
+            store = self._by_slug.get(slug)
+        return store
+
+    def id_for(self, slug: Optional[str]) -> Optional[int]:
+        """Resolve a slug to its store id, or None if unknown."""
+        store = self.by_slug(slug)
+        return store.id if store else None
+
+    def name_for(self, store_id: Optional[int]) -> Optional[str]:
+        """Display name of a store, or None if unknown."""
+        store = self.get(store_id)
+        return store.name if store else None
+
+    def all(self) -> list[StoreInfo]:
+        """All stores, ordered by id."""
+        self._ensure_loaded()
+        return sorted(self._by_id.values(), key=lambda s: s.id)
+
+    def slugs_by_id(self) -> dict[int, str]:
+        """Snapshot of store_id -> slug, for mapping grouped counts."""
+        self._ensure_loaded()
+        return {store_id: s.slug for store_id, s in self._by_id.items()}
+
+
+store_registry = StoreRegistry()
+
+
+# ============== Change events ==============
+
+@event.listens_for(Session, "before_flush")
+def _track_store_changes(session, flush_context, instances):
+    if any(isinstance(obj, Store) for obj in (*session.new, *session.dirty, *session.deleted)):
+        session.info["stores_changed"] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _reload_after_store_commit(session):
+    if session.info.pop("stores_changed", False):
+        # Can't query through the committing session here; reload lazily
+        store_registry.invalidate()
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_store_changes(session):
+    session.info.pop("stores_changed", None)
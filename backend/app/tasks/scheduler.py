@@ -12,6 +12,7 @@ from app.services.catalogue_parser import run_all_parsers, get_all_parsers
 from app.services.produce_importer import run_fresh_foods_import
 from app.services.salefinder_scraper import run_salefinder_scrape, SaleFinderScraper
 from app.services.image_fixer import run_image_fix
+from app.services.image_metadata import run_image_eviction, run_image_revalidation
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -40,6 +41,18 @@ last_image_fix = {
     "results": {}
 }
 
+# Store last image revalidation results
+last_image_revalidation = {
+    "timestamp": None,
+    "results": {}
+}
+
+# Store last image eviction results
+last_image_eviction = {
+    "timestamp": None,
+    "results": {}
+}
+
 # Global scheduler instance
 scheduler = BackgroundScheduler()
 
@@ -71,7 +84,7 @@ def run_specials_scrape():
         expired = scraper.clear_expired_specials()
         logger.info(f"Cleared {expired} expired specials")
 
-        # Scrape all stores
+        # Scrape all stores in parallel
         results = scraper.scrape_all_stores()
 
         last_specials_scrape = {
@@ -221,6 +234,58 @@ def run_image_fix_update():
         }
 
 
+def run_image_revalidation_update():
+    """Job function to revalidate a budgeted slice of cached images."""
+    global last_image_revalidation
+
+    logger.info("Starting image revalidation...")
+    start_time = datetime.now()
+
+    try:
+        results = run_image_revalidation()
+        last_image_revalidation = {
+            "timestamp": start_time.isoformat(),
+            "duration_seconds": (datetime.now() - start_time).total_seconds(),
+            "results": results
+        }
+        logger.info("Image revalidation completed")
+
+    except Exception as e:
+        logger.error(f"Error in image revalidation: {e}")
+        last_image_revalidation = {
+            "timestamp": start_time.isoformat(),
+            "duration_seconds": (datetime.now() - start_time).total_seconds(),
+            "results": {},
+            "error": str(e)
+        }
+
+
+def run_image_eviction_update():
+    """Job function to keep the local image cache within its disk budget."""
+    global last_image_eviction
+
+    logger.info("Starting image eviction...")
+    start_time = datetime.now()
+
+    try:
+        results = run_image_eviction()
+        last_image_eviction = {
+            "timestamp": start_time.isoformat(),
+            "duration_seconds": (datetime.now() - start_time).total_seconds(),
+            "results": results
+        }
+        logger.info("Image eviction completed")
+
+    except Exception as e:
+        logger.error(f"Error in image eviction: {e}")
+        last_image_eviction = {
+            "timestamp": start_time.isoformat(),
+            "duration_seconds": (datetime.now() - start_time).total_seconds(),
+            "results": {},
+            "error": str(e)
+        }
+
+
 def start_scheduler():
     """Start the background scheduler."""
     if scheduler.running:
@@ -281,6 +346,24 @@ def start_scheduler():
         replace_existing=True
     )
 
+    # Daily image revalidation at 3:00 AM (conditional requests, budgeted per run)
+    scheduler.add_job(
+        run_image_revalidation_update,
+        CronTrigger(hour=3, minute=0),
+        id='daily_image_revalidation',
+        name='Daily Image Revalidation',
+        replace_existing=True
+    )
+
+    # Image eviction on Sunday at 4:00 AM (stale products, then LRU beyond the disk budget)
+    scheduler.add_job(
+        run_image_eviction_update,
+        CronTrigger(day_of_week='sun', hour=4, minute=0),
+        id='weekly_image_eviction',
+        name='Weekly Image Eviction',
+        replace_existing=True
+    )
+
     scheduler.start()
     logger.info("Scheduler started with jobs:")
     for job in scheduler.get_jobs():
@@ -313,7 +396,9 @@ def get_scheduler_status():
         "last_specials_scrape": last_specials_scrape,
         "last_fresh_foods_import": last_fresh_foods_import,
         "last_salefinder_scrape": last_salefinder_scrape,
-        "last_image_fix": last_image_fix
+        "last_image_fix": last_image_fix,
+        "last_image_revalidation": last_image_revalidation,
+        "last_image_eviction": last_image_eviction
     }
 
 
@@ -0,0 +1,146 @@
+"""
+Benchmark Basket Pricing Script
+
+Compares /compare/basket pricing before and after the set-based engine:
+- before: per product x store, a Product, a StoreProduct and a latest-Price
+  query (the old compare_basket loop)
+- after: services.basket_pricing (one query, then in-memory pricing)
+
+Runs against a throwaway in-memory SQLite database seeded with synthetic
+stores, products and weekly price history, for 10/100/500-item baskets by
+default. Reports statements issued and mean milliseconds per basket.
+Run with: python -m scripts.benchmark_basket [--sizes 10 100 500] [--iterations 5]
+"""
+import argparse
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from sqlalchemy import create_engine, desc, event
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import StaticPool
+
+from app.database import Base
+from app.models import Price, Product, Store, StoreProduct
+from app.services.basket_pricing import BasketLine, load_product_prices, price_basket
+from app.services.store_registry import store_registry
+
+STORES = ["woolworths", "coles", "aldi", "iga"]
+WEEKS_OF_HISTORY = 12
+
+
+def seed(session: Session, products: int):
+    """Synthetic catalogue: every product at most stores, with weekly prices."""
+    rng = random.Random(42)
+    stores = [Store(name=slug.title(), slug=slug) for slug in STORES]
+    session.add_all(stores)
+    session.flush()
+
+    started = datetime(2025, 1, 1)
+    for i in range(products):
+        product = Product(name=f"Product {i}", brand=f"Brand {i % 50}", size="500g")
+        session.add(product)
+        session.flush()
+        for store in stores:
+            if rng.random() < 0.15:  # Not every store sells everything
+                continue
+            store_product = StoreProduct(product_id=product.id, store_id=store.id)
+            session.add(store_product)
+            session.flush()
+            base = rng.randint(100, 2000)
+            session.add_all(
+                Price(
+                    store_product_id=store_product.id,
+                    price=Decimal(base + rng.randint(-50, 50)) / 100,
+                    source="benchmark",
+                    recorded_at=started + timedelta(weeks=week),
+                )
+                for week in range(WEEKS_OF_HISTORY)
+            )
+    session.commit()
+
+
+def legacy_basket(session: Session, product_ids: list[int]) -> dict:
+    """The old compare_basket loop, kept here as the baseline."""
+    stores = store_registry.all()
+    totals = {store.slug: Decimal(0) for store in stores}
+    for product_id in product_ids:
+        product = session.query(Product).filter(Product.id == product_id).first()
+        if not product:
+            continue
+        for store in stores:
+            sp = session.query(StoreProduct).filter(
+                StoreProduct.product_id == product_id,
+                StoreProduct.store_id == store.id
+            ).first()
+            if sp:
+                latest = session.query(Price).filter(
+                    Price.store_product_id == sp.id
+                ).order_by(desc(Price.recorded_at)).first()
+                if latest:
+                    totals[store.slug] += latest.price
+    return totals
+
+
+def engine_basket(session: Session, product_ids: list[int]) -> dict:
+    quote = price_basket(
+        load_product_prices(session, [BasketLine(item_id=pid) for pid in product_ids]),
+        skip_unknown=True,
+    )
+    return {
+        store_registry.get(total.store_id).slug: Decimal(total.total_cents) / 100
+        for total in quote.store_totals
+    }
+
+
+def measure(session: Session, statements: list[int], func, product_ids: list[int], iterations: int):
+    """(result, statements per call, mean ms per call)"""
+    statements[0] = 0
+    started = time.perf_counter()
+    for _ in range(iterations):
+        result = func(session, product_ids)
+    elapsed = (time.perf_counter() - started) / iterations * 1000
+    return result, statements[0] // iterations, elapsed
+
+
+def run_benchmark(sizes: list[int], iterations: int):
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+
+    statements = [0]
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def count_statement(*args):
+        statements[0] += 1
+
+    with Session(engine) as session:
+        print(f"Seeding {max(sizes)} products x {len(STORES)} stores x {WEEKS_OF_HISTORY} weeks...")
+        seed(session, max(sizes))
+        store_registry.load(session)
+
+        print(f"\n{'items':>6}{'before stmts':>14}{'before ms':>11}{'after stmts':>13}{'after ms':>10}")
+        for size in sizes:
+            product_ids = list(range(1, size + 1))
+            before, before_stmts, before_ms = measure(session, statements, legacy_basket, product_ids, iterations)
+            after, after_stmts, after_ms = measure(session, statements, engine_basket, product_ids, iterations)
+            if before != after:
+                print(f"  totals differ for {size} items: {before} != {after}")
+            print(f"{size:>6}{before_stmts:>14,}{before_ms:>11.1f}{after_stmts:>13,}{after_ms:>10.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark basket pricing")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 500], help="Basket sizes")
+    parser.add_argument("--iterations", type=int, default=5, help="Runs per basket size")
+    args = parser.parse_args()
+    run_benchmark(args.sizes, args.iterations)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""
+Benchmark Cache Hits Script
+
+Compares a cache hit on /api/v2/specials before and after pre-serialized
+response caching:
+- before: JSON string in Redis -> json.loads -> SpecialsListV2(**data) ->
+  FastAPI response serialization
+- after: raw (optionally compressed) bytes in Redis -> Response
+
+Reports per-hit latency and the stored size of each format. When Redis is
+reachable the Redis-reported memory usage of each key is included too.
+Run with: python -m scripts.benchmark_cache [--items 50] [--iterations 2000]
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import redis.asyncio as redis
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from app.config import get_settings
+from app.routers.specials_v2 import ProductV2, SpecialsListV2
+from app.services.cache import CachedBody
+
+
+def build_payload(items: int) -> dict:
+    """A realistic specials page, shaped like the v2 list endpoint's response."""
+    products = [
+        ProductV2(
+            id=i,
+            stockcode=str(100000 + i),
+            name=f"Brand {i % 40} Product Name Variant {i} 500g",
+            brand=f"Brand {i % 40}",
+            size="500g",
+            category="Dairy, Eggs & Fridge",
+            image_url=f"https://cdn0.woolworths.media/content/wowproductimages/large/{100000 + i}.jpg",
+            product_url=f"https://www.woolworths.com.au/shop/productdetails/{100000 + i}",
+            store_id=1 + i % 3,
+            store_name="Woolworths",
+            store_slug="woolworths",
+            price="$3.50",
+            price_cents=350,
+            was_price="$7.00",
+            was_price_cents=700,
+            discount_percent=50,
+            unit_price="$0.70 / 100g",
+            valid_until=datetime(2025, 1, 7),
+        )
+        for i in range(items)
+    ]
+    return SpecialsListV2(items=products, total=items * 20, cursor="50:1234", has_more=True).model_dump()
+
+
+def time_per_call(func, iterations: int) -> float:
+    """Mean microseconds per call."""
+    started = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    return (time.perf_counter() - started) / iterations * 1_000_000
+
+
+async def redis_memory(stored: dict[str, bytes]) -> dict[str, int]:
+    """MEMORY USAGE for each stored value, or {} when Redis is not reachable."""
+    client = redis.from_url(get_settings().redis_url)
+    try:
+        await client.ping()
+        usage = {}
+        for name, value in stored.items():
+            key = f"benchmark:{name}"
+            await client.set(key, value, ex=60)
+            usage[name] = await client.memory_usage(key)
+            await client.delete(key)
+        return usage
+    except Exception as e:
+        print(f"Redis not available, skipping MEMORY USAGE: {e}")
+        return {}
+    finally:
+        await client.aclose()
+
+
+def run_benchmark(items: int, iterations: int):
+    payload = build_payload(items)
+
+    # Before: what CacheService.set used to store
+    before_stored = json.dumps(payload, default=str)
+
+    def before_hit():
+        data = json.loads(before_stored)
+        response = SpecialsListV2(**data)
+        return JSONResponse(jsonable_encoder(response)).body
+
+    results = {"before (json + model)": (time_per_call(before_hit, iterations), len(before_stored.encode()))}
+    stored = {"before": before_stored.encode()}
+
+    for compression in ("none", "gzip", "zstd"):
+        body = CachedBody.from_value(payload, compression=compression)
+        if compression == "zstd" and body.encoding != "zstd":
+            print("zstandard not installed, skipping zstd")
+            continue
+
+        def after_hit():
+            return body.to_response(accept_encoding="gzip, zstd").body
+
+        label = f"after ({compression})"
+        results[label] = (time_per_call(after_hit, iterations), len(body.body))
+        stored[compression] = body.body
+
+    print(f"\nCache hit for a {items}-item specials page ({iterations} iterations)")
+    print(f"{'format':<24}{'us/hit':>10}{'stored bytes':>15}")
+    for label, (micros, size) in results.items():
+        print(f"{label:<24}{micros:>10.1f}{size:>15,}")
+
+    usage = asyncio.run(redis_memory(stored))
+    if usage:
+        print("\nRedis MEMORY USAGE (bytes)")
+        for name, size in usage.items():
+            print(f"{name:<24}{size:>10,}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark v2 specials cache hits")
+    parser.add_argument("--items", type=int, default=50, help="Products per page")
+    parser.add_argument("--iterations", type=int, default=2000, help="Hits to time per format")
+    args = parser.parse_args()
+    run_benchmark(args.items, args.iterations)
+
+
+if __name__ == "__main__":
+    main()
@@ -15,7 +15,7 @@ sys.path.insert(0, str(Path(__file__).parent.parent))
 from sqlalchemy.orm import sessionmaker
 from app.database import engine
 from app.models import Special, Category
-from app.services.auto_categorizer import categorize_product
+from app.services.auto_categorizer import categorize_many
 
 
 def safe_print(text):
@@ -55,9 +55,13 @@ def recategorize_all_products():
             "changes_by_category": {},
         }
 
-        for i, special in enumerate(specials, 1):
-            # Get new category from auto-categorizer
-            new_category_slug = categorize_product(special.name, special.brand)
+        # Run the auto-categorizer over the whole batch in one pass
+        new_category_slugs = categorize_many(
+            [special.name for special in specials],
+            [special.brand for special in specials],
+        )
+
+        for i, (special, new_category_slug) in enumerate(zip(specials, new_category_slugs), 1):
             new_category_id = category_lookup.get(new_category_slug) if new_category_slug else None
 
             old_category_id = special.category_id
@@ -130,11 +134,15 @@ def preview_changes(limit=100):
         specials = db.query(Special).limit(limit * 10).all()
         changes_found = 0
 
-        for special in specials:
+        new_category_slugs = categorize_many(
+            [special.name for special in specials],
+            [special.brand for special in specials],
+        )
+
+        for special, new_category_slug in zip(specials, new_category_slugs):
             if changes_found >= limit:
                 break
 
-            new_category_slug = categorize_product(special.name, special.brand)
             new_category_id = category_lookup.get(new_category_slug) if new_category_slug else None
 
             if new_category_id != special.category_id: